@@ -53,6 +53,12 @@ export const handler = async (event: any, context: any) => {
       const imagesWithUrls = await Promise.all(images.map(async (img) => ({
         ...img,
         url: await getPresignedUrl(BUCKET, img.key, 900),
+        thumbnailUrls: Object.fromEntries(await Promise.all(
+          Object.entries(img.thumbnails ?? {}).map(async ([width, key]) => [
+            width,
+            await getPresignedUrl(BUCKET, key, 900),
+          ])
+        )),
       })));
 
       logger.info('Images retrieved successfully', {
@@ -2,4 +2,17 @@ export interface ImageMetadata {
   key: string;
   size: number;
   lastModified: string;
+  // WebP thumbnail keys by width, when image_gen produced them
+  thumbnails?: Record<string, string>;
+  // Only present for images read from the gallery manifest
+  day?: string;
+  date?: string;
+  width?: number | null;
+  height?: number | null;
+};
+
+export interface GalleryManifest {
+  version: number;
+  updated_at?: string;
+  images: ImageMetadata[];
 };
@@ -10,24 +10,65 @@ import {
 import { getSignedUrl } from '@aws-sdk/s3-request-presigner';
 import { Logger } from '@aws-lambda-powertools/logger';
 import { TwitterApi } from 'twitter-api-v2';
-import type { ImageMetadata } from './types.js';
+import type { GalleryManifest, ImageMetadata } from './types.js';
 
 const logger = new Logger({ serviceName: 'gallery_api_lambda' });
 const s3 = new S3Client({});
 const secretsClient = new SecretsManagerClient({});
 const secretArn = process.env.TWITTER_SECRET_ARN;
 let twitterClient: TwitterApi | null = null;
+const manifestKey = process.env.GALLERY_MANIFEST_KEY ?? 'gallery/manifest.json';
 
 export async function listAllImages(bucket: string): Promise<ImageMetadata[]> {
+  const manifestImages = await loadManifest(bucket);
+
+  if (manifestImages) return manifestImages;
+
+  return listImagesFromBucket(bucket);
+}
+
+// image_gen keeps a manifest of every image, so one small read replaces
+// listing the whole images/ prefix
+async function loadManifest(bucket: string): Promise<ImageMetadata[] | null> {
+  try {
+    const result = await s3.send(
+      new GetObjectCommand({ Bucket: bucket, Key: manifestKey })
+    );
+    const body = await result.Body?.transformToString();
+
+    if (!body) return null;
+
+    const manifest = JSON.parse(body) as GalleryManifest;
+
+    logger.info('Gallery manifest loaded',
+      { bucket, imageCount: manifest.images.length });
+
+    return manifest.images;
+  } catch (err) {
+    logger.warn('Gallery manifest unavailable, listing bucket instead',
+      { bucket, error: (err as Error).message });
+
+    return null;
+  }
+}
+
+async function listImagesFromBucket(bucket: string): Promise<ImageMetadata[]> {
   logger.info('Listing images from S3', { bucket, prefix: 'images/' });
 
   const command = new ListObjectsV2Command({
     Bucket: bucket,
     Prefix: 'images/',
   });
+  const thumbnailCommand = new ListObjectsV2Command({
+    Bucket: bucket,
+    Prefix: 'thumbnails/',
+  });
 
   try {
-    const result = await s3.send(command);
+    const [result, thumbnailResult] = await Promise.all([
+      s3.send(command),
+      s3.send(thumbnailCommand),
+    ]);
     const imageCount = result.Contents
       ? result.Contents.filter((obj) => !obj.Key?.endsWith('/')).length
       : 0;
@@ -36,15 +77,22 @@ export async function listAllImages(bucket: string): Promise<ImageMetadata[]> {
 
     if (!result.Contents) return [];
 
+    const thumbnails = groupThumbnails(thumbnailResult?.Contents ?? []);
+
     return result.Contents
       .filter((obj) => !obj.Key?.endsWith('/'))
-      .map((obj) => (
-        {
+      .map((obj) => {
+        const image: ImageMetadata = {
           key: obj.Key!,
           size: obj.Size ?? 0,
           lastModified: obj.LastModified?.toISOString() ?? '',
-        }
-      ));
+        };
+        const imageThumbnails = thumbnails[imageStem(obj.Key!)];
+
+        if (imageThumbnails) image.thumbnails = imageThumbnails;
+
+        return image;
+      });
   } catch (err) {
     logger.error('Failed to list images from S3',
       { bucket, error: (err as Error).message });
@@ -53,6 +101,31 @@ export async function listAllImages(bucket: string): Promise<ImageMetadata[]> {
   }
 }
 
+function imageStem(key: string): string {
+  const name = key.substring(key.lastIndexOf('/') + 1);
+
+  return name.replace(/\.[^.]+$/, '');
+}
+
+// Thumbnails are written by image_gen as thumbnails/<stem>_<width>.webp
+function groupThumbnails(
+  objects: { Key?: string }[]
+): Record<string, Record<string, string>> {
+  const grouped: Record<string, Record<string, string>> = {};
+
+  for (const obj of objects) {
+    const match = obj.Key?.match(/^thumbnails\/(.+)_(\d+)\.webp$/);
+
+    if (!match) continue;
+
+    const [, stem, width] = match;
+
+    grouped[stem] = { ...grouped[stem], [width]: obj.Key! };
+  }
+
+  return grouped;
+}
+
 export async function getPresignedUrl(
   bucket: string,
   key: string,
@@ -6,6 +6,7 @@ jest.mock('@aws-sdk/client-s3', () => {
       send: mockSend,
     })),
     ListObjectsV2Command: jest.fn(),
+    GetObjectCommand: jest.fn(),
   };
 });
 
@@ -34,6 +35,8 @@ describe('listCurrentImages', () => {
   beforeEach(() => {
     jest.resetModules();
     utils = require('../src/utils');
+    // No manifest yet, so every test here falls back to listing the bucket
+    mockSend.mockRejectedValueOnce(new Error('NoSuchKey'));
   });
 
   afterEach(() => {
@@ -72,12 +75,86 @@ describe('listCurrentImages', () => {
     });
   });
 
+  it('attaches thumbnail keys by width', async () => {
+    mockSend
+      .mockResolvedValueOnce({
+        Contents: [
+          { Key: 'images/foo.jpg', Size: 123, LastModified: new Date('2024-01-01') },
+          { Key: 'images/bar.jpg', Size: 456, LastModified: new Date('2024-01-02') },
+        ],
+      })
+      .mockResolvedValueOnce({
+        Contents: [
+          { Key: 'thumbnails/foo_320.webp' },
+          { Key: 'thumbnails/foo_640.webp' },
+          { Key: 'thumbnails/unrelated.txt' },
+        ],
+      });
+    const result = await utils.listAllImages('test-bucket');
+    expect(result[0].thumbnails).toEqual({
+      '320': 'thumbnails/foo_320.webp',
+      '640': 'thumbnails/foo_640.webp',
+    });
+    expect(result[1].thumbnails).toBeUndefined();
+  });
+
   it('throws on S3 error', async () => {
     mockSend.mockRejectedValueOnce(new Error('S3 error'));
     await expect(utils.listAllImages('test-bucket')).rejects.toThrow('S3 error');
   });
 });
 
+describe('listAllImages with a gallery manifest', () => {
+  let utils: any;
+
+  beforeEach(() => {
+    jest.resetModules();
+    utils = require('../src/utils');
+  });
+
+  afterEach(() => {
+    jest.clearAllMocks();
+  });
+
+  it('returns the manifest images without listing the bucket', async () => {
+    const images = [
+      {
+        key: 'images/october_31_0_BlackCat.jpg',
+        day: 'Black Cat',
+        date: '2025-10-31',
+        size: 2048,
+        width: 1024,
+        height: 1024,
+        thumbnails: { '320': 'thumbnails/october_31_0_BlackCat_320.webp' },
+        lastModified: '2025-10-31T13:00:00',
+      },
+    ];
+    mockSend.mockResolvedValueOnce({
+      Body: {
+        transformToString: jest.fn().mockResolvedValue(
+          JSON.stringify({ version: 1, images })
+        ),
+      },
+    });
+    const result = await utils.listAllImages('test-bucket');
+    expect(result).toEqual(images);
+    expect(mockSend).toHaveBeenCalledTimes(1);
+  });
+
+  it('lists the bucket when the manifest is empty', async () => {
+    mockSend
+      .mockResolvedValueOnce({ Body: undefined })
+      .mockResolvedValueOnce({
+        Contents: [
+          { Key: 'images/foo.jpg', Size: 123, LastModified: new Date('2024-01-01') },
+        ],
+      });
+    const result = await utils.listAllImages('test-bucket');
+    expect(result).toHaveLength(1);
+    expect(result[0].key).toBe('images/foo.jpg');
+  });
+});
+
 
 describe('validateEnv', () => {
   beforeEach(() => {
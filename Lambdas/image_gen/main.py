@@ -1,39 +1,481 @@
 import datetime
+import functools
+import hashlib
+import importlib
 import json
+import logging
 import os
+import random
+import re
+import threading
+import time
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from io import BytesIO
 
-import boto3
-import openai
-from aws_lambda_powertools import Logger
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+from botocore.exceptions import ClientError
 
 logger = Logger(service='image_generation_lambda')
+metrics = Metrics(
+    namespace=os.environ.get('POWERTOOLS_METRICS_NAMESPACE', 'SpookyDays'),
+    service='image_generation_lambda',
+)
 
 bucket_name = os.environ['IMAGE_BUCKET_NAME']
 dynamodb_table_name = os.environ['DYNAMODB_TABLE_NAME']
 openai_secret_arn = os.environ['OPENAI_SECRET_ARN']
+# Maximum number of DALL-E requests in flight at the same time
+max_concurrent_generations = int(os.environ.get('MAX_CONCURRENT_GENERATIONS', '4'))
+# 'memory' uploads decoded bytes directly, 'file' stages each image in /tmp first
+upload_mode = os.environ.get('UPLOAD_MODE', 'memory')
+# 'b64_json' returns each image inside the DALL-E JSON response, 'url' streams
+# it from the returned URL into S3; an invocation can override it with
+# {"response_format": ...}
+response_format = os.environ.get('RESPONSE_FORMAT', 'b64_json')
+# Size of each S3 multipart part in 'url' mode (at least 5 MiB)
+stream_part_size_bytes = int(
+    os.environ.get('STREAM_PART_SIZE_BYTES', str(5 * 1024 * 1024))
+)
+# Longest wait for the next bytes of an image downloaded in 'url' mode
+image_download_timeout_seconds = float(
+    os.environ.get('IMAGE_DOWNLOAD_TIMEOUT_SECONDS', '30')
+)
+# How long a cached national-days.json is trusted before an ETag check
+config_ttl_seconds = int(os.environ.get('CONFIG_TTL_SECONDS', '3600'))
+# Snapshot of the S3 config that CI packages next to main.py, used when the
+# bucket copy cannot be read
+config_local_path = os.environ.get(
+    'NATIONAL_DAYS_LOCAL_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'national-days.json'),
+)
+# Attempts per DALL-E request, including the first one
+openai_max_attempts = int(os.environ.get('OPENAI_MAX_ATTEMPTS', '4'))
+# Retries shared by every generation in a run
+openai_retry_budget = int(os.environ.get('OPENAI_RETRY_BUDGET', '6'))
+# Consecutive OpenAI failures that stop any further attempts in a run
+openai_circuit_breaker_threshold = int(
+    os.environ.get('OPENAI_CIRCUIT_BREAKER_THRESHOLD', '3')
+)
+# Expected duration of one HD generation, used to avoid starting an attempt
+# that cannot finish before the Lambda deadline
+generation_estimate_ms = int(os.environ.get('GENERATION_ESTIMATE_MS', '45000'))
+# Time kept in reserve for uploads and record writes after the last attempt
+deadline_margin_ms = int(os.environ.get('DEADLINE_MARGIN_MS', '5000'))
+# Images generated at the same time by a backfill
+backfill_max_concurrency = int(os.environ.get('BACKFILL_MAX_CONCURRENCY', '2'))
+# DALL-E requests a backfill may start per minute, retries included
+backfill_images_per_minute = float(os.environ.get('BACKFILL_IMAGES_PER_MINUTE', '5'))
+# How long a backfill's progress is kept for resuming it
+backfill_checkpoint_ttl_days = int(os.environ.get('BACKFILL_CHECKPOINT_TTL_DAYS', '30'))
+# Publishing days {"action": "lookahead"} renders ahead of time
+lookahead_days = int(os.environ.get('LOOKAHEAD_DAYS', '2'))
+# Weekdays the publish schedule runs on, so lookahead never renders a day
+# that is not posted
+publish_weekdays = os.environ.get('PUBLISH_WEEKDAYS', 'mon,tue,wed,thu,fri')
+# Lookahead images wait here, outside the images/ prefix that triggers
+# twitter_post, until {"action": "publish"} promotes them
+staging_prefix = os.environ.get('STAGING_PREFIX', 'staging/')
+# How long a staged image and its ready record are kept if never published
+staging_ttl_days = int(os.environ.get('STAGING_TTL_DAYS', '14'))
+# Job records by status and timestamp
+status_index_name = os.environ.get('STATUS_INDEX_NAME', 'status-timestamp-index')
+# Connections each HTTP client keeps open per host; enough for every worker
+# and never fewer than boto3's default of 10
+http_pool_size = int(
+    os.environ.get(
+        'HTTP_POOL_SIZE',
+        str(max(10, max_concurrent_generations, backfill_max_concurrency)),
+    )
+)
+# How long an idle OpenAI connection stays open for the next request
+http_keepalive_seconds = float(os.environ.get('HTTP_KEEPALIVE_SECONDS', '60'))
+# 'run' reuses images already generated for the same run date and never pays
+# for them twice, 'reuse' also reuses images from earlier runs, 'off' disables
+# the generation cache
+generation_cache_mode = os.environ.get('GENERATION_CACHE_MODE', 'run')
+# Days a cached image is kept; long enough for a day's next yearly occurrence
+# to reuse it. Must match the cache/ lifecycle rule on the image bucket.
+generation_cache_ttl_days = int(os.environ.get('GENERATION_CACHE_TTL_DAYS', '400'))
+# JPEG quality of the image posted to Twitter
+jpeg_quality = int(os.environ.get('JPEG_QUALITY', '85'))
+# Widths of the WebP thumbnails written for the gallery
+thumbnail_widths = [
+    int(width) for width in os.environ.get('THUMBNAIL_WIDTHS', '320,640').split(',')
+]
+# Object the gallery API reads instead of listing the images/ prefix
+gallery_manifest_key = os.environ.get('GALLERY_MANIFEST_KEY', 'gallery/manifest.json')
+# Maximum number of image encodes running at the same time. Each holds a
+# decoded bitmap and its outputs; with four generations in flight the
+# defaults peak at about 350 MiB, which fits the 1024 MB set in Terraform
+max_concurrent_encodes = int(os.environ.get('MAX_CONCURRENT_ENCODES', '4'))
+# 'eager' imports the SDKs and builds clients while the Lambda initializes,
+# 'lazy' defers both until an invocation first needs them
+startup_mode = os.environ.get('STARTUP_MODE', 'eager')
+# How long a cached secret is served before it is re-read in the background
+secret_ttl_seconds = int(os.environ.get('SECRET_TTL_SECONDS', '3600'))
+# 'off' stops the per-stage EMF metrics, including the cold start metric
+stage_metrics_enabled = os.environ.get('STAGE_METRICS', 'on') != 'off'
+
+
+class LazyProxy:
+    """
+    Stand-in for a module or client that is created on first attribute access.
+
+    In eager startup mode initialize() resolves every proxy during the
+    Lambda init phase, so import-time behaviour (including failures) is
+    unchanged.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        with self._lock:
+            if self._target is None:
+                self._target = self._factory()
+        return self._target
+
+    def invalidate(self):
+        # The next attribute access builds a fresh target
+        with self._lock:
+            self._target = None
+
+    def __getattr__(self, name):
+        target = self._target if self._target is not None else self.resolve()
+        return getattr(target, name)
+
+
+def lazy_import(module_name):
+    return LazyProxy(lambda: importlib.import_module(module_name))
+
+
+boto3 = lazy_import('boto3')
+botocore_config = lazy_import('botocore.config')
+botocore_session = lazy_import('botocore.session')
+httpx = lazy_import('httpx')
+openai = lazy_import('openai')
+requests = lazy_import('requests')
+Image = lazy_import('PIL.Image')
+ImageFile = lazy_import('PIL.ImageFile')
+
+
+@dataclass
+class StageRecord:
+    # Bytes the stage moved, set by the tracked block when it is known
+    bytes: int | None = None
+
+
+class StageMetrics:
+    """
+    Per-stage metrics published in CloudWatch Embedded Metric Format.
+
+    track() times one stage and emits <stage>Duration, <stage>Bytes when the
+    block sets bytes on the yielded record, and <stage>Errors when it
+    raises. Powertools buffers the values and log_metrics writes them once
+    per invocation, so the hot path only appends to a dict. When disabled
+    both methods do nothing.
+    """
+
+    def __init__(self, metrics, enabled):
+        self.metrics = metrics
+        self.enabled = enabled
+
+    @contextmanager
+    def track(self, stage):
+        record = StageRecord()
+        if not self.enabled:
+            yield record
+            return
+
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception:
+            self.count(f'{stage}Errors')
+            raise
+        finally:
+            self.metrics.add_metric(
+                name=f'{stage}Duration',
+                unit=MetricUnit.Milliseconds,
+                value=round((time.perf_counter() - started) * 1000, 2),
+            )
+            if record.bytes is not None:
+                self.metrics.add_metric(
+                    name=f'{stage}Bytes', unit=MetricUnit.Bytes, value=record.bytes
+                )
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.metrics.add_metric(name=name, unit=MetricUnit.Count, value=value)
+
+
+stage_metrics = StageMetrics(metrics, stage_metrics_enabled)
+
+
+class ConnectionStats:
+    """
+    Counts HTTP requests and newly opened connections per host.
+
+    Requests that did not open a connection reused a pooled one. publish()
+    reports the counts since the previous call, once per invocation.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, host, requests=0, connections=0):
+        with self._lock:
+            counts = self._counts.setdefault(host, [0, 0])
+            counts[0] += requests
+            counts[1] += connections
+
+    def collect(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        return {
+            host: {
+                'requests': requests,
+                'new_connections': connections,
+                'reused': max(requests - connections, 0),
+            }
+            for host, (requests, connections) in counts.items()
+        }
+
+    def publish(self):
+        hosts = self.collect()
+        if not hosts:
+            return
+        logger.info('HTTP connection reuse', hosts=hosts)
+        for name, field_name in (
+            ('HTTPRequests', 'requests'),
+            ('HTTPConnectionsOpened', 'new_connections'),
+            ('HTTPConnectionsReused', 'reused'),
+        ):
+            stage_metrics.count(name, sum(c[field_name] for c in hosts.values()))
+
+
+class Urllib3ConnectionFilter(logging.Filter):
+    """
+    Counts the requests and new connections urllib3 logs at DEBUG.
+
+    urllib3 carries the boto3 and requests traffic. The filter lowers its
+    logger to DEBUG to see every record, then drops anything below the
+    previous level so the log output is unchanged.
+    """
+
+    def __init__(self, stats, level):
+        super().__init__()
+        self.stats = stats
+        self.level = level
+
+    def filter(self, record):
+        message = record.msg if isinstance(record.msg, str) else ''
+        if message.startswith('Starting new'):
+            self.stats.record(record.args[1], connections=1)
+        elif message.startswith('Resetting dropped connection'):
+            self.stats.record(record.args[0], connections=1)
+        elif message.startswith('%s://%s:%s "'):
+            self.stats.record(record.args[1], requests=1)
+        return record.levelno >= self.level
+
+
+def count_urllib3_connections(stats):
+    urllib3_logger = logging.getLogger('urllib3.connectionpool')
+    level = urllib3_logger.getEffectiveLevel()
+    # A re-imported module replaces its predecessor's filter
+    for existing in list(urllib3_logger.filters):
+        if type(existing).__name__ == Urllib3ConnectionFilter.__name__:
+            urllib3_logger.removeFilter(existing)
+            level = existing.level
+    urllib3_logger.addFilter(Urllib3ConnectionFilter(stats, level))
+    urllib3_logger.setLevel(logging.DEBUG)
+
+
+def publish_connection_stats(handler):
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            connection_stats.publish()
+
+    return wrapper
+
+
+connection_stats = ConnectionStats()
+count_urllib3_connections(connection_stats)
+
+
+class SecretCache:
+    """
+    In-process cache for a secret read from Secrets Manager.
+
+    The first get() blocks on the loader. Later calls return the cached
+    value at once; when it is older than the TTL a single background thread
+    re-reads it, so a rotated secret is picked up without an invocation
+    waiting on Secrets Manager. A failed refresh keeps serving the cached
+    value and is retried on the next get(). on_change runs after a refresh
+    returns a different value.
+    """
+
+    def __init__(self, loader, ttl_seconds, on_change=None):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.on_change = on_change
+        self._value = None
+        self._fetched_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._value is None:
+                self._value = self.loader()
+                self._fetched_at = time.monotonic()
+            elif (
+                not self._refreshing
+                and time.monotonic() - self._fetched_at >= self.ttl_seconds
+            ):
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+            return self._value
+
+    def _refresh(self):
+        try:
+            value = self.loader()
+        except Exception as e:
+            logger.warning('Secret refresh failed, keeping cached value', error=str(e))
+            with self._lock:
+                self._refreshing = False
+            return
+
+        with self._lock:
+            changed = value != self._value
+            self._value = value
+            self._fetched_at = time.monotonic()
+            self._refreshing = False
+
+        if changed:
+            logger.info('Secret changed since it was cached')
+            if self.on_change:
+                self.on_change()
 
-# Retrieve OpenAI API key from Secrets Manager
-secrets_client = boto3.client('secretsmanager')
-try:
-    secret_response = secrets_client.get_secret_value(SecretId=openai_secret_arn)
-    openai_api_key = secret_response['SecretString']
-except secrets_client.exceptions.ResourceNotFoundException:
-    logger.error('Secret not found in Secrets Manager')
-    raise
-except secrets_client.exceptions.InvalidRequestException as e:
-    logger.error('Invalid request to Secrets Manager', error=str(e))
-    raise
-except secrets_client.exceptions.InvalidParameterException as e:
-    logger.error('Invalid parameter in Secrets Manager request', error=str(e))
-    raise
-except Exception as e:
-    logger.error('Failed to retrieve secret from Secrets Manager', error=str(e))
-    raise
-
-client = openai.OpenAI(api_key=openai_api_key)
-dynamodb_client = boto3.client('dynamodb')
-s3_client = boto3.client('s3')
+
+def get_openai_api_key():
+    # Retrieve OpenAI API key from Secrets Manager
+    try:
+        secret_response = secrets_client.get_secret_value(SecretId=openai_secret_arn)
+        return secret_response['SecretString']
+    except secrets_client.exceptions.ResourceNotFoundException:
+        logger.error('Secret not found in Secrets Manager')
+        raise
+    except secrets_client.exceptions.InvalidRequestException as e:
+        logger.error('Invalid request to Secrets Manager', error=str(e))
+        raise
+    except secrets_client.exceptions.InvalidParameterException as e:
+        logger.error('Invalid parameter in Secrets Manager request', error=str(e))
+        raise
+    except Exception as e:
+        logger.error('Failed to retrieve secret from Secrets Manager', error=str(e))
+        raise
+
+
+def configure_aws_transport():
+    """
+    Give every boto3 client a pool large enough for all workers, with TCP
+    keep-alive so pooled connections survive between warm invocations.
+    """
+    session = botocore_session.get_session()
+    session.set_default_client_config(
+        botocore_config.Config(max_pool_connections=http_pool_size, tcp_keepalive=True)
+    )
+    boto3.setup_default_session(botocore_session=session)
+    return session
+
+
+def build_openai_http_client():
+    """
+    Pooled transport shared by every OpenAI client, so connections outlive
+    a client rebuilt after key rotation.
+    """
+
+    def trace_request(request):
+        host = request.url.host
+        connection_stats.record(host, requests=1)
+
+        def trace(event_name, info):
+            if event_name == 'connection.connect_tcp.complete':
+                connection_stats.record(host, connections=1)
+
+        request.extensions['trace'] = trace
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=http_pool_size,
+            max_keepalive_connections=http_pool_size,
+            keepalive_expiry=http_keepalive_seconds,
+        ),
+        follow_redirects=True,
+        event_hooks={'request': [trace_request]},
+    )
+
+
+def build_http_session():
+    session = requests.Session()
+    session.mount(
+        'https://', requests.adapters.HTTPAdapter(pool_maxsize=http_pool_size)
+    )
+    return session
+
+
+aws_transport = LazyProxy(configure_aws_transport)
+openai_http_client = LazyProxy(build_openai_http_client)
+
+# Client creation on boto3's shared default session is not thread-safe, so
+# clients first used from worker threads are created one at a time
+aws_client_lock = threading.Lock()
+
+
+def create_aws_client(service_name):
+    aws_transport.resolve()
+    with aws_client_lock:
+        return boto3.client(service_name)
+
+
+secrets_client = LazyProxy(lambda: create_aws_client('secretsmanager'))
+dynamodb_client = LazyProxy(lambda: create_aws_client('dynamodb'))
+s3_client = LazyProxy(lambda: create_aws_client('s3'))
+# A rotated key rebuilds the OpenAI client on its next use
+openai_api_key = SecretCache(
+    get_openai_api_key, secret_ttl_seconds, on_change=lambda: client.invalidate()
+)
+# Retries are handled by OpenAIRetryEngine so they respect the run deadline
+client = LazyProxy(
+    lambda: openai.OpenAI(
+        api_key=openai_api_key.get(),
+        max_retries=0,
+        http_client=openai_http_client.resolve(),
+    )
+)
+# Downloads generated images in 'url' mode
+http_session = LazyProxy(build_http_session)
+# Pillow releases the GIL while resizing and encoding, so variants of an
+# image are encoded in parallel on threads
+encode_executor = ThreadPoolExecutor(max_workers=max_concurrent_encodes)
+
+IMAGE_MODEL = 'dall-e-3'
+IMAGE_SIZE = '1024x1024'
+IMAGE_STYLE = 'vivid'
+RESPONSE_FORMATS = ('b64_json', 'url')
+NO_CACHE_CONTROL = 'no-store, no-cache, must-revalidate, max-age=0'
+THUMBNAIL_KEY_PATTERN = re.compile(r'^thumbnails/(.+)_(\d+)\.webp$')
 
 MONTH_DICT = {
     '1': 'january',
@@ -50,136 +492,1692 @@ MONTH_DICT = {
     '12': 'december',
 }
 
-try:
-    response = s3_client.get_object(Bucket=bucket_name, Key='national-days.json')
-    national_days_json = json.loads(response['Body'].read())
-except s3_client.exceptions.NoSuchKey as e:
-    logger.error('national-days.json not found in S3', bucket=bucket_name, error=str(e))
-    raise
-except json.JSONDecodeError as e:
-    logger.error('Invalid JSON in national-days.json', error=str(e))
-    raise
-except Exception as e:
-    logger.error(
-        'Failed to read national-days.json from S3', bucket=bucket_name, error=str(e)
-    )
-    raise
-
-current_time = datetime.datetime.now()
-day_of_month = str(current_time.day)
-month_of_year = MONTH_DICT[str(current_time.month)]
-file_prefix = month_of_year + '_' + day_of_month
-b64_image_list = []
-
-
-def generate_images(data, month, day, response_type, image_quality):
-    for national_day in data[month][day]:
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+
+class NationalDaysConfig:
+    """
+    Cached, TTL-refreshed view of national-days.json.
+
+    The file is indexed into a (month, day) -> [national days] lookup on
+    load. Once the TTL expires the object is re-requested with IfNoneMatch,
+    so an unchanged file costs a 304 instead of a download and re-parse. If
+    S3 is unavailable the last good copy is kept, or the bundled local file
+    is used on a cold start.
+    """
+
+    def __init__(self, bucket, key, ttl_seconds, local_path):
+        self.bucket = bucket
+        self.key = key
+        self.ttl_seconds = ttl_seconds
+        self.local_path = local_path
+        self.prompt = None
+        self._days = {}
+        self._etag = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _index(self, raw):
+        self.prompt = raw['Prompt']
+        self._days = {
+            (month, day): list(national_days)
+            for month, days in raw.items()
+            if month != 'Prompt'
+            for day, national_days in days.items()
+        }
+
+    def _load_local(self):
+        with open(self.local_path) as f:
+            self._index(json.load(f))
+        self._etag = None
+        logger.warning('Loaded national-days.json from local file')
+
+    def refresh(self):
+        request = {'Bucket': self.bucket, 'Key': self.key}
+        if self._etag:
+            request['IfNoneMatch'] = self._etag
+
         try:
-            logger.info(
-                'Generating image',
-                national_day=national_day,
-                model='dall-e-3',
-                quality=image_quality,
-            )
-            response = client.images.generate(
-                model='dall-e-3',
-                prompt=national_days_json['Prompt'] + national_day + ' Day.',
-                n=1,
-                size='1024x1024',
-                style='vivid',
-                response_format=response_type,
-                quality=image_quality,
-            )
-
-            b64_image_list.append(
-                {
-                    'created': datetime.datetime.now(),
-                    'day': national_day,
-                    'image': response.data[0].b64_json,
-                }
+            response = s3_client.get_object(**request)
+            self._index(json.loads(response['Body'].read()))
+            self._etag = response.get('ETag')
+            logger.info('national-days.json loaded from S3', etag=self._etag)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('304', 'NotModified'):
+                logger.debug('national-days.json not modified', etag=self._etag)
+            else:
+                self._handle_load_failure(e)
+        except Exception as e:
+            self._handle_load_failure(e)
+
+        self._checked_at = time.monotonic()
+
+    def _handle_load_failure(self, error):
+        if self._days:
+            logger.warning(
+                'Failed to refresh national-days.json, using cached copy',
+                bucket=self.bucket,
+                error=str(error),
             )
-            logger.info('Image generated successfully', national_day=national_day)
+            return
+
+        logger.error(
+            'Failed to read national-days.json from S3',
+            bucket=self.bucket,
+            error=str(error),
+        )
+        if not os.path.exists(self.local_path):
+            raise error
+        self._load_local()
+
+    def ensure_fresh(self):
+        with self._lock:
+            if (
+                self._checked_at is None
+                or time.monotonic() - self._checked_at >= self.ttl_seconds
+            ):
+                self.refresh()
+
+    def get_days(self, month, day):
+        self.ensure_fresh()
+        return self._days.get((month, day), [])
+
+
+national_days_config = NationalDaysConfig(
+    bucket_name, 'national-days.json', config_ttl_seconds, config_local_path
+)
+
+
+class DynamoDBBatchWriter:
+    """
+    Buffers job records and writes them with BatchWriteItem.
+
+    Records are flushed automatically in groups of 25 (the BatchWriteItem
+    limit) and whatever remains is written by flush(). Records added by
+    concurrent workers between flushes share a batch. Unprocessed items are
+    retried with jittered exponential backoff. The latency of every flush is
+    logged and kept in flush_latencies_ms.
+    """
+
+    max_batch_size = 25
+
+    def __init__(self, table_name, max_attempts=5, base_delay_seconds=0.1):
+        self.table_name = table_name
+        self.max_attempts = max_attempts
+        self.base_delay_seconds = base_delay_seconds
+        self.flush_latencies_ms = []
+        self._items = []
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) < self.max_batch_size:
+                return
+            batch = self._items[: self.max_batch_size]
+            self._items = self._items[self.max_batch_size :]
+
+        self._write_batch(batch)
+
+    def flush(self):
+        with self._lock:
+            items, self._items = self._items, []
+
+        for start in range(0, len(items), self.max_batch_size):
+            self._write_batch(items[start : start + self.max_batch_size])
+
+    def _write_batch(self, items):
+        request_items = {
+            self.table_name: [{'PutRequest': {'Item': item}} for item in items]
+        }
+        started = time.perf_counter()
+
+        for attempt in range(1, self.max_attempts + 1):
+            response = dynamodb_client.batch_write_item(RequestItems=request_items)
+            request_items = response.get('UnprocessedItems') or {}
+            if not request_items:
+                break
+            if attempt == self.max_attempts:
+                unprocessed = len(request_items.get(self.table_name, []))
+                logger.error(
+                    'DynamoDB batch write left unprocessed items',
+                    unprocessed=unprocessed,
+                    attempts=attempt,
+                )
+                raise RuntimeError(
+                    f'{unprocessed} DynamoDB records were not written after '
+                    f'{attempt} attempts'
+                )
+            stage_metrics.count('DynamoDBBatchRetries')
+            time.sleep(
+                self.base_delay_seconds * 2 ** (attempt - 1) * random.uniform(1, 2)
+            )
+
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.flush_latencies_ms.append(latency_ms)
+        logger.info(
+            'DynamoDB batch flushed',
+            records=len(items),
+            attempts=attempt,
+            latency_ms=latency_ms,
+        )
+
+
+class GenerationCache:
+    """
+    Content-addressed cache of generated images.
+
+    Images are stored in S3 under cache/ and indexed in DynamoDB by a hash of
+    the model, size, style, quality and full prompt text. Index items carry a
+    ttl attribute for DynamoDB expiry; the S3 objects are expired by a
+    lifecycle rule on the same schedule.
+    """
+
+    def __init__(self, bucket, table_name, mode, ttl_days=generation_cache_ttl_days):
+        self.bucket = bucket
+        self.table_name = table_name
+        self.mode = mode
+        self.ttl_seconds = ttl_days * 86400
+
+    @staticmethod
+    def key_for(prompt_text, image_quality):
+        request = {
+            'model': IMAGE_MODEL,
+            'size': IMAGE_SIZE,
+            'style': IMAGE_STYLE,
+            'quality': image_quality,
+            'prompt': prompt_text,
+        }
+        return hashlib.sha256(
+            json.dumps(request, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def _index_key(cache_key):
+        return {'job_id': {'S': f'cache#{cache_key}'}, 'timestamp': {'N': '0'}}
+
+    def lookup(self, cache_key, run_date):
+        if self.mode == 'off':
+            return None
+
+        try:
+            item = dynamodb_client.get_item(
+                TableName=self.table_name,
+                Key=self._index_key(cache_key),
+                ConsistentRead=True,
+            ).get('Item')
+            if not item:
+                return None
+            if self.mode == 'run' and item['run_date']['S'] != run_date:
+                return None
+            # DynamoDB deletes expired items lazily, and the S3 object may
+            # already be gone
+            if 'ttl' in item and int(item['ttl']['N']) <= time.time():
+                return None
+
+            response = s3_client.get_object(Bucket=self.bucket, Key=item['s3_key']['S'])
+            image_bytes = response['Body'].read()
         except Exception as e:
-            logger.error(
-                'Image generation failed', national_day=national_day, error=str(e)
+            # An image already paid for in this run must not be generated
+            # again, so a broken entry fails the day instead
+            if self.mode == 'run':
+                raise
+            logger.warning('Generation cache lookup failed', error=str(e))
+            return None
+
+        logger.info('Generation cache hit', cache_key=cache_key)
+        return image_bytes
+
+    @staticmethod
+    def object_key(cache_key):
+        return f'cache/{cache_key}.png'
+
+    def _put_index(self, cache_key, run_date):
+        created_at = int(datetime.datetime.now().timestamp())
+        dynamodb_client.put_item(
+            TableName=self.table_name,
+            Item={
+                **self._index_key(cache_key),
+                's3_key': {'S': self.object_key(cache_key)},
+                'run_date': {'S': run_date},
+                'created_at': {'N': str(created_at)},
+                'ttl': {'N': str(created_at + self.ttl_seconds)},
+            },
+        )
+
+    def store(self, cache_key, image_bytes, run_date):
+        if self.mode == 'off':
+            return
+
+        try:
+            s3_client.put_object(
+                Bucket=self.bucket, Key=self.object_key(cache_key), Body=image_bytes
             )
+            self._put_index(cache_key, run_date)
+        except Exception as e:
+            # A missing cache entry only costs a regeneration on a re-run
+            logger.warning('Generation cache store failed', error=str(e))
+
+    def index(self, cache_key, run_date):
+        """Index an image that was already streamed to object_key()."""
+        if self.mode == 'off':
+            return
+
+        try:
+            self._put_index(cache_key, run_date)
+        except Exception as e:
+            logger.warning('Generation cache store failed', error=str(e))
+
+
+generation_cache = GenerationCache(
+    bucket_name, dynamodb_table_name, generation_cache_mode
+)
+
+
+class GalleryManifest:
+    """
+    Compact JSON index of every image in the bucket, read by the gallery API.
+
+    Updates are read-modify-write cycles guarded by S3 conditional writes
+    (If-Match on the ETag that was read, If-None-Match for the first
+    write), so concurrent writers never overwrite each other's entries; a
+    writer that loses the race re-reads the manifest and tries again. When
+    no manifest exists yet, the first append seeds it from a bucket listing
+    so earlier images stay in the gallery.
+    """
+
+    def __init__(self, bucket, key, max_attempts=5, base_delay_seconds=0.2):
+        self.bucket = bucket
+        self.key = key
+        self.max_attempts = max_attempts
+        self.base_delay_seconds = base_delay_seconds
+
+    def _read(self):
+        try:
+            response = s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None, None
             raise
 
+        manifest = json.loads(response['Body'].read())
+        return manifest, response['ETag']
+
+    def _write(self, manifest, etag):
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=json.dumps(manifest, separators=(',', ':')).encode('utf-8'),
+            ContentType='application/json',
+            CacheControl=NO_CACHE_CONTROL,
+            **condition,
+        )
+
+    def _update(self, mutate):
+        for attempt in range(1, self.max_attempts + 1):
+            manifest, etag = self._read()
+            manifest = mutate(manifest)
+            manifest['updated_at'] = datetime.datetime.now().isoformat()
+            try:
+                self._write(manifest, etag)
+                return manifest
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                    raise
+                if attempt == self.max_attempts:
+                    raise
+                logger.info('Gallery manifest changed concurrently', attempt=attempt)
+                time.sleep(
+                    random.uniform(0, self.base_delay_seconds * (2 ** (attempt - 1)))
+                )
+
+    def append(self, entries):
+        """Add or replace entries by key, keeping the manifest sorted."""
+        new_entries = {entry['key']: entry for entry in entries}
+        # Listed at most once, so a conflict retry does not list again
+        listed = None
+
+        def mutate(manifest):
+            nonlocal listed
+            if manifest is None:
+                # Seed a missing manifest from the bucket, or the gallery
+                # would only list this run's images
+                if listed is None:
+                    listed = self._list_entries()
+                manifest = {'images': list(listed.values())}
+            images = [
+                image
+                for image in manifest.get('images', [])
+                if image['key'] not in new_entries
+            ]
+            images.extend(new_entries.values())
+            images.sort(key=lambda image: image['key'])
+            return {**manifest, 'version': 1, 'images': images}
+
+        manifest = self._update(mutate)
+        logger.info(
+            'Gallery manifest updated',
+            added=len(new_entries),
+            total=len(manifest['images']),
+        )
+        return manifest
+
+    def _list_entries(self):
+        """Build {key: entry} from the images/ and thumbnails/ prefixes."""
+        thumbnails = {}
+        for obj in list_bucket_objects(self.bucket, 'thumbnails/'):
+            match = THUMBNAIL_KEY_PATTERN.match(obj['Key'])
+            if match:
+                stem, width = match.groups()
+                thumbnails.setdefault(stem, {})[width] = obj['Key']
+
+        return {
+            obj['Key']: build_manifest_entry_from_object(obj, thumbnails)
+            for obj in list_bucket_objects(self.bucket, 'images/')
+            if not obj['Key'].endswith('/')
+        }
+
+    def rebuild(self):
+        """Regenerate the manifest from the images/ and thumbnails/ prefixes."""
+        listed = self._list_entries()
 
-def upload_image_to_s3(filename, bucket):
+        def mutate(manifest):
+            # Keep entries appended while the bucket was being listed
+            images = dict(listed)
+            for image in (manifest or {}).get('images', []):
+                if image['key'] not in images and object_exists(
+                    self.bucket, image['key']
+                ):
+                    images[image['key']] = image
+            return {
+                'version': 1,
+                'images': sorted(images.values(), key=lambda image: image['key']),
+            }
+
+        manifest = self._update(mutate)
+        logger.info('Gallery manifest rebuilt', total=len(manifest['images']))
+        return manifest
+
+
+def list_bucket_objects(bucket, prefix):
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get('Contents', [])
+
+
+def object_exists(bucket, key):
+    try:
+        s3_client.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return False
+        raise
+
+
+def build_manifest_entry(
+    job_id, national_day, date, size, dimensions, thumbnails, last_modified
+):
+    width, height = dimensions
+    return {
+        'key': f'images/{job_id}',
+        'day': national_day,
+        'date': date,
+        'size': size,
+        'width': width,
+        'height': height,
+        'thumbnails': thumbnails,
+        'lastModified': last_modified,
+    }
+
+
+def build_manifest_entry_from_object(obj, thumbnails):
+    job_id = obj['Key'][len('images/') :]
+    stem = job_id.rsplit('.', 1)[0]
+    # Keys are <month>_<day>_<index>_<NationalDay>.jpg
+    national_day = re.sub(r'(?<!^)(?=[A-Z])', ' ', stem.split('_', 3)[-1])
+
+    # Every image is generated at IMAGE_SIZE, so the listing alone is enough
+    # and seeding never reads the objects themselves
+    last_modified = obj['LastModified']
+    return build_manifest_entry(
+        job_id,
+        national_day,
+        last_modified.date().isoformat(),
+        obj['Size'],
+        tuple(int(side) for side in IMAGE_SIZE.split('x')),
+        thumbnails.get(stem, {}),
+        last_modified.isoformat(),
+    )
+
+
+gallery_manifest = GalleryManifest(bucket_name, gallery_manifest_key)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when an attempt could not finish before the Lambda deadline."""
+
+
+class CircuitOpenError(Exception):
+    """Raised when too many consecutive OpenAI calls have failed in a run."""
+
+
+class RequestThrottle:
+    """
+    Spaces requests evenly to stay under a per-minute limit.
+
+    reserve() claims the next free slot and returns how long the caller has
+    to wait for it, so concurrent workers queue up instead of bursting.
+    """
+
+    def __init__(self, per_minute):
+        self.interval_seconds = 60 / per_minute
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self.interval_seconds
+        return start - now
+
+
+def is_retryable_openai_error(error):
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return False
+
+
+class OpenAIRetryEngine:
+    """
+    Deadline-aware retries for OpenAI calls within a single run.
+
+    Attempts use jittered exponential backoff and draw from a retry budget
+    shared by every generation in the run. After enough consecutive
+    retryable failures the circuit opens and the remaining days fail fast. No attempt
+    is started unless it can finish before the Lambda deadline.
+    """
+
+    def __init__(
+        self,
+        remaining_time_ms=None,
+        max_attempts=openai_max_attempts,
+        retry_budget=openai_retry_budget,
+        breaker_threshold=openai_circuit_breaker_threshold,
+        estimate_ms=generation_estimate_ms,
+        margin_ms=deadline_margin_ms,
+        base_delay_seconds=1.0,
+        max_delay_seconds=20.0,
+        throttle=None,
+    ):
+        self.remaining_time_ms = remaining_time_ms
+        self.max_attempts = max_attempts
+        self.retry_budget = retry_budget
+        self.breaker_threshold = breaker_threshold
+        self.estimate_ms = estimate_ms
+        self.margin_ms = margin_ms
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.throttle = throttle
+        self.retries_used = 0
+        self.consecutive_failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.consecutive_failures >= self.breaker_threshold
+
+    def _time_left_ms(self):
+        if self.remaining_time_ms is None:
+            return None
+        return self.remaining_time_ms() - self.margin_ms
+
+    def _check_deadline(self, wait_ms=0):
+        time_left_ms = self._time_left_ms()
+        if time_left_ms is not None and time_left_ms < wait_ms + self.estimate_ms:
+            raise DeadlineExceededError(
+                f'{time_left_ms} ms left, an attempt needs {self.estimate_ms} ms'
+            )
+
+    def _take_retry(self):
+        with self._lock:
+            if self.retries_used >= self.retry_budget:
+                return False
+            self.retries_used += 1
+            return True
+
+    def call(self, fn):
+        """
+        Call fn(timeout) until it succeeds or retrying is no longer allowed.
+        timeout is the number of seconds left before the deadline, or None.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            if self.is_open:
+                raise CircuitOpenError('OpenAI circuit breaker is open')
+            wait_seconds = self.throttle.reserve() if self.throttle else 0
+            self._check_deadline(wait_seconds * 1000)
+            if wait_seconds:
+                time.sleep(wait_seconds)
+
+            time_left_ms = self._time_left_ms()
+            try:
+                result = fn(None if time_left_ms is None else time_left_ms / 1000)
+            except Exception as e:
+                retryable = is_retryable_openai_error(e)
+                # Only service-health failures count towards the breaker; a
+                # prompt rejected by the content policy says nothing about it
+                if retryable:
+                    with self._lock:
+                        self.consecutive_failures += 1
+                if (
+                    not retryable
+                    or attempt == self.max_attempts
+                    or not self._take_retry()
+                ):
+                    raise
+                delay = random.uniform(
+                    0, min(self.max_delay_seconds, self.base_delay_seconds * 2**attempt)
+                )
+                self._check_deadline(delay * 1000)
+                logger.warning(
+                    'Retrying OpenAI request',
+                    attempt=attempt,
+                    delay_seconds=round(delay, 2),
+                    error=str(e),
+                )
+                stage_metrics.count('OpenAIRetries')
+                time.sleep(delay)
+                continue
+
+            with self._lock:
+                self.consecutive_failures = 0
+            return result
+
+
+class BackfillCheckpoint:
+    """
+    Progress of a backfill, kept in one DynamoDB item.
+
+    Every uploaded job and every finished day is added to the item as soon
+    as it completes, so re-running a backfill that timed out skips straight
+    to the work that is left. The item has no status attribute and expires
+    through the table's ttl.
+    """
+
+    def __init__(self, table_name, backfill_id, ttl_days=backfill_checkpoint_ttl_days):
+        self.table_name = table_name
+        self.backfill_id = backfill_id
+        self.ttl_seconds = ttl_days * 86400
+        self.completed_days = set()
+        self.completed_jobs = set()
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        return {
+            'job_id': {'S': f'backfill#{self.backfill_id}'},
+            'timestamp': {'N': '0'},
+        }
+
+    def load(self):
+        item = dynamodb_client.get_item(
+            TableName=self.table_name, Key=self.key, ConsistentRead=True
+        ).get('Item', {})
+        self.completed_days = set(item.get('completed_days', {}).get('SS', []))
+        self.completed_jobs = set(item.get('completed_jobs', {}).get('SS', []))
+        return self
+
+    def _add(self, attribute, value):
+        updated_at = int(datetime.datetime.now().timestamp())
+        try:
+            dynamodb_client.update_item(
+                TableName=self.table_name,
+                Key=self.key,
+                UpdateExpression=(
+                    'ADD #attribute :value SET updated_at = :now, #ttl = :ttl'
+                ),
+                ExpressionAttributeNames={'#attribute': attribute, '#ttl': 'ttl'},
+                ExpressionAttributeValues={
+                    ':value': {'SS': [value]},
+                    ':now': {'N': str(updated_at)},
+                    ':ttl': {'N': str(updated_at + self.ttl_seconds)},
+                },
+            )
+        except Exception as e:
+            # The work itself is done; a lost checkpoint only repeats it on
+            # a resumed run
+            logger.warning(
+                'Backfill checkpoint failed',
+                backfill_id=self.backfill_id,
+                value=value,
+                error=str(e),
+            )
+
+    def record_job(self, job_id):
+        with self._lock:
+            self.completed_jobs.add(job_id)
+        self._add('completed_jobs', job_id)
+
+    def record_day(self, run_date):
+        with self._lock:
+            self.completed_days.add(run_date)
+        self._add('completed_days', run_date)
+
+
+@dataclass
+class RunContext:
+    """
+    Per-invocation state for a single image generation run.
+
+    Built at the start of every handler call so a warm container never
+    reuses the previous day's date or results. Module-level clients stay
+    shared across invocations.
+    """
+
+    run_time: datetime.datetime
+    month_of_year: str
+    day_of_month: str
+    file_prefix: str
+    job_ids: list = field(default_factory=list)
+    failed_days: list = field(default_factory=list)
+    manifest_entries: list = field(default_factory=list)
+    record_writer: DynamoDBBatchWriter = field(
+        default_factory=lambda: DynamoDBBatchWriter(dynamodb_table_name)
+    )
+    retry_engine: OpenAIRetryEngine = field(default_factory=OpenAIRetryEngine)
+    # Set for backfill runs, which skip jobs an earlier run already uploaded
+    checkpoint: BackfillCheckpoint | None = None
+    # Set for lookahead runs, which upload to the staging prefix and write
+    # ready records for publish to promote
+    staged: bool = False
+    # Jobs another run already staged or published
+    existing_jobs: set = field(default_factory=set)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def for_date(
+        cls,
+        run_time,
+        remaining_time_ms=None,
+        throttle=None,
+        checkpoint=None,
+        staged=False,
+    ):
+        month_of_year = MONTH_DICT[str(run_time.month)]
+        day_of_month = str(run_time.day)
+        return cls(
+            run_time=run_time,
+            month_of_year=month_of_year,
+            day_of_month=day_of_month,
+            file_prefix=f'{month_of_year}_{day_of_month}',
+            retry_engine=OpenAIRetryEngine(remaining_time_ms, throttle=throttle),
+            checkpoint=checkpoint,
+            staged=staged,
+        )
+
+    def is_done(self, job_id):
+        if job_id in self.existing_jobs:
+            return True
+        return self.checkpoint is not None and job_id in self.checkpoint.completed_jobs
+
+    def record_success(self, job_id):
+        with self._lock:
+            self.job_ids.append(job_id)
+        if self.checkpoint is not None:
+            self.checkpoint.record_job(job_id)
+
+    def record_failure(self, national_day):
+        with self._lock:
+            self.failed_days.append(national_day)
+
+    def record_manifest_entry(self, entry):
+        with self._lock:
+            self.manifest_entries.append(entry)
+
+
+def build_prompt(prompt, national_day):
+    return prompt + national_day + ' Day.'
+
+
+def generate_image(run, prompt, national_day, response_type, image_quality):
+    logger.info(
+        'Generating image',
+        national_day=national_day,
+        model=IMAGE_MODEL,
+        quality=image_quality,
+    )
+    response = run.retry_engine.call(
+        lambda timeout: client.images.generate(
+            model=IMAGE_MODEL,
+            prompt=build_prompt(prompt, national_day),
+            n=1,
+            size=IMAGE_SIZE,
+            style=IMAGE_STYLE,
+            response_format=response_type,
+            quality=image_quality,
+            timeout=timeout,
+        )
+    )
+    image = response.data[0]
+    return image.url if response_type == 'url' else image.b64_json
+
+
+def stream_image_to_s3(image_url, bucket, s3_key, part_size=stream_part_size_bytes):
+    """
+    Download a generated image into an S3 multipart upload, decoding it on
+    the way.
+
+    The response is read in small chunks that are fed to Pillow's
+    incremental parser and uploaded in parts of part_size bytes. No base64
+    copy is ever made, and the encoded bytes held at once are capped at one
+    part. With the 5 MiB minimum part size a typical DALL-E PNG still fits
+    in a single part. The parser builds the full decoded bitmap, as the
+    transcode needs it. Returns the decoded image and its encoded size.
+    """
+    parser = ImageFile.Parser()
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=bucket, Key=s3_key, ContentType='image/png'
+    )['UploadId']
+    parts = []
+    buffer = bytearray()
+    size = 0
+
+    def upload_part(data):
+        response = s3_client.upload_part(
+            Bucket=bucket,
+            Key=s3_key,
+            UploadId=upload_id,
+            PartNumber=len(parts) + 1,
+            Body=bytes(data),
+        )
+        parts.append({'ETag': response['ETag'], 'PartNumber': len(parts) + 1})
+
+    try:
+        with http_session.get(
+            image_url, stream=True, timeout=image_download_timeout_seconds
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                parser.feed(chunk)
+                buffer += chunk
+                size += len(chunk)
+                while len(buffer) >= part_size:
+                    upload_part(buffer[:part_size])
+                    del buffer[:part_size]
+
+        if buffer or not parts:
+            upload_part(buffer)
+        s3_client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts},
+        )
+    except Exception:
+        try:
+            s3_client.abort_multipart_upload(
+                Bucket=bucket, Key=s3_key, UploadId=upload_id
+            )
+        except Exception as e:
+            logger.warning('Multipart upload abort failed', s3_key=s3_key, error=str(e))
+        raise
+
+    logger.info('Image streamed to S3', s3_key=s3_key, size=size, parts=len(parts))
+    return parser.close(), size
+
+
+def encode_jpeg(image):
+    buffer = BytesIO()
+    image.save(
+        buffer, format='JPEG', quality=jpeg_quality, optimize=True, progressive=True
+    )
+    return buffer.getvalue()
+
+
+def encode_thumbnail(image, width):
+    thumbnail = image.copy()
+    thumbnail.thumbnail((width, width), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    thumbnail.save(buffer, format='WEBP', quality=80)
+    return buffer.getvalue()
+
+
+def transcode_image(image_bytes):
+    """
+    Convert the PNG returned by DALL-E into a JPEG for posting and WebP
+    thumbnails for the gallery.
+
+    Returns the JPEG bytes, a dict of thumbnail bytes keyed by width and
+    the (width, height) of the image.
+    """
+    with Image.open(BytesIO(image_bytes)) as source:
+        return encode_image(source, len(image_bytes))
+
+
+def encode_image(source, source_size):
+    """Encode a decoded image the same way transcode_image() does."""
+    image = source.convert('RGB')
+
+    jpeg_future = encode_executor.submit(encode_jpeg, image)
+    thumbnail_futures = {
+        width: encode_executor.submit(encode_thumbnail, image, width)
+        for width in thumbnail_widths
+    }
+    jpeg_bytes = jpeg_future.result()
+    thumbnails = {width: future.result() for width, future in thumbnail_futures.items()}
+
+    logger.info(
+        'Image transcoded',
+        source_size=source_size,
+        jpeg_size=len(jpeg_bytes),
+        thumbnail_sizes={width: len(data) for width, data in thumbnails.items()},
+    )
+    return jpeg_bytes, thumbnails, image.size
+
+
+def thumbnail_key(job_id, width):
+    stem = job_id.rsplit('.', 1)[0]
+    return f'thumbnails/{stem}_{width}.webp'
+
+
+def upload_thumbnails_to_s3(thumbnails, job_id, bucket):
+    # A missing thumbnail only affects the gallery, so it never blocks the post
+    for width, data in thumbnails.items():
+        s3_key = thumbnail_key(job_id, width)
+        try:
+            s3_client.put_object(
+                Bucket=bucket,
+                Key=s3_key,
+                Body=data,
+                ContentType='image/webp',
+                CacheControl=NO_CACHE_CONTROL,
+            )
+        except Exception as e:
+            logger.warning('Thumbnail upload failed', s3_key=s3_key, error=str(e))
+
+
+def upload_image_to_s3(filename, bucket, record_timestamp=None, prefix='images/'):
     try:
         file_to_upload = filename.replace('/tmp/', '')
-        s3_key = f'images/{file_to_upload}'
+        s3_key = f'{prefix}{file_to_upload}'
         # Prevent caching of image responses by setting Cache-Control
-        s3_client.upload_file(
-            filename,
-            bucket,
-            s3_key,
-            ExtraArgs={
-                'CacheControl': 'no-store, no-cache, must-revalidate, max-age=0'
-            },
-        )
+        extra_args = {'CacheControl': NO_CACHE_CONTROL, 'ContentType': 'image/jpeg'}
+        if record_timestamp is not None:
+            extra_args['Metadata'] = {'record-timestamp': str(record_timestamp)}
+        s3_client.upload_file(filename, bucket, s3_key, ExtraArgs=extra_args)
 
         logger.info('Image uploaded to S3', s3_key=s3_key)
     except Exception as e:
-        logger.error('S3 upload failed', filename=filename, error=str(e))
+        logger.error('S3 upload failed', path=filename, error=str(e))
         raise
 
 
-def insert_dynamodb_record(job_id, status='pending'):
+def upload_image_bytes_to_s3(
+    image_bytes, job_id, bucket, record_timestamp=None, prefix='images/'
+):
     try:
-        timestamp = int(datetime.datetime.now().timestamp())
-        dynamodb_client.put_item(
-            TableName=dynamodb_table_name,
-            Item={
-                'job_id': {'S': job_id},
-                'timestamp': {'N': str(timestamp)},
-                'status': {'S': status},
-            },
+        s3_key = f'{prefix}{job_id}'
+        extra_args = {}
+        # Carry the job record's sort key so twitter_post can update the
+        # record without querying for it first
+        if record_timestamp is not None:
+            extra_args['Metadata'] = {'record-timestamp': str(record_timestamp)}
+        # Prevent caching of image responses by setting Cache-Control
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=s3_key,
+            Body=image_bytes,
+            ContentType='image/jpeg',
+            CacheControl=NO_CACHE_CONTROL,
+            **extra_args,
         )
+
+        logger.info('Image uploaded to S3', s3_key=s3_key, size=len(image_bytes))
+    except Exception as e:
+        logger.error('S3 upload failed', job_id=job_id, error=str(e))
+        raise
+
+
+def build_job_record(job_id, status='pending'):
+    timestamp = int(datetime.datetime.now().timestamp())
+    return {
+        'job_id': {'S': job_id},
+        'timestamp': {'N': str(timestamp)},
+        'status': {'S': status},
+    }
+
+
+def put_job_record(record):
+    job_id = record['job_id']['S']
+    status = record['status']['S']
+    try:
+        dynamodb_client.put_item(TableName=dynamodb_table_name, Item=record)
         logger.info('DynamoDB record inserted', job_id=job_id, status=status)
     except Exception as e:
         logger.error('DynamoDB insert failed', job_id=job_id, error=str(e))
         raise
 
 
-@logger.inject_lambda_context
-def handler(event, context):
-    filename = ''
+def insert_dynamodb_record(job_id, status='pending'):
+    put_job_record(build_job_record(job_id, status))
 
-    try:
-        logger.info(
-            'Starting image generation workflow', date=f'{month_of_year}_{day_of_month}'
-        )
-        generate_images(
-            national_days_json, month_of_year, day_of_month, 'b64_json', 'hd'
-        )
 
-        for indx, image_dict in enumerate(b64_image_list):
-            filename = (
-                f'/tmp/{file_prefix}_{indx}_{image_dict["day"].replace(" ", "")}.jpg'
+def build_job_id(file_prefix, indx, national_day):
+    return f'{file_prefix}_{indx}_{national_day.replace(" ", "")}.jpg'
+
+
+def process_national_day(run, prompt, indx, national_day, response_type, image_quality):
+    run_date = run.run_time.date().isoformat()
+    cache_key = GenerationCache.key_for(
+        build_prompt(prompt, national_day), image_quality
+    )
+    with stage_metrics.track('CacheLookup'):
+        image_bytes = generation_cache.lookup(cache_key, run_date)
+    stage_metrics.count('CacheHits' if image_bytes is not None else 'CacheMisses')
+
+    if image_bytes is None and response_type == 'url':
+        with stage_metrics.track('GenerateImage'):
+            image_url = generate_image(
+                run, prompt, national_day, response_type, image_quality
+            )
+        logger.info('Image generated successfully', national_day=national_day)
+
+        # The original always lands under cache/, where the lifecycle rule
+        # expires it; it is only indexed when the cache is enabled
+        with stage_metrics.track('StreamUpload') as stage:
+            source, source_size = stream_image_to_s3(
+                image_url, bucket_name, GenerationCache.object_key(cache_key)
             )
+            stage.bytes = source_size
+        generation_cache.index(cache_key, run_date)
+
+        with stage_metrics.track('Transcode') as stage:
+            image_bytes, thumbnails, dimensions = encode_image(source, source_size)
+            stage.bytes = len(image_bytes)
+        del source
+    else:
+        if image_bytes is None:
+            with stage_metrics.track('GenerateImage') as stage:
+                b64_image = generate_image(
+                    run, prompt, national_day, response_type, image_quality
+                )
+                stage.bytes = len(b64_image)
+            logger.info('Image generated successfully', national_day=national_day)
+
+            # Release the base64 payload before the upload so only one image
+            # per worker is held in memory at a time
+            with stage_metrics.track('Base64Decode') as stage:
+                image_bytes = b64decode(b64_image)
+                stage.bytes = len(image_bytes)
+            del b64_image
+            with stage_metrics.track('CacheStore'):
+                generation_cache.store(cache_key, image_bytes, run_date)
+
+        # The cache keeps the original PNG so encoder settings can change later
+        with stage_metrics.track('Transcode') as stage:
+            image_bytes, thumbnails, dimensions = transcode_image(image_bytes)
+            stage.bytes = len(image_bytes)
+
+    job_id = build_job_id(run.file_prefix, indx, national_day)
+    record = build_job_record(job_id, 'ready' if run.staged else 'uploaded')
+    record_timestamp = record['timestamp']['N']
+    prefix = staging_prefix if run.staged else 'images/'
+
+    # The upload triggers twitter_post, which claims this record, so it must
+    # be written before the image lands in images/. Holding it for a shared
+    # batch would delay the upload, so published records are a single put
+    # each and only staged records are batched.
+    if not run.staged:
+        with stage_metrics.track('RecordWrite'):
+            put_job_record(record)
+
+    # Thumbnails go first so the gallery never lists an image without them
+    with stage_metrics.track('ThumbnailUpload') as stage:
+        upload_thumbnails_to_s3(thumbnails, job_id, bucket_name)
+        stage.bytes = sum(len(data) for data in thumbnails.values())
+
+    with stage_metrics.track('S3Upload') as stage:
+        if upload_mode == 'file':
+            filename = f'/tmp/{job_id}'
             # the below line is for local testing,
             # comment it out when deploying to Lambda
-            # filename = (
-            #     f'{file_prefix}_{indx}_{image_dict["day"].replace(" ", "")}.jpg'
-            # )
+            # filename = job_id
 
             with open(filename, 'wb') as f:
-                f.write(b64decode(image_dict['image']))
+                f.write(image_bytes)
 
             logger.info('Image written to temporary file')
+            upload_image_to_s3(filename, bucket_name, record_timestamp, prefix)
+        else:
+            upload_image_bytes_to_s3(
+                image_bytes, job_id, bucket_name, record_timestamp, prefix
+            )
+        stage.bytes = len(image_bytes)
+
+    manifest_entry = build_manifest_entry(
+        job_id,
+        national_day,
+        run_date,
+        len(image_bytes),
+        dimensions,
+        {str(width): thumbnail_key(job_id, width) for width in thumbnails},
+        datetime.datetime.now().isoformat(),
+    )
+    if not run.staged:
+        run.record_manifest_entry(manifest_entry)
+        return job_id
+
+    # A ready record always has its staged image, and carries the manifest
+    # entry so publishing never has to read the image back. Nothing reads
+    # staged records until publish, so they are written in batches of 25
+    # when the run finishes.
+    record['manifest_entry'] = {'S': json.dumps(manifest_entry)}
+    record['ttl'] = {'N': str(int(record_timestamp) + staging_ttl_days * 86400)}
+    run.record_writer.add(record)
+    return job_id
+
+
+def process_national_days(
+    run,
+    config,
+    response_type,
+    image_quality,
+    max_workers=max_concurrent_generations,
+):
+    national_days = [
+        (indx, national_day)
+        for indx, national_day in enumerate(
+            config.get_days(run.month_of_year, run.day_of_month)
+        )
+        if not run.is_done(build_job_id(run.file_prefix, indx, national_day))
+    ]
+
+    if not national_days:
+        return run.job_ids
+
+    # Each worker generates, decodes and uploads a single image, so every
+    # image is published as soon as it exists. Staged records are flushed
+    # once the workers are done.
+    try:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(national_days)))
+        ) as executor:
+            futures = {
+                executor.submit(
+                    process_national_day,
+                    run,
+                    config.prompt,
+                    indx,
+                    national_day,
+                    response_type,
+                    image_quality,
+                ): national_day
+                for indx, national_day in national_days
+            }
+
+            for future in as_completed(futures):
+                national_day = futures[future]
+                try:
+                    run.record_success(future.result())
+                    stage_metrics.count('ImagesGenerated')
+                except Exception as e:
+                    logger.error(
+                        'Image pipeline failed',
+                        national_day=national_day,
+                        reason=type(e).__name__,
+                        error=str(e),
+                    )
+                    run.record_failure(national_day)
+                    stage_metrics.count('ImagesFailed')
+    finally:
+        try:
+            run.record_writer.flush()
+        finally:
+            update_gallery_manifest(run)
+
+    if run.failed_days:
+        raise RuntimeError(f'Image pipeline failed for: {", ".join(run.failed_days)}')
+
+    return run.job_ids
+
+
+def update_gallery_manifest(run):
+    if not run.manifest_entries:
+        return
+
+    # The images are already published, so a failed manifest update is
+    # reported rather than failing the run; a rebuild repairs the manifest
+    try:
+        with stage_metrics.track('ManifestUpdate'):
+            gallery_manifest.append(run.manifest_entries)
+    except Exception as e:
+        logger.error(
+            'Gallery manifest update failed',
+            keys=[entry['key'] for entry in run.manifest_entries],
+            error=str(e),
+        )
+
+
+def rebuild_gallery_manifest():
+    try:
+        manifest = gallery_manifest.rebuild()
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'images': len(manifest['images'])}),
+        }
+    except Exception as e:
+        logger.error('Gallery manifest rebuild failed', error=str(e))
+        return {
+            'statusCode': 500,
+            'body': json.dumps('Error rebuilding gallery manifest'),
+        }
+
+
+def parse_month(month):
+    month = str(month).strip().lower()
+    for number, name in MONTH_DICT.items():
+        if month in (number, name):
+            return int(number)
+    raise ValueError(f'Unknown month: {month}')
+
+
+def parse_backfill_dates(event):
+    """
+    Return the dates a backfill covers, in order and without duplicates.
+
+    Takes either an inclusive ISO date range (start_date, end_date) or a
+    list of [month, day] pairs in days, which are placed in the current
+    year. Months are numbers or names.
+    """
+    if 'days' in event:
+        year = datetime.date.today().year
+        dates = [
+            datetime.date(year, parse_month(month), int(day))
+            for month, day in event['days']
+        ]
+    else:
+        start = datetime.date.fromisoformat(event['start_date'])
+        end = datetime.date.fromisoformat(event.get('end_date', event['start_date']))
+        if end < start:
+            raise ValueError('end_date is before start_date')
+        dates = [
+            start + datetime.timedelta(days=offset)
+            for offset in range((end - start).days + 1)
+        ]
+
+    if not dates:
+        raise ValueError('No dates to backfill')
+    return list(dict.fromkeys(dates))
+
+
+def backfill_id_for(dates):
+    # The same request always maps to the same checkpoint, so simply
+    # invoking it again resumes it
+    joined = ','.join(run_date.isoformat() for run_date in dates)
+    return hashlib.sha256(joined.encode('utf-8')).hexdigest()[:16]
+
+
+def has_time_for_generation(context):
+    return (
+        context.get_remaining_time_in_millis() - deadline_margin_ms
+        >= generation_estimate_ms
+    )
+
+
+def run_backfill(event, context, response_type=response_format):
+    """
+    Generate the images for a list of past or future dates.
+
+    Past days and today are uploaded to images/ and posted, skipping jobs
+    already published since that day. Future days are staged with ready
+    records, like lookahead, so publish posts them on their day.
+
+    Days run one after another, each with backfill_max_concurrency images in
+    flight, and every DALL-E request goes through a shared throttle. Days
+    that do not fit before the deadline are reported as remaining;
+    invoking the same request again resumes from the checkpoint.
+    """
+    today = datetime.date.today()
+    try:
+        dates = parse_backfill_dates(event)
+        # Staged images expire after staging_ttl_days, so a day further out
+        # would be gone before publish could post it
+        latest = today + datetime.timedelta(days=staging_ttl_days - 1)
+        if max(dates) > latest:
+            raise ValueError(f'Dates after {latest.isoformat()} cannot be staged')
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error('Invalid backfill request', error=str(e))
+        return {
+            'statusCode': 400,
+            'body': json.dumps(f'Invalid backfill request: {e}'),
+        }
+
+    backfill_id = event.get('backfill_id') or backfill_id_for(dates)
+    checkpoint = BackfillCheckpoint(dynamodb_table_name, backfill_id).load()
+    throttle = RequestThrottle(backfill_images_per_minute)
+    logger.info(
+        'Starting backfill',
+        backfill_id=backfill_id,
+        days=len(dates),
+        already_completed=len(checkpoint.completed_days),
+    )
+
+    completed, failed, remaining = [], [], []
+    for run_date in dates:
+        day = run_date.isoformat()
+        if day in checkpoint.completed_days:
+            completed.append(day)
+            continue
+        if remaining or not has_time_for_generation(context):
+            remaining.append(day)
+            continue
+
+        run = RunContext.for_date(
+            datetime.datetime.combine(run_date, datetime.time()),
+            context.get_remaining_time_in_millis,
+            throttle=throttle,
+            checkpoint=checkpoint,
+            staged=run_date > today,
+        )
+        try:
+            run.existing_jobs = (
+                list_staged_jobs(run.file_prefix)
+                if run.staged
+                else list_published_jobs(run)
+            )
+            process_national_days(
+                run,
+                national_days_config,
+                response_type,
+                'hd',
+                max_workers=backfill_max_concurrency,
+            )
+        except Exception as e:
+            logger.error(
+                'Backfill day failed',
+                backfill_id=backfill_id,
+                date=day,
+                incomplete_days=run.failed_days,
+                error=str(e),
+            )
+            # Days cut short by the deadline are picked up by the next run
+            if has_time_for_generation(context):
+                failed.append(day)
+            else:
+                remaining.append(day)
+            continue
+
+        checkpoint.record_day(day)
+        completed.append(day)
+        stage_metrics.count('BackfillDaysCompleted')
+
+    logger.info(
+        'Backfill finished',
+        backfill_id=backfill_id,
+        completed=len(completed),
+        failed=failed,
+        remaining=remaining,
+    )
+    return {
+        'statusCode': 500 if failed or remaining else 200,
+        'body': json.dumps(
+            {
+                'backfill_id': backfill_id,
+                'completed': completed,
+                'failed': failed,
+                'remaining': remaining,
+            }
+        ),
+    }
+
+
+def parse_weekdays(names):
+    return {
+        WEEKDAYS.index(name.strip().lower()[:3])
+        for name in names.split(',')
+        if name.strip()
+    }
+
+
+def lookahead_dates(today, count, weekdays=publish_weekdays):
+    """Return the next count publishing days after today."""
+    publishing_days = parse_weekdays(weekdays)
+    dates = []
+    run_date = today
+    while publishing_days and len(dates) < count:
+        run_date += datetime.timedelta(days=1)
+        if run_date.weekday() in publishing_days:
+            dates.append(run_date)
+    return dates
+
+
+def list_staged_jobs(file_prefix):
+    return {
+        obj['Key'][len(staging_prefix) :]
+        for obj in list_bucket_objects(bucket_name, f'{staging_prefix}{file_prefix}_')
+    }
+
+
+def run_lookahead(event, context, response_type=response_format):
+    """
+    Render the images for the next publishing days into the staging prefix.
+
+    Every staged image gets a ready job record that publish promotes on its
+    day. Jobs an earlier run already staged are skipped, so the schedule can
+    run this daily and each run only renders the newest day.
+    """
+    try:
+        dates = lookahead_dates(
+            datetime.date.today(), int(event.get('days_ahead', lookahead_days))
+        )
+    except (TypeError, ValueError) as e:
+        logger.error('Invalid lookahead request', error=str(e))
+        return {
+            'statusCode': 400,
+            'body': json.dumps(f'Invalid lookahead request: {e}'),
+        }
+
+    staged, failed, remaining = [], [], []
+    for run_date in dates:
+        day = run_date.isoformat()
+        if remaining or not has_time_for_generation(context):
+            remaining.append(day)
+            continue
+
+        run = RunContext.for_date(
+            datetime.datetime.combine(run_date, datetime.time()),
+            context.get_remaining_time_in_millis,
+            staged=True,
+        )
+        try:
+            run.existing_jobs = list_staged_jobs(run.file_prefix)
+            process_national_days(run, national_days_config, response_type, 'hd')
+        except Exception as e:
+            logger.error(
+                'Lookahead day failed',
+                date=day,
+                incomplete_days=run.failed_days,
+                error=str(e),
+            )
+            # The next scheduled run picks up whatever is still missing
+            if has_time_for_generation(context):
+                failed.append(day)
+            else:
+                remaining.append(day)
+            continue
+
+        staged.append(day)
+
+    logger.info('Lookahead finished', staged=staged, failed=failed, remaining=remaining)
+    return {
+        'statusCode': 500 if failed or remaining else 200,
+        'body': json.dumps(
+            {'staged': staged, 'failed': failed, 'remaining': remaining}
+        ),
+    }
+
 
-            upload_image_to_s3(filename, bucket_name)
-            insert_dynamodb_record(filename.replace('/tmp/', ''), 'uploaded')
+def find_ready_records(file_prefix):
+    """Return the ready job records for one day from the status index."""
+    paginator = dynamodb_client.get_paginator('query')
+    items = []
+    for page in paginator.paginate(
+        TableName=dynamodb_table_name,
+        IndexName=status_index_name,
+        KeyConditionExpression='#status = :ready',
+        FilterExpression='begins_with(job_id, :prefix)',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':ready': {'S': 'ready'},
+            ':prefix': {'S': f'{file_prefix}_'},
+        },
+    ):
+        items.extend(page.get('Items', []))
+    return items
+
+
+def list_published_jobs(run):
+    # Job ids repeat every year, so only objects written on or after the
+    # run's day count
+    return {
+        obj['Key'][len('images/') :]
+        for obj in list_bucket_objects(bucket_name, f'images/{run.file_prefix}_')
+        if obj['LastModified'].date() >= run.run_time.date()
+    }
+
+
+def promote_staged_image(item, published):
+    """
+    Copy a staged image into images/, which triggers twitter_post, then mark
+    its record uploaded and delete the staged copy.
+
+    Each step can be repeated, so a publish that failed part-way is simply
+    run again.
+    """
+    job_id = item['job_id']['S']
+    staged_key = f'{staging_prefix}{job_id}'
+    if job_id not in published:
+        # Keeps the record-timestamp metadata twitter_post reads
+        with stage_metrics.track('Promote'):
+            s3_client.copy_object(
+                Bucket=bucket_name,
+                Key=f'images/{job_id}',
+                CopySource={'Bucket': bucket_name, 'Key': staged_key},
+                MetadataDirective='COPY',
+            )
+
+    # twitter_post may already have moved the record on to posted. The
+    # record's timestamp is from staging time, so uploaded_at tells the
+    # stuck-job sweep when the image actually went out.
+    try:
+        dynamodb_client.update_item(
+            TableName=dynamodb_table_name,
+            Key={'job_id': item['job_id'], 'timestamp': item['timestamp']},
+            UpdateExpression='SET #status = :uploaded, uploaded_at = :now REMOVE #ttl',
+            ConditionExpression='#status = :ready',
+            ExpressionAttributeNames={'#status': 'status', '#ttl': 'ttl'},
+            ExpressionAttributeValues={
+                ':uploaded': {'S': 'uploaded'},
+                ':ready': {'S': 'ready'},
+                ':now': {'N': str(int(datetime.datetime.now().timestamp()))},
+            },
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+    s3_client.delete_object(Bucket=bucket_name, Key=staged_key)
+    manifest_entry = json.loads(item['manifest_entry']['S'])
+    manifest_entry['lastModified'] = datetime.datetime.now().isoformat()
+    return job_id, manifest_entry
+
+
+def run_publish(event, context, response_type=response_format):
+    """
+    Publish today's images: promote what lookahead staged, then generate
+    anything it did not, so a missed lookahead only costs latency.
+    """
+    run = RunContext.for_date(
+        datetime.datetime.now(), context.get_remaining_time_in_millis
+    )
+    logger.info('Publishing staged images', date=run.file_prefix)
+
+    # Without knowing what is already out, generating could post it twice,
+    # so a failed lookup is left to the invocation's retry
+    try:
+        ready = find_ready_records(run.file_prefix)
+        published = list_published_jobs(run)
+    except Exception as e:
+        logger.error('Staged image lookup failed', error=str(e))
+        return {
+            'statusCode': 500,
+            'body': json.dumps('Error looking up staged images'),
+        }
+
+    unpublished = []
+    if ready:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrent_generations, len(ready)))
+        ) as executor:
+            futures = {
+                executor.submit(promote_staged_image, item, published): item
+                for item in ready
+            }
+            for future in as_completed(futures):
+                try:
+                    job_id, manifest_entry = future.result()
+                except Exception as e:
+                    job_id = futures[future]['job_id']['S']
+                    logger.error(
+                        'Staged image promotion failed', job_id=job_id, error=str(e)
+                    )
+                    unpublished.append(job_id)
+                    continue
+                run.record_success(job_id)
+                run.record_manifest_entry(manifest_entry)
+                stage_metrics.count('ImagesPromoted')
+        update_gallery_manifest(run)
+
+    # A failed promotion may already have copied its image into images/, so
+    # every staged job is left to a publish retry rather than generated again
+    generated = RunContext.for_date(run.run_time, context.get_remaining_time_in_millis)
+    generated.existing_jobs = published | {item['job_id']['S'] for item in ready}
+    try:
+        process_national_days(generated, national_days_config, response_type, 'hd')
+    except Exception as e:
+        logger.error(
+            'Image generation at publish failed',
+            error=str(e),
+            incomplete_days=generated.failed_days,
+        )
+
+    logger.info(
+        'Publish finished',
+        promoted=len(run.job_ids),
+        unpublished=len(unpublished),
+        generated=len(generated.job_ids),
+        incomplete_days=generated.failed_days,
+    )
+    return {
+        'statusCode': 500 if unpublished or generated.failed_days else 200,
+        'body': json.dumps(
+            {
+                'date': run.file_prefix,
+                'promoted': run.job_ids,
+                'unpublished': sorted(unpublished),
+                'generated': generated.job_ids,
+                'incomplete_days': generated.failed_days,
+            }
+        ),
+    }
+
+
+def initialize():
+    """
+    Run the cold-start work concurrently instead of one call after another.
+
+    The OpenAI SDK import and secret read, the national-days.json download
+    and the Pillow import overlap, so init takes about as long as the
+    slowest of them. Only used for the eager init phase.
+    """
+    for aws_client in (secrets_client, s3_client, dynamodb_client):
+        aws_client.resolve()
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        client_future = executor.submit(client.resolve)
+        config_future = executor.submit(national_days_config.ensure_fresh)
+        image_future = executor.submit(Image.resolve)
+
+    client_future.result()
+    image_future.result()
+
+    # The handler retries the config download, so a failure here only
+    # delays it to the first invocation
+    try:
+        config_future.result()
+    except Exception as e:
+        logger.warning('national-days.json prefetch failed', error=str(e))
+
+
+if startup_mode != 'lazy':
+    initialize()
+
+
+@logger.inject_lambda_context
+@metrics.log_metrics(capture_cold_start_metric=stage_metrics_enabled)
+@publish_connection_stats
+def handler(event, context):
+    # Invoke with {"action": "rebuild_manifest"} to regenerate the gallery
+    # manifest from the bucket
+    if event.get('action') == 'rebuild_manifest':
+        return rebuild_gallery_manifest()
+
+    # Both only check their TTLs on a warm container; a stale secret is
+    # refreshed in the background
+    openai_api_key.get()
+    national_days_config.ensure_fresh()
+
+    response_type = event.get('response_format', response_format)
+    if response_type not in RESPONSE_FORMATS:
+        logger.error('Unsupported response format', response_format=response_type)
+        return {
+            'statusCode': 400,
+            'body': json.dumps(f'Unsupported response_format: {response_type}'),
+        }
+
+    # Invoke with {"action": "backfill", "start_date": "2025-10-01",
+    # "end_date": "2025-10-31"} or {"action": "backfill", "days":
+    # [["october", 31]]} to generate images for other dates
+    if event.get('action') == 'backfill':
+        return run_backfill(event, context, response_type)
+
+    # The lookahead schedule invokes {"action": "lookahead"} to stage the
+    # next publishing days, and the posting schedule {"action": "publish"}
+    if event.get('action') == 'lookahead':
+        return run_lookahead(event, context, response_type)
+    if event.get('action') == 'publish':
+        return run_publish(event, context, response_type)
+
+    run = RunContext.for_date(
+        datetime.datetime.now(), context.get_remaining_time_in_millis
+    )
+
+    try:
+        logger.info('Starting image generation workflow', date=run.file_prefix)
+        # A follow-up run after a partial failure only redoes the days that
+        # are not out yet; uploading the rest again would post them twice
+        run.existing_jobs = list_published_jobs(run)
+        process_national_days(run, national_days_config, response_type, 'hd')
 
         logger.info(
-            'Image generation workflow completed', images_generated=len(b64_image_list)
+            'Image generation workflow completed', images_generated=len(run.job_ids)
         )
         return {
             'statusCode': 200,
             'body': json.dumps('Images generated and uploaded to S3'),
         }
     except Exception as e:
-        logger.error('Image generation workflow failed', error=str(e))
-        return {'statusCode': 500, 'body': json.dumps('Error generating images')}
+        # Finished images are already uploaded; report the days a follow-up
+        # run still needs to generate
+        logger.error(
+            'Image generation workflow failed',
+            error=str(e),
+            completed=run.job_ids,
+            incomplete_days=run.failed_days,
+        )
+        return {
+            'statusCode': 500,
+            'body': json.dumps(
+                {
+                    'message': 'Error generating images',
+                    'date': run.file_prefix,
+                    'completed': run.job_ids,
+                    'incomplete_days': run.failed_days,
+                }
+            ),
+        }
@@ -1,61 +1,725 @@
+import functools
+import importlib
 import json
+import logging
+import mimetypes
 import os
 import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from io import BytesIO
 
-import boto3
-import tweepy
-from aws_lambda_powertools import Logger
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+from botocore.exceptions import ClientError
 
 logger = Logger(service='twitter_post_lambda')
+metrics = Metrics(
+    namespace=os.environ.get('POWERTOOLS_METRICS_NAMESPACE', 'SpookyDays'),
+    service='twitter_post_lambda',
+)
 
 twitter_secret_arn = os.environ['TWITTER_SECRET_ARN']
 dynamodb_table_name = os.environ['DYNAMODB_TABLE_NAME']
 image_bucket_name = os.environ['IMAGE_BUCKET_NAME']
+# image_gen batches its job records, so a record can land shortly after the
+# S3 object that triggered this function
+record_lookup_attempts = int(os.environ.get('RECORD_LOOKUP_ATTEMPTS', '5'))
+record_lookup_delay_seconds = float(os.environ.get('RECORD_LOOKUP_DELAY_SECONDS', '2'))
+# Maximum number of records in a batch that are posted at the same time
+max_concurrent_posts = int(os.environ.get('MAX_CONCURRENT_POSTS', '3'))
+# Images larger than this are sent with the chunked media upload flow; keep it
+# at or below the chunk size so large images are split into segments
+chunked_upload_threshold_bytes = int(
+    os.environ.get('CHUNKED_UPLOAD_THRESHOLD_BYTES', str(1024 * 1024))
+)
+# Size of each APPEND segment in the chunked media upload (max 5 MB)
+media_chunk_size_bytes = int(os.environ.get('MEDIA_CHUNK_SIZE_BYTES', str(1024 * 1024)))
+# APPEND segments sent at the same time; set to 1 to upload them in order
+max_concurrent_media_chunks = int(os.environ.get('MAX_CONCURRENT_MEDIA_CHUNKS', '3'))
+# Attempts per APPEND segment before the upload is abandoned
+media_chunk_attempts = int(os.environ.get('MEDIA_CHUNK_ATTEMPTS', '3'))
+# Connections each HTTP client keeps open per host; enough for every chunk
+# of every concurrent post and never fewer than boto3's default of 10
+http_pool_size = int(
+    os.environ.get(
+        'HTTP_POOL_SIZE',
+        str(max(10, max_concurrent_posts * max_concurrent_media_chunks)),
+    )
+)
+# Longest time to wait for Twitter to finish processing uploaded media
+media_processing_timeout_seconds = int(
+    os.environ.get('MEDIA_PROCESSING_TIMEOUT_SECONDS', '60')
+)
+
+# Key of the DynamoDB item that holds the shared tweet rate-limit state
+rate_limit_key = os.environ.get('RATE_LIMIT_KEY', 'rate-limit#create_tweet')
+
+# How long a claimed job is reserved for the invocation posting it. Keep it
+# above the function timeout, so a lease only expires once its holder is gone
+post_lease_seconds = int(os.environ.get('POST_LEASE_SECONDS', '300'))
+# Failed posting attempts before a job is marked failed for good
+max_post_attempts = int(os.environ.get('MAX_POST_ATTEMPTS', '3'))
+
+# Job records by status and timestamp
+status_index_name = os.environ.get('STATUS_INDEX_NAME', 'status-timestamp-index')
+# Uploaded jobs not posted after this long are re-driven by {"action": "sweep"}
+sweep_stuck_after_minutes = int(os.environ.get('SWEEP_STUCK_AFTER_MINUTES', '30'))
+# Stuck jobs older than this are marked failed instead, since their day is over
+sweep_max_age_hours = int(os.environ.get('SWEEP_MAX_AGE_HOURS', '12'))
+# Stuck jobs re-driven at the same time
+sweep_max_concurrency = int(os.environ.get('SWEEP_MAX_CONCURRENCY', '2'))
+# Job records read from the status index per page
+sweep_page_size = int(os.environ.get('SWEEP_PAGE_SIZE', '25'))
+# A sweep stops starting jobs this close to the Lambda timeout
+sweep_time_margin_ms = int(os.environ.get('SWEEP_TIME_MARGIN_MS', '20000'))
+
+# 'eager' imports the SDKs and builds clients while the Lambda initializes,
+# 'lazy' defers both until an invocation first needs them
+startup_mode = os.environ.get('STARTUP_MODE', 'eager')
+# How long cached credentials are served before they are re-read in the
+# background
+secret_ttl_seconds = int(os.environ.get('SECRET_TTL_SECONDS', '3600'))
+# 'off' stops the per-stage EMF metrics, including the cold start metric
+stage_metrics_enabled = os.environ.get('STAGE_METRICS', 'on') != 'off'
+
+# Large images reach images/ through multipart uploads (upload_file in
+# image_gen's 'file' mode), which S3 reports as a separate event, and
+# staged lookahead images are published by copying them into images/
+SUPPORTED_EVENTS = {
+    'ObjectCreated:Put',
+    'ObjectCreated:CompleteMultipartUpload',
+    'ObjectCreated:Copy',
+}
+
+
+class LazyProxy:
+    """
+    Stand-in for a module or client that is created on first attribute access.
+
+    In eager startup mode initialize() resolves every proxy during the
+    Lambda init phase, so import-time behaviour (including failures) is
+    unchanged.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        with self._lock:
+            if self._target is None:
+                self._target = self._factory()
+        return self._target
+
+    def invalidate(self):
+        # The next attribute access builds a fresh target
+        with self._lock:
+            self._target = None
+
+    def __getattr__(self, name):
+        target = self._target if self._target is not None else self.resolve()
+        return getattr(target, name)
+
+
+def lazy_import(module_name):
+    return LazyProxy(lambda: importlib.import_module(module_name))
+
+
+boto3 = lazy_import('boto3')
+botocore_config = lazy_import('botocore.config')
+botocore_session = lazy_import('botocore.session')
+requests = lazy_import('requests')
+tweepy = lazy_import('tweepy')
+
+
+@dataclass
+class StageRecord:
+    # Bytes the stage moved, set by the tracked block when it is known
+    bytes: int | None = None
+
+
+class StageMetrics:
+    """
+    Per-stage metrics published in CloudWatch Embedded Metric Format.
+
+    track() times one stage and emits <stage>Duration, <stage>Bytes when the
+    block sets bytes on the yielded record, and <stage>Errors when it
+    raises. Powertools buffers the values and log_metrics writes them once
+    per invocation, so the hot path only appends to a dict. When disabled
+    both methods do nothing.
+    """
+
+    def __init__(self, metrics, enabled):
+        self.metrics = metrics
+        self.enabled = enabled
+
+    @contextmanager
+    def track(self, stage):
+        record = StageRecord()
+        if not self.enabled:
+            yield record
+            return
+
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception:
+            self.count(f'{stage}Errors')
+            raise
+        finally:
+            self.metrics.add_metric(
+                name=f'{stage}Duration',
+                unit=MetricUnit.Milliseconds,
+                value=round((time.perf_counter() - started) * 1000, 2),
+            )
+            if record.bytes is not None:
+                self.metrics.add_metric(
+                    name=f'{stage}Bytes', unit=MetricUnit.Bytes, value=record.bytes
+                )
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.metrics.add_metric(name=name, unit=MetricUnit.Count, value=value)
+
+
+stage_metrics = StageMetrics(metrics, stage_metrics_enabled)
+
+
+class ConnectionStats:
+    """
+    Counts HTTP requests and newly opened connections per host.
+
+    Requests that did not open a connection reused a pooled one. publish()
+    reports the counts since the previous call, once per invocation.
+    """
 
-# Retrieve Twitter credentials from Secrets Manager
-secrets_client = boto3.client('secretsmanager')
-try:
-    secret_response = secrets_client.get_secret_value(SecretId=twitter_secret_arn)
-    twitter_credentials = json.loads(secret_response['SecretString'])
-    access_token = twitter_credentials['ACCESS_TOKEN']
-    access_token_secret = twitter_credentials['ACCESS_TOKEN_SECRET']
-    api_key = twitter_credentials['API_KEY']
-    api_secret = twitter_credentials['API_SECRET']
-    bearer_token = twitter_credentials['BEARER_TOKEN']
-except secrets_client.exceptions.ResourceNotFoundException:
-    logger.error('Secret not found in Secrets Manager')
-    raise
-except secrets_client.exceptions.InvalidRequestException as e:
-    logger.error('Invalid request to Secrets Manager', error=str(e))
-    raise
-except secrets_client.exceptions.InvalidParameterException as e:
-    logger.error('Invalid parameter in Secrets Manager request', error=str(e))
-    raise
-except json.JSONDecodeError as e:
-    logger.error('Invalid JSON in secret', error=str(e))
-    raise
-except KeyError as e:
-    logger.error('Missing required credential in secret', error=str(e))
-    raise
-except Exception as e:
-    logger.error('Failed to retrieve secret from Secrets Manager', error=str(e))
-    raise
-
-twitter = tweepy.Client(
-    bearer_token, api_key, api_secret, access_token, access_token_secret
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, host, requests=0, connections=0):
+        with self._lock:
+            counts = self._counts.setdefault(host, [0, 0])
+            counts[0] += requests
+            counts[1] += connections
+
+    def collect(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        return {
+            host: {
+                'requests': requests,
+                'new_connections': connections,
+                'reused': max(requests - connections, 0),
+            }
+            for host, (requests, connections) in counts.items()
+        }
+
+    def publish(self):
+        hosts = self.collect()
+        if not hosts:
+            return
+        logger.info('HTTP connection reuse', hosts=hosts)
+        for name, field_name in (
+            ('HTTPRequests', 'requests'),
+            ('HTTPConnectionsOpened', 'new_connections'),
+            ('HTTPConnectionsReused', 'reused'),
+        ):
+            stage_metrics.count(name, sum(c[field_name] for c in hosts.values()))
+
+
+class Urllib3ConnectionFilter(logging.Filter):
+    """
+    Counts the requests and new connections urllib3 logs at DEBUG.
+
+    urllib3 carries the boto3 and requests traffic. The filter lowers its
+    logger to DEBUG to see every record, then drops anything below the
+    previous level so the log output is unchanged.
+    """
+
+    def __init__(self, stats, level):
+        super().__init__()
+        self.stats = stats
+        self.level = level
+
+    def filter(self, record):
+        message = record.msg if isinstance(record.msg, str) else ''
+        if message.startswith('Starting new'):
+            self.stats.record(record.args[1], connections=1)
+        elif message.startswith('Resetting dropped connection'):
+            self.stats.record(record.args[0], connections=1)
+        elif message.startswith('%s://%s:%s "'):
+            self.stats.record(record.args[1], requests=1)
+        return record.levelno >= self.level
+
+
+def count_urllib3_connections(stats):
+    urllib3_logger = logging.getLogger('urllib3.connectionpool')
+    level = urllib3_logger.getEffectiveLevel()
+    # A re-imported module replaces its predecessor's filter
+    for existing in list(urllib3_logger.filters):
+        if type(existing).__name__ == Urllib3ConnectionFilter.__name__:
+            urllib3_logger.removeFilter(existing)
+            level = existing.level
+    urllib3_logger.addFilter(Urllib3ConnectionFilter(stats, level))
+    urllib3_logger.setLevel(logging.DEBUG)
+
+
+def publish_connection_stats(handler):
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            connection_stats.publish()
+
+    return wrapper
+
+
+connection_stats = ConnectionStats()
+count_urllib3_connections(connection_stats)
+
+
+class SecretCache:
+    """
+    In-process cache for a secret read from Secrets Manager.
+
+    The first get() blocks on the loader. Later calls return the cached
+    value at once; when it is older than the TTL a single background thread
+    re-reads it, so a rotated secret is picked up without an invocation
+    waiting on Secrets Manager. A failed refresh keeps serving the cached
+    value and is retried on the next get(). on_change runs after a refresh
+    returns a different value.
+    """
+
+    def __init__(self, loader, ttl_seconds, on_change=None):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.on_change = on_change
+        self._value = None
+        self._fetched_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._value is None:
+                self._value = self.loader()
+                self._fetched_at = time.monotonic()
+            elif (
+                not self._refreshing
+                and time.monotonic() - self._fetched_at >= self.ttl_seconds
+            ):
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+            return self._value
+
+    def _refresh(self):
+        try:
+            value = self.loader()
+        except Exception as e:
+            logger.warning('Secret refresh failed, keeping cached value', error=str(e))
+            with self._lock:
+                self._refreshing = False
+            return
+
+        with self._lock:
+            changed = value != self._value
+            self._value = value
+            self._fetched_at = time.monotonic()
+            self._refreshing = False
+
+        if changed:
+            logger.info('Secret changed since it was cached')
+            if self.on_change:
+                self.on_change()
+
+
+def load_twitter_credentials():
+    # Retrieve Twitter credentials from Secrets Manager
+    try:
+        secret_response = secrets_client.get_secret_value(SecretId=twitter_secret_arn)
+        twitter_credentials = json.loads(secret_response['SecretString'])
+        return {
+            'access_token': twitter_credentials['ACCESS_TOKEN'],
+            'access_token_secret': twitter_credentials['ACCESS_TOKEN_SECRET'],
+            'api_key': twitter_credentials['API_KEY'],
+            'api_secret': twitter_credentials['API_SECRET'],
+            'bearer_token': twitter_credentials['BEARER_TOKEN'],
+        }
+    except secrets_client.exceptions.ResourceNotFoundException:
+        logger.error('Secret not found in Secrets Manager')
+        raise
+    except secrets_client.exceptions.InvalidRequestException as e:
+        logger.error('Invalid request to Secrets Manager', error=str(e))
+        raise
+    except secrets_client.exceptions.InvalidParameterException as e:
+        logger.error('Invalid parameter in Secrets Manager request', error=str(e))
+        raise
+    except json.JSONDecodeError as e:
+        logger.error('Invalid JSON in secret', error=str(e))
+        raise
+    except KeyError as e:
+        logger.error('Missing required credential in secret', error=str(e))
+        raise
+    except Exception as e:
+        logger.error('Failed to retrieve secret from Secrets Manager', error=str(e))
+        raise
+
+
+def reset_twitter_clients():
+    twitter.invalidate()
+    api.invalidate()
+
+
+# Both Twitter clients share a single cached Secrets Manager read, and
+# rotated credentials rebuild them on their next use
+twitter_credentials = SecretCache(
+    load_twitter_credentials, secret_ttl_seconds, on_change=reset_twitter_clients
 )
-auth = tweepy.OAuth1UserHandler(api_key, api_secret, access_token, access_token_secret)
-api = tweepy.API(auth)
 
-dynamodb = boto3.client('dynamodb')
-s3_client = boto3.client('s3')
+
+@functools.cache
+def persistent_http_adapter_class():
+    """
+    Return an adapter class whose pool outlives Session.close().
+
+    tweepy.API closes its session after every request, which would drop
+    every pooled connection and open a new one for each media upload. The
+    class is built on first use so lazy startup does not import requests.
+    """
+
+    class PersistentHTTPAdapter(requests.adapters.HTTPAdapter):
+        def close(self):
+            pass
+
+    return PersistentHTTPAdapter
+
+
+def mount_pooled_adapter(session):
+    # tweepy's sessions keep requests' default pool of 10 connections per
+    # host, fewer than the concurrent chunk uploads can use
+    adapter_class = persistent_http_adapter_class()
+    session.mount('https://', adapter_class(pool_maxsize=http_pool_size))
+
+
+def build_twitter_client():
+    credentials = twitter_credentials.get()
+    # Return raw responses so the x-rate-limit-* headers are available
+    twitter_client = tweepy.Client(
+        credentials['bearer_token'],
+        credentials['api_key'],
+        credentials['api_secret'],
+        credentials['access_token'],
+        credentials['access_token_secret'],
+        return_type=requests.Response,
+    )
+    mount_pooled_adapter(twitter_client.session)
+    return twitter_client
+
+
+def build_twitter_api():
+    credentials = twitter_credentials.get()
+    auth = tweepy.OAuth1UserHandler(
+        credentials['api_key'],
+        credentials['api_secret'],
+        credentials['access_token'],
+        credentials['access_token_secret'],
+    )
+    twitter_api = tweepy.API(auth)
+    mount_pooled_adapter(twitter_api.session)
+    return twitter_api
+
+
+def configure_aws_transport():
+    """
+    Give every boto3 client a pool large enough for all workers, with TCP
+    keep-alive so pooled connections survive between warm invocations.
+    """
+    session = botocore_session.get_session()
+    session.set_default_client_config(
+        botocore_config.Config(max_pool_connections=http_pool_size, tcp_keepalive=True)
+    )
+    boto3.setup_default_session(botocore_session=session)
+    return session
+
+
+aws_transport = LazyProxy(configure_aws_transport)
+
+# Client creation on boto3's shared default session is not thread-safe, so
+# clients first used from worker threads are created one at a time
+aws_client_lock = threading.Lock()
+
+
+def create_aws_client(service_name):
+    aws_transport.resolve()
+    with aws_client_lock:
+        return boto3.client(service_name)
+
+
+secrets_client = LazyProxy(lambda: create_aws_client('secretsmanager'))
+twitter = LazyProxy(build_twitter_client)
+api = LazyProxy(build_twitter_api)
+dynamodb = LazyProxy(lambda: create_aws_client('dynamodb'))
+s3_client = LazyProxy(lambda: create_aws_client('s3'))
+sqs_client = LazyProxy(lambda: create_aws_client('sqs'))
+
+
+class PostRateLimiter:
+    """
+    Token bucket for tweet creation, shared across invocations through
+    DynamoDB.
+
+    The bucket is refilled from the x-rate-limit-remaining and
+    x-rate-limit-reset headers on every X API response. Each post spends a
+    token with a conditional update. Once the budget is gone, acquire()
+    returns the number of seconds until the window resets so the caller
+    can defer the post instead of spending an API call on a 429. Until the
+    first response has recorded a reset time the bucket is treated as
+    unknown and posts go through.
+    """
+
+    def __init__(self, table_name, key):
+        self.table_name = table_name
+        self.key = {'job_id': {'S': key}, 'timestamp': {'N': '0'}}
+
+    def acquire(self):
+        now = int(time.time())
+        try:
+            dynamodb.update_item(
+                TableName=self.table_name,
+                Key=self.key,
+                UpdateExpression=(
+                    'SET remaining = if_not_exists(remaining, :one) - :one'
+                ),
+                ConditionExpression=(
+                    'attribute_not_exists(remaining) OR remaining > :zero '
+                    'OR attribute_not_exists(reset_at) OR reset_at <= :now'
+                ),
+                ExpressionAttributeValues={
+                    ':one': {'N': '1'},
+                    ':zero': {'N': '0'},
+                    ':now': {'N': str(now)},
+                },
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+            return 0
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                # Fail open: an unavailable limiter must not stop posting
+                logger.warning('Rate limiter unavailable', error=str(e))
+                return 0
+            reset_at = int(e.response.get('Item', {}).get('reset_at', {}).get('N', now))
+            return max(reset_at - now, 1)
+        except Exception as e:
+            logger.warning('Rate limiter unavailable', error=str(e))
+            return 0
+
+    def refund(self):
+        # Give back a token that was spent without reaching the X API
+        try:
+            dynamodb.update_item(
+                TableName=self.table_name,
+                Key=self.key,
+                UpdateExpression='SET remaining = remaining + :one',
+                ConditionExpression='attribute_exists(remaining)',
+                ExpressionAttributeValues={':one': {'N': '1'}},
+            )
+        except Exception as e:
+            logger.warning('Failed to refund rate limit token', error=str(e))
+
+    def record(self, headers):
+        try:
+            remaining = int(headers.get('x-rate-limit-remaining'))
+            reset_at = int(headers.get('x-rate-limit-reset'))
+        except (TypeError, ValueError):
+            return
+
+        try:
+            dynamodb.update_item(
+                TableName=self.table_name,
+                Key=self.key,
+                UpdateExpression='SET remaining = :remaining, reset_at = :reset_at',
+                ExpressionAttributeValues={
+                    ':remaining': {'N': str(remaining)},
+                    ':reset_at': {'N': str(reset_at)},
+                },
+            )
+        except Exception as e:
+            logger.warning('Failed to record rate limit', error=str(e))
+            return
+        logger.info('Rate limit updated', remaining=remaining, reset_at=reset_at)
+
+
+class PostDeferredError(Exception):
+    """Raised when the X API budget is exhausted and a post must wait."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Rate limit reached, retry in {retry_after} seconds')
+        self.retry_after = retry_after
+
+
+class JobUnavailableError(Exception):
+    """Raised when a job is finished or another invocation holds its lease."""
+
+    def __init__(self, status, retry_after=0):
+        super().__init__(f'Job is {status}')
+        self.status = status
+        self.retry_after = retry_after
 
 
-def post_image_to_twitter(text_content, file_path):
-    myMedia = file_path
-    media = api.media_upload(filename=myMedia)
-    media_id = media.media_id
-    twitter.create_tweet(text=text_content, media_ids=[media_id])
+rate_limiter = PostRateLimiter(dynamodb_table_name, rate_limit_key)
+
+
+def is_retryable_twitter_error(error):
+    # 4xx responses other than rate limiting will not succeed on retry
+    if isinstance(error, (tweepy.TwitterServerError, tweepy.TooManyRequests)):
+        return True
+    return not isinstance(error, tweepy.HTTPException)
+
+
+def append_media_chunk(media_id, filename, chunk, segment_index):
+    for attempt in range(1, media_chunk_attempts + 1):
+        try:
+            api.chunked_upload_append(media_id, (filename, chunk), segment_index)
+            return
+        except tweepy.TweepyException as e:
+            if attempt == media_chunk_attempts or not is_retryable_twitter_error(e):
+                logger.error(
+                    'Media chunk upload failed',
+                    media_id=media_id,
+                    segment_index=segment_index,
+                    attempts=attempt,
+                    error=str(e),
+                )
+                raise
+            logger.warning(
+                'Retrying media chunk upload',
+                media_id=media_id,
+                segment_index=segment_index,
+                attempt=attempt,
+                error=str(e),
+            )
+            stage_metrics.count('MediaChunkRetries')
+            time.sleep(0.5 * 2 ** (attempt - 1))
+
+
+def wait_for_media_processing(media):
+    processing_info = getattr(media, 'processing_info', None)
+    deadline = time.monotonic() + media_processing_timeout_seconds
+
+    while processing_info and processing_info.get('state') in (
+        'pending',
+        'in_progress',
+    ):
+        check_after_secs = processing_info.get('check_after_secs', 1)
+        if time.monotonic() + check_after_secs > deadline:
+            raise TimeoutError(f'Media {media.media_id} is still processing')
+        time.sleep(check_after_secs)
+        media = api.get_media_upload_status(media.media_id)
+        processing_info = getattr(media, 'processing_info', None)
+
+    if processing_info and processing_info.get('state') == 'failed':
+        raise RuntimeError(
+            f'Media {media.media_id} processing failed: {processing_info.get("error")}'
+        )
+
+    return media
+
+
+def upload_media_chunked(filename, image_bytes):
+    """
+    Upload media with the INIT/APPEND/FINALIZE flow.
+
+    APPEND segments are sent concurrently and each one is retried on its
+    own, so a flaky connection costs one chunk rather than the whole image.
+    """
+    media_type = mimetypes.guess_type(filename)[0] or 'image/jpeg'
+    media_id = api.chunked_upload_init(
+        len(image_bytes), media_type, media_category='tweet_image'
+    ).media_id
+
+    segments = [
+        (segment_index, image_bytes[start : start + media_chunk_size_bytes])
+        for segment_index, start in enumerate(
+            range(0, len(image_bytes), media_chunk_size_bytes)
+        )
+    ]
+    logger.info(
+        'Uploading media in chunks',
+        media_id=media_id,
+        segments=len(segments),
+        size=len(image_bytes),
+    )
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrent_media_chunks, len(segments)))
+    ) as executor:
+        futures = [
+            executor.submit(append_media_chunk, media_id, filename, chunk, index)
+            for index, chunk in segments
+        ]
+        for future in as_completed(futures):
+            future.result()
+
+    media = api.chunked_upload_finalize(media_id)
+    return wait_for_media_processing(media)
+
+
+def retry_after_reset(headers):
+    reset_at = int(headers.get('x-rate-limit-reset', time.time()))
+    return max(reset_at - int(time.time()), 1)
+
+
+def post_image_to_twitter(text_content, filename, image_bytes):
+    # Spend a token before any API call so an exhausted budget costs nothing
+    retry_after = rate_limiter.acquire()
+    if retry_after:
+        raise PostDeferredError(retry_after)
+
+    # The media endpoints have rate limits of their own, so their headers
+    # never update the create_tweet bucket and a failed upload spends nothing
+    try:
+        # tweepy only uses filename to guess the media type when a file
+        # object is passed, so the image never touches the local disk
+        with stage_metrics.track('MediaUpload') as stage:
+            if len(image_bytes) > chunked_upload_threshold_bytes:
+                media = upload_media_chunked(filename, image_bytes)
+            else:
+                media = api.media_upload(filename=filename, file=BytesIO(image_bytes))
+            stage.bytes = len(image_bytes)
+    except tweepy.TooManyRequests as e:
+        rate_limiter.refund()
+        raise PostDeferredError(retry_after_reset(e.response.headers)) from e
+    except Exception:
+        rate_limiter.refund()
+        raise
+
+    try:
+        with stage_metrics.track('CreateTweet'):
+            response = twitter.create_tweet(
+                text=text_content, media_ids=[media.media_id]
+            )
+    except tweepy.TooManyRequests as e:
+        rate_limiter.record(e.response.headers)
+        raise PostDeferredError(retry_after_reset(e.response.headers)) from e
+    except Exception as e:
+        # A response with rate-limit headers means the post was counted
+        headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+        if 'x-rate-limit-remaining' in headers:
+            rate_limiter.record(headers)
+        else:
+            rate_limiter.refund()
+        raise
+
+    rate_limiter.record(getattr(response, 'headers', {}))
+    return response
 
 
 def insert_space_before_capital(s):
@@ -64,9 +728,9 @@ def insert_space_before_capital(s):
     return result
 
 
-def update_dynamodb_record(table_name, job_id, caption, status='posted'):
-    try:
-        # Query to get the existing record's timestamp
+def find_record_timestamp(table_name, job_id):
+    # Query to get the existing record's timestamp
+    for attempt in range(1, record_lookup_attempts + 1):
         query_response = dynamodb.query(
             TableName=table_name,
             KeyConditionExpression='job_id = :job_id',
@@ -74,30 +738,174 @@ def update_dynamodb_record(table_name, job_id, caption, status='posted'):
             Limit=1,
             ScanIndexForward=False,
         )
+        if query_response.get('Items') or attempt == record_lookup_attempts:
+            break
+        logger.info('Waiting for DynamoDB record', job_id=job_id, attempt=attempt)
+        time.sleep(record_lookup_delay_seconds * 2 ** (attempt - 1))
 
-        if not query_response.get('Items'):
-            logger.error('No record found for job_id', job_id=job_id)
-            raise ValueError(f'No record found for job_id: {job_id}')
+    if not query_response.get('Items'):
+        logger.error('No record found for job_id', job_id=job_id)
+        raise ValueError(f'No record found for job_id: {job_id}')
 
-        record_timestamp = query_response['Items'][0]['timestamp']['N']
+    return query_response['Items'][0]['timestamp']['N']
+
+
+def claim_job(table_name, job_id, record_timestamp, lease_owner):
+    """
+    Move a job to posting under a lease held by lease_owner, and return the
+    claimed record.
+
+    Only one invocation wins the conditional update, so only one calls
+    Twitter. Uploaded jobs can be claimed, and so can ready ones whose
+    staged image publish copied before marking them uploaded. Those still
+    carry the staging ttl, which is cleared so the record is kept once
+    posted. A posting job can be taken over only once its lease has
+    expired. Anything else raises JobUnavailableError.
+    """
+    for attempt in range(1, record_lookup_attempts + 1):
+        now = int(time.time())
+        try:
+            response = dynamodb.update_item(
+                TableName=table_name,
+                Key={'job_id': {'S': job_id}, 'timestamp': {'N': record_timestamp}},
+                UpdateExpression=(
+                    'SET #status = :posting, lease_owner = :owner, '
+                    'lease_expires = :expires REMOVE #ttl'
+                ),
+                ConditionExpression=(
+                    '#status IN (:uploaded, :ready) '
+                    'OR (#status = :posting AND lease_expires < :now)'
+                ),
+                ExpressionAttributeNames={'#status': 'status', '#ttl': 'ttl'},
+                ExpressionAttributeValues={
+                    ':posting': {'S': 'posting'},
+                    ':uploaded': {'S': 'uploaded'},
+                    ':ready': {'S': 'ready'},
+                    ':owner': {'S': lease_owner},
+                    ':expires': {'N': str(now + post_lease_seconds)},
+                    ':now': {'N': str(now)},
+                },
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+            return response.get('Attributes', {})
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            item = e.response.get('Item')
+            if item:
+                lease_expires = int(item.get('lease_expires', {}).get('N', now))
+                raise JobUnavailableError(
+                    item.get('status', {}).get('S'), max(lease_expires - now, 1)
+                ) from e
+            if attempt == record_lookup_attempts:
+                raise
+            # image_gen batches its job records, so the record can land
+            # shortly after the image
+            logger.info('Waiting for DynamoDB record', job_id=job_id, attempt=attempt)
+            time.sleep(record_lookup_delay_seconds * 2 ** (attempt - 1))
+
+
+def release_job(table_name, job_id, record_timestamp, lease_owner, claim, error=None):
+    """
+    Hand a claimed job back so a later delivery can post it.
+
+    A deferred post goes back to uploaded as it was. A failed post counts an
+    attempt and is marked failed after max_post_attempts. Nothing changes if
+    the lease was already taken over.
+    """
+    values = {':posting': {'S': 'posting'}, ':owner': {'S': lease_owner}}
+    update = 'SET #status = :status REMOVE lease_owner, lease_expires'
+    try:
+        if error is None:
+            values[':status'] = {'S': 'uploaded'}
+        else:
+            attempts = int(claim.get('post_attempts', {}).get('N', '0')) + 1
+            values[':status'] = {
+                'S': 'failed' if attempts >= max_post_attempts else 'uploaded'
+            }
+            values[':attempts'] = {'N': str(attempts)}
+            values[':error'] = {'S': str(error)[:1000]}
+            update = (
+                'SET #status = :status, post_attempts = :attempts, '
+                'last_error = :error REMOVE lease_owner, lease_expires'
+            )
 
-        # Update the record with caption and status
         dynamodb.update_item(
             TableName=table_name,
             Key={'job_id': {'S': job_id}, 'timestamp': {'N': record_timestamp}},
-            UpdateExpression='SET #status = :status, caption = :caption',
+            UpdateExpression=update,
+            ConditionExpression='#status = :posting AND lease_owner = :owner',
             ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': {'S': status},
-                ':caption': {'S': caption},
-            },
+            ExpressionAttributeValues=values,
+        )
+        logger.info('Job released', job_id=job_id, status=values[':status']['S'])
+    except Exception as e:
+        # An unreleased claim is taken over once its lease expires
+        logger.warning('Job release failed', job_id=job_id, error=str(e))
+
+
+def update_record_by_key(
+    table_name, job_id, record_timestamp, caption, status, lease_owner=None
+):
+    # The record must already exist and must not be in the target status yet.
+    # A failed check returns the old item, which tells an already-posted
+    # record apart from one image_gen has not flushed yet. With a lease
+    # owner the record must still be claimed by it, and the lease is cleared.
+    update = 'SET #status = :status, caption = :caption'
+    condition = 'attribute_exists(job_id) AND #status <> :status'
+    values = {':status': {'S': status}, ':caption': {'S': caption}}
+    if lease_owner is not None:
+        update += ' REMOVE lease_owner, lease_expires'
+        condition = '#status = :posting AND lease_owner = :owner'
+        values.update({':posting': {'S': 'posting'}, ':owner': {'S': lease_owner}})
+
+    for attempt in range(1, record_lookup_attempts + 1):
+        try:
+            dynamodb.update_item(
+                TableName=table_name,
+                Key={'job_id': {'S': job_id}, 'timestamp': {'N': record_timestamp}},
+                UpdateExpression=update,
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues=values,
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            if e.response.get('Item') or attempt == record_lookup_attempts:
+                raise
+            logger.info('Waiting for DynamoDB record', job_id=job_id, attempt=attempt)
+            time.sleep(record_lookup_delay_seconds * 2 ** (attempt - 1))
+
+
+def update_dynamodb_record(
+    table_name,
+    job_id,
+    caption,
+    status='posted',
+    record_timestamp=None,
+    lease_owner=None,
+):
+    try:
+        if record_timestamp is None:
+            record_timestamp = find_record_timestamp(table_name, job_id)
+
+        # Update the record with caption and status
+        update_record_by_key(
+            table_name, job_id, record_timestamp, caption, status, lease_owner
         )
         logger.info('DynamoDB record updated', job_id=job_id, status=status)
-    except dynamodb.exceptions.ResourceNotFoundException:
-        logger.error('DynamoDB table not found')
-        raise
-    except dynamodb.exceptions.ConditionalCheckFailedException as e:
-        logger.error('Conditional check failed', error=str(e))
+    except ClientError as e:
+        error_code = e.response['Error']['Code']
+        if error_code == 'ResourceNotFoundException':
+            logger.error('DynamoDB table not found')
+        elif error_code == 'ConditionalCheckFailedException':
+            logger.error('Conditional check failed', job_id=job_id, error=str(e))
+        else:
+            logger.error('DynamoDB update failed', job_id=job_id, error=str(e))
         raise
     except ValueError as e:
         logger.error('ValueError in DynamoDB update', error=str(e))
@@ -107,59 +915,391 @@ def update_dynamodb_record(table_name, job_id, caption, status='posted'):
         raise
 
 
-@logger.inject_lambda_context
-def handler(event, context):
-    os.chdir('/tmp')
-
-    # only execute the lambda function if the event is triggered by an S3 Object Upload
-    if event['Records'][0]['eventName'] == 'ObjectCreated:Put':
-        key = event['Records'][0]['s3']['object']['key']
-        job_id = key.replace('images/', '')
-        text = insert_space_before_capital(key.split('_')[-1].replace('.jpg', ''))
-        caption = f'National {text} Day!'
-        local_file_path = f'/tmp/{job_id}'
-        logger.info(
-            'Processing S3 upload event', job_id=job_id, s3_key=key, caption=caption
-        )
+def post_s3_image(key):
+    """Tweet one image from images/ and mark its job record posted."""
+    job_id = key.replace('images/', '')
+    text = insert_space_before_capital(key.split('_')[-1].replace('.jpg', ''))
+    caption = f'National {text} Day!'
+    logger.info(
+        'Processing S3 upload event', job_id=job_id, s3_key=key, caption=caption
+    )
 
-        # download image from S3
-        try:
-            s3_client.download_file(image_bucket_name, key, local_file_path)
+    # read the image from S3 into memory, picking up the job record's
+    # timestamp that image_gen stores as object metadata
+    try:
+        with stage_metrics.track('S3Download') as stage:
+            s3_object = s3_client.get_object(Bucket=image_bucket_name, Key=key)
+            record_timestamp = s3_object.get('Metadata', {}).get('record-timestamp')
+            image_bytes = s3_object['Body'].read()
+            stage.bytes = len(image_bytes)
+        logger.info('Image read from S3', s3_key=key, size=len(image_bytes))
+    except Exception as e:
+        logger.error('S3 download failed', s3_key=key, error=str(e))
+        return {'statusCode': 500, 'body': 'Error downloading file from S3'}
+
+    # Only the invocation that wins the claim may tweet, so redelivered
+    # messages and parallel retries never post an image twice
+    lease_owner = uuid.uuid4().hex
+    try:
+        with stage_metrics.track('Claim'):
+            if record_timestamp is None:
+                record_timestamp = find_record_timestamp(dynamodb_table_name, job_id)
+            claim = claim_job(
+                dynamodb_table_name, job_id, record_timestamp, lease_owner
+            )
+    except JobUnavailableError as e:
+        if e.status == 'posting':
             logger.info(
-                'Image downloaded from S3', s3_key=key, local_path=local_file_path
+                'Tweet is being posted by another invocation',
+                job_id=job_id,
+                retry_after=e.retry_after,
             )
-        except Exception as e:
-            logger.error('S3 download failed', s3_key=key, error=str(e))
-            return {'statusCode': 500, 'body': 'Error downloading file from S3'}
-
-        # post image to Twitter
-        try:
-            post_image_to_twitter(caption, local_file_path)
-            logger.info('Tweet posted successfully', caption=caption, job_id=job_id)
-        except Exception as e:
-            logger.error('Twitter post failed', caption=caption, error=str(e))
-            return {'statusCode': 500, 'body': 'Error posting tweet'}
-
-        # update DynamoDB record
-        try:
-            update_dynamodb_record(dynamodb_table_name, job_id, caption, 'posted')
-            logger.info('Workflow completed successfully', job_id=job_id)
+            stage_metrics.count('PostsAlreadyClaimed')
+            # Checked again once the other invocation's lease has expired
             return {
-                'statusCode': 200,
-                'body': 'Tweet posted and DynamoDB record updated successfully!',
+                'statusCode': 409,
+                'body': 'Tweet is being posted by another invocation',
+                'retryAfter': e.retry_after,
             }
-        except Exception as e:
-            logger.error(
-                'DynamoDB update failed in handler', job_id=job_id, error=str(e)
+        logger.info('Job already finished, skipping', job_id=job_id, status=e.status)
+        return {'statusCode': 200, 'body': f'Tweet already {e.status}'}
+    except Exception as e:
+        logger.error('DynamoDB claim failed', job_id=job_id, error=str(e))
+        return {'statusCode': 500, 'body': 'Error claiming DynamoDB record'}
+
+    # post image to Twitter
+    try:
+        post_image_to_twitter(caption, job_id, image_bytes)
+        stage_metrics.count('TweetsPosted')
+        logger.info('Tweet posted successfully', caption=caption, job_id=job_id)
+    except PostDeferredError as e:
+        logger.warning(
+            'Tweet deferred by rate limit',
+            job_id=job_id,
+            retry_after=e.retry_after,
+        )
+        stage_metrics.count('PostsDeferred')
+        release_job(dynamodb_table_name, job_id, record_timestamp, lease_owner, claim)
+        return {
+            'statusCode': 429,
+            'body': 'Tweet deferred until the rate limit resets',
+            'retryAfter': e.retry_after,
+        }
+    except Exception as e:
+        logger.error('Twitter post failed', caption=caption, error=str(e))
+        stage_metrics.count('PostsFailed')
+        release_job(
+            dynamodb_table_name, job_id, record_timestamp, lease_owner, claim, e
+        )
+        return {'statusCode': 500, 'body': 'Error posting tweet'}
+
+    # update DynamoDB record
+    try:
+        with stage_metrics.track('RecordUpdate'):
+            update_dynamodb_record(
+                dynamodb_table_name,
+                job_id,
+                caption,
+                'posted',
+                record_timestamp,
+                lease_owner,
             )
-            return {'statusCode': 500, 'body': 'Error updating DynamoDB record'}
+        logger.info('Workflow completed successfully', job_id=job_id)
+        return {
+            'statusCode': 200,
+            'body': 'Tweet posted and DynamoDB record updated successfully!',
+        }
+    except Exception as e:
+        logger.error('DynamoDB update failed in handler', job_id=job_id, error=str(e))
+        # The tweet is out, so redelivering the message would post it again.
+        # The record stays claimed until its lease expires.
+        return {
+            'statusCode': 500,
+            'body': 'Tweet posted but DynamoDB record update failed',
+            'tweetPosted': True,
+        }
+
+
+def process_s3_record(s3_record):
+    # only process the record if it was triggered by an S3 Object Upload
+    if s3_record['eventName'] in SUPPORTED_EVENTS:
+        return post_s3_image(s3_record['s3']['object']['key'])
 
     else:
         logger.warning(
-            'Event not triggered by S3 ObjectCreated:Put',
-            event_name=event['Records'][0]['eventName'],
+            'Event not triggered by an S3 object upload',
+            event_name=s3_record['eventName'],
         )
         return {
             'statusCode': 500,
             'body': 'Event triggered by something other than an S3 Object Upload',
         }
+
+
+def find_stuck_jobs(cutoff):
+    """
+    Page through the uploaded and posting job records written at or before
+    cutoff.
+    """
+    paginator = dynamodb.get_paginator('query')
+    for status in ('uploaded', 'posting'):
+        for page in paginator.paginate(
+            TableName=dynamodb_table_name,
+            IndexName=status_index_name,
+            KeyConditionExpression='#status = :status AND #timestamp <= :cutoff',
+            ExpressionAttributeNames={'#status': 'status', '#timestamp': 'timestamp'},
+            ExpressionAttributeValues={
+                ':status': {'S': status},
+                ':cutoff': {'N': str(cutoff)},
+            },
+            PaginationConfig={'PageSize': sweep_page_size},
+        ):
+            yield from page.get('Items', [])
+
+
+def expire_stuck_job(item):
+    # Only a job that is still uploaded, or whose claim has lapsed, is
+    # expired; anything else has moved on since it was read
+    try:
+        dynamodb.update_item(
+            TableName=dynamodb_table_name,
+            Key={'job_id': item['job_id'], 'timestamp': item['timestamp']},
+            UpdateExpression=(
+                'SET #status = :failed, failure_reason = :reason '
+                'REMOVE lease_owner, lease_expires'
+            ),
+            ConditionExpression=(
+                '#status = :uploaded OR (#status = :posting AND lease_expires < :now)'
+            ),
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':failed': {'S': 'failed'},
+                ':uploaded': {'S': 'uploaded'},
+                ':posting': {'S': 'posting'},
+                ':now': {'N': str(int(time.time()))},
+                ':reason': {'S': 'expired'},
+            },
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def sweep_stuck_job(item, cutoff, oldest, context):
+    """Re-drive or expire one stuck job and return what happened to it."""
+    job_id = item['job_id']['S']
+    if context.get_remaining_time_in_millis() < sweep_time_margin_ms:
+        return 'remaining'
+
+    # Staged images are published long after their record was written, so
+    # their age counts from when publish marked them uploaded
+    uploaded_at = int(item.get('uploaded_at', item['timestamp'])['N'])
+    if uploaded_at > cutoff:
+        return 'in_flight'
+    # A claimed job is left to its owner until the lease runs out
+    lease_expires = int(item.get('lease_expires', {'N': '0'})['N'])
+    if item['status']['S'] == 'posting' and lease_expires >= time.time():
+        return 'in_flight'
+    if uploaded_at < oldest:
+        logger.warning('Expiring stuck job', job_id=job_id, uploaded_at=uploaded_at)
+        expire_stuck_job(item)
+        stage_metrics.count('StuckJobsExpired')
+        return 'expired'
+
+    logger.info('Re-driving stuck job', job_id=job_id, uploaded_at=uploaded_at)
+    stage_metrics.count('StuckJobsRedriven')
+    result = post_s3_image(f'images/{job_id}')
+    if result['statusCode'] == 200:
+        return 'posted'
+    if result['statusCode'] in (409, 429):
+        return 'deferred'
+    return 'failed'
+
+
+def sweep_stuck_jobs(context):
+    """
+    Re-drive jobs that were uploaded but never posted, for example after
+    their SQS message exhausted its retries.
+
+    Only the uploaded and posting partitions of the status index are
+    read, and jobs leave them once they are posted or failed, so a sweep
+    costs in proportion to the stuck jobs rather than the table. Jobs
+    whose claim lapsed, for example because the invocation holding it
+    timed out, are re-driven too. Re-driven jobs are claimed like SQS
+    deliveries, so repeated sweeps never post a job twice.
+    """
+    now = int(time.time())
+    cutoff = now - sweep_stuck_after_minutes * 60
+    oldest = now - sweep_max_age_hours * 3600
+    outcomes = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, sweep_max_concurrency)) as executor:
+            futures = {
+                executor.submit(sweep_stuck_job, item, cutoff, oldest, context): item
+                for item in find_stuck_jobs(cutoff)
+            }
+            for future in as_completed(futures):
+                job_id = futures[future]['job_id']['S']
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logger.error('Stuck job sweep failed', job_id=job_id, error=str(e))
+                    outcome = 'failed'
+                outcomes.setdefault(outcome, []).append(job_id)
+    except Exception as e:
+        logger.error('Stuck job query failed', error=str(e))
+        return {'statusCode': 500, 'body': json.dumps('Error querying stuck jobs')}
+
+    outcomes = {outcome: sorted(job_ids) for outcome, job_ids in outcomes.items()}
+    logger.info(
+        'Stuck job sweep finished',
+        **{outcome: len(job_ids) for outcome, job_ids in outcomes.items()},
+    )
+    return {
+        'statusCode': 500 if 'failed' in outcomes else 200,
+        'body': json.dumps(outcomes),
+    }
+
+
+def extract_s3_records(event):
+    """
+    Return (sqs_record, s3_record) pairs from a direct S3 notification or
+    from an SQS batch of S3 notifications. sqs_record is None for direct
+    S3 events.
+    """
+    s3_records = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:sqs':
+            # s3:TestEvent messages carry no Records and are skipped
+            body = json.loads(record['body'])
+            for s3_record in body.get('Records', []):
+                s3_records.append((record, s3_record))
+        else:
+            s3_records.append((None, record))
+    return s3_records
+
+
+def defer_sqs_message(sqs_record, retry_after):
+    # Hide the message until the rate-limit window resets instead of
+    # letting it be redelivered after the default visibility timeout
+    _, _, _, region, account_id, queue_name = sqs_record['eventSourceARN'].split(':')
+    queue_url = f'https://sqs.{region}.amazonaws.com/{account_id}/{queue_name}'
+    try:
+        sqs_client.change_message_visibility(
+            QueueUrl=queue_url,
+            ReceiptHandle=sqs_record['receiptHandle'],
+            VisibilityTimeout=min(retry_after, 43200),
+        )
+    except Exception as e:
+        logger.warning(
+            'Failed to extend message visibility',
+            message_id=sqs_record['messageId'],
+            error=str(e),
+        )
+
+
+def initialize():
+    """
+    Run the cold-start work concurrently instead of one call after another.
+
+    The tweepy import overlaps the credentials read, and both Twitter
+    clients are built before the first invocation. Only used for the eager
+    init phase.
+    """
+    for aws_client in (secrets_client, dynamodb, s3_client, sqs_client):
+        aws_client.resolve()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(twitter_credentials.get),
+            executor.submit(tweepy.resolve),
+        ]
+    for future in futures:
+        future.result()
+
+    twitter.resolve()
+    api.resolve()
+
+
+if startup_mode != 'lazy':
+    initialize()
+
+
+@logger.inject_lambda_context
+@metrics.log_metrics(capture_cold_start_metric=stage_metrics_enabled)
+@publish_connection_stats
+def handler(event, context):
+    # Only checks the TTL on a warm container; stale credentials are
+    # refreshed in the background
+    twitter_credentials.get()
+
+    # The reconciliation schedule invokes {"action": "sweep"} to re-drive
+    # jobs that were uploaded but never posted
+    if event.get('action') == 'sweep':
+        return sweep_stuck_jobs(context)
+
+    is_sqs_batch = any(
+        record.get('eventSource') == 'aws:sqs' for record in event.get('Records', [])
+    )
+    try:
+        s3_records = extract_s3_records(event)
+    except (json.JSONDecodeError, KeyError) as e:
+        logger.error('Malformed event', error=str(e))
+        return {'statusCode': 400, 'body': 'Malformed event'}
+
+    logger.info('Processing event batch', records=len(s3_records))
+
+    results = []
+    if s3_records:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrent_posts, len(s3_records)))
+        ) as executor:
+            results = list(
+                executor.map(
+                    lambda pair: (pair[0], pair[1], process_s3_record(pair[1])),
+                    s3_records,
+                )
+            )
+
+    failed = [result for result in results if result[2]['statusCode'] != 200]
+
+    if is_sqs_batch:
+        # Only retry records that can succeed on redelivery
+        retry_records = {}
+        for sqs_record, s3_record, result in failed:
+            if s3_record.get('eventName') not in SUPPORTED_EVENTS:
+                continue
+            if result.get('tweetPosted'):
+                continue
+            retry_records[sqs_record['messageId']] = sqs_record
+            if result['statusCode'] in (409, 429):
+                defer_sqs_message(sqs_record, result['retryAfter'])
+        if retry_records:
+            logger.warning('Batch completed with failures', failed=len(retry_records))
+        return {
+            'batchItemFailures': [
+                {'itemIdentifier': message_id} for message_id in sorted(retry_records)
+            ]
+        }
+
+    if len(results) == 1:
+        return results[0][2]
+
+    if failed:
+        return {
+            'statusCode': 500,
+            'body': json.dumps(
+                {
+                    'failed': [
+                        s3_record.get('s3', {}).get('object', {}).get('key')
+                        for _, s3_record, _ in failed
+                    ]
+                }
+            ),
+        }
+
+    return {
+        'statusCode': 200,
+        'body': f'{len(results)} tweets posted and DynamoDB records updated',
+    }
@@ -5,10 +5,41 @@ resource "aws_cloudwatch_event_rule" "lambda_schedule" {
   schedule_expression = var.cron_schedule
 }
 
-# CloudWatch Event Target to trigger the Image Gen Lambda
+# CloudWatch Event Target to trigger the Image Gen Lambda. With lookahead
+# enabled it only publishes the images staged ahead of time.
 resource "aws_cloudwatch_event_target" "lambda" {
-  rule = aws_cloudwatch_event_rule.lambda_schedule.name
-  arn  = aws_lambda_function.spooky_days_image_lambda_function.arn
+  rule  = aws_cloudwatch_event_rule.lambda_schedule.name
+  arn   = aws_lambda_function.spooky_days_image_lambda_function.arn
+  input = var.lookahead_days > 0 ? jsonencode({ action = "publish" }) : null
+}
+
+# CloudWatch Event Rule for staging the next publishing days' images
+resource "aws_cloudwatch_event_rule" "lookahead_schedule" {
+  count               = var.lookahead_days > 0 ? 1 : 0
+  name                = "${local.cloudwatch_rule_name}-lookahead"
+  description         = "Cron job for image_gen lookahead"
+  schedule_expression = var.lookahead_cron_schedule
+}
+
+resource "aws_cloudwatch_event_target" "lookahead" {
+  count = var.lookahead_days > 0 ? 1 : 0
+  rule  = aws_cloudwatch_event_rule.lookahead_schedule[0].name
+  arn   = aws_lambda_function.spooky_days_image_lambda_function.arn
+  input = jsonencode({ action = "lookahead" })
+}
+
+# CloudWatch Event Rule for re-driving jobs that were uploaded but never
+# posted
+resource "aws_cloudwatch_event_rule" "sweep_schedule" {
+  name                = "${local.cloudwatch_rule_name}-sweep"
+  description         = "Cron job for the twitter_post stuck-job sweep"
+  schedule_expression = var.sweep_cron_schedule
+}
+
+resource "aws_cloudwatch_event_target" "sweep" {
+  rule  = aws_cloudwatch_event_rule.sweep_schedule.name
+  arn   = aws_lambda_function.spooky_days_twitter_lambda_function.arn
+  input = jsonencode({ action = "sweep" })
 }
 
 # CloudWatch Log Group for Image Lambda Function
@@ -34,7 +65,8 @@ resource "aws_cloudwatch_dashboard" "spooky_days_overview" {
     gallery_lambda = aws_lambda_function.spooky_days_gallery_api_lambda_function.function_name,
     image_bucket   = aws_s3_bucket.spooky_days_image_bucket.bucket,
     metadata_table = aws_dynamodb_table.spooky_days_table.name,
-    api_table      = aws_dynamodb_table.spooky_days_api_table.name
+    api_table      = aws_dynamodb_table.spooky_days_api_table.name,
+    namespace      = var.metrics_namespace
   })
 
   lifecycle {
@@ -11,15 +11,27 @@ resource "aws_lambda_function" "spooky_days_image_lambda_function" {
 
   timeout = 120
 
+  # Each concurrent encode holds a decoded bitmap plus its JPEG and WebP
+  # outputs, so the worker counts below must fit in this
+  memory_size = var.image_gen_memory_size
+
   layers = [
     data.aws_lambda_layer_version.image_lambda_layer.arn,
   ]
 
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = var.dynamodb_image_table_name
-      IMAGE_BUCKET_NAME   = var.image_bucket_name
-      OPENAI_SECRET_ARN   = aws_secretsmanager_secret.image_gen_secrets.arn
+      DYNAMODB_TABLE_NAME          = var.dynamodb_image_table_name
+      IMAGE_BUCKET_NAME            = var.image_bucket_name
+      OPENAI_SECRET_ARN            = aws_secretsmanager_secret.image_gen_secrets.arn
+      MAX_CONCURRENT_GENERATIONS   = var.image_gen_max_concurrent_generations
+      MAX_CONCURRENT_ENCODES       = var.image_gen_max_concurrent_encodes
+      GENERATION_CACHE_TTL_DAYS    = var.generation_cache_ttl_days
+      LOOKAHEAD_DAYS               = var.lookahead_days
+      PUBLISH_WEEKDAYS             = var.publish_weekdays
+      STAGING_TTL_DAYS             = var.staging_ttl_days
+      POWERTOOLS_METRICS_NAMESPACE = var.metrics_namespace
+      STAGE_METRICS                = var.stage_metrics
     }
   }
 }
@@ -43,9 +55,14 @@ resource "aws_lambda_function" "spooky_days_twitter_lambda_function" {
 
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = var.dynamodb_image_table_name
-      IMAGE_BUCKET_NAME   = var.image_bucket_name
-      TWITTER_SECRET_ARN  = aws_secretsmanager_secret.twitter_secrets.arn
+      DYNAMODB_TABLE_NAME          = var.dynamodb_image_table_name
+      IMAGE_BUCKET_NAME            = var.image_bucket_name
+      TWITTER_SECRET_ARN           = aws_secretsmanager_secret.twitter_secrets.arn
+      POWERTOOLS_METRICS_NAMESPACE = var.metrics_namespace
+      SWEEP_STUCK_AFTER_MINUTES    = var.sweep_stuck_after_minutes
+      SWEEP_MAX_AGE_HOURS          = var.sweep_max_age_hours
+      MAX_POST_ATTEMPTS            = var.max_post_attempts
+      STAGE_METRICS                = var.stage_metrics
     }
   }
 }
@@ -87,6 +87,18 @@ resource "aws_iam_policy" "spooky_days_image_bucket_policy" {
           "s3:PutObjectAcl"
         ]
         Resource = "${aws_s3_bucket.spooky_days_image_bucket.arn}/*"
+      },
+      {
+        # Staged lookahead images are removed once published
+        Effect   = "Allow"
+        Action   = "s3:DeleteObject"
+        Resource = "${aws_s3_bucket.spooky_days_image_bucket.arn}/staging/*"
+      },
+      {
+        # Needed to rebuild the gallery manifest from the bucket
+        Effect   = "Allow"
+        Action   = "s3:ListBucket"
+        Resource = aws_s3_bucket.spooky_days_image_bucket.arn
       }
     ]
   })
@@ -143,6 +155,7 @@ resource "aws_iam_policy" "spooky_days_image_dynamodb_policy" {
         Effect = "Allow"
         Action = [
           "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:UpdateItem",
           "dynamodb:GetItem",
           "dynamodb:Query",
@@ -263,6 +276,26 @@ resource "aws_iam_policy" "twitter_lambda_secrets_policy" {
   })
 }
 
+# Grant Twitter Lambda permission to consume the upload notification queue
+resource "aws_iam_policy" "twitter_lambda_sqs_policy" {
+  name = "${var.app_name}-twitter-lambda-sqs-policy-${random_string.random.result}"
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes",
+          "sqs:ChangeMessageVisibility"
+        ]
+        Resource = aws_sqs_queue.twitter_post_queue.arn
+      }
+    ]
+  })
+}
+
 # Grant Gallery API Lambda permission to access secrets
 resource "aws_iam_policy" "gallery_lambda_secrets_policy" {
   name        = "${var.app_name}-gallery-lambda-secrets-policy-${random_string.random.result}"
@@ -345,6 +378,11 @@ resource "aws_iam_role_policy_attachment" "twitter_lambda_secrets_attachment" {
   policy_arn = aws_iam_policy.twitter_lambda_secrets_policy.arn
 }
 
+resource "aws_iam_role_policy_attachment" "twitter_lambda_sqs_attachment" {
+  role       = aws_iam_role.twitter_lambda_execution_role.name
+  policy_arn = aws_iam_policy.twitter_lambda_sqs_policy.arn
+}
+
 resource "aws_iam_role_policy_attachment" "twitter_lambda_logging_attachment" {
   role       = aws_iam_role.twitter_lambda_execution_role.name
   policy_arn = aws_iam_policy.lambda_logging_policy.arn
@@ -379,24 +417,36 @@ resource "aws_lambda_permission" "allow_cloudwatch" {
   source_arn    = aws_cloudwatch_event_rule.lambda_schedule.arn
 }
 
-resource "aws_lambda_permission" "allow_twitter_lambda_s3_execution" {
-  statement_id  = "AllowExecutionFromS3"
+# Permission for CloudWatch to trigger the Twitter Lambda's stuck-job sweep
+resource "aws_lambda_permission" "allow_cloudwatch_sweep" {
+  statement_id  = "AllowExecutionFromCloudWatchSweep"
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.spooky_days_twitter_lambda_function.function_name
-  principal     = "s3.amazonaws.com"
-  source_arn    = aws_s3_bucket.spooky_days_image_bucket.arn
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.sweep_schedule.arn
+}
+
+# Permission for CloudWatch to trigger the Image Gen Lambda's lookahead
+resource "aws_lambda_permission" "allow_cloudwatch_lookahead" {
+  count         = var.lookahead_days > 0 ? 1 : 0
+  statement_id  = "AllowExecutionFromCloudWatchLookahead"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.spooky_days_image_lambda_function.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.lookahead_schedule[0].arn
 }
 
 # S3 bucket notification configuration
 resource "aws_s3_bucket_notification" "image_bucket_notification" {
   bucket = aws_s3_bucket.spooky_days_image_bucket.bucket
 
-  lambda_function {
-    lambda_function_arn = aws_lambda_function.spooky_days_twitter_lambda_function.arn
-    events              = ["s3:ObjectCreated:*"]
-    filter_suffix       = ".jpg"
+  queue {
+    queue_arn     = aws_sqs_queue.twitter_post_queue.arn
+    events        = ["s3:ObjectCreated:*"]
+    filter_prefix = "images/"
+    filter_suffix = ".jpg"
   }
 
-  depends_on = [aws_lambda_permission.allow_twitter_lambda_s3_execution]
+  depends_on = [aws_sqs_queue_policy.twitter_post_queue_policy]
 }
 
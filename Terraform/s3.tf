@@ -218,6 +218,36 @@ resource "aws_s3_bucket_lifecycle_configuration" "image_bucket_lifecycle" {
       storage_class = var.s3_image_transition_storage_class
     }
   }
+
+  # Generated images cached by image_gen, indexed by DynamoDB items that
+  # expire through the table's ttl attribute on the same schedule
+  rule {
+    id     = "expire-generation-cache"
+    status = "Enabled"
+
+    filter {
+      prefix = "cache/"
+    }
+
+    expiration {
+      days = var.generation_cache_ttl_days
+    }
+  }
+
+  # Lookahead images that were never published, matching the ttl of their
+  # ready items
+  rule {
+    id     = "expire-staging"
+    status = "Enabled"
+
+    filter {
+      prefix = "staging/"
+    }
+
+    expiration {
+      days = var.staging_ttl_days
+    }
+  }
 }
 
 # Lifecycle policy for UI bucket
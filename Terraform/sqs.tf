@@ -0,0 +1,52 @@
+# SQS queue that buffers image upload notifications for the Twitter Lambda
+resource "aws_sqs_queue" "twitter_post_queue" {
+  name                       = "${var.app_name}-twitter-post-queue-${random_string.random.result}"
+  visibility_timeout_seconds = var.twitter_post_queue_visibility_timeout_seconds
+  message_retention_seconds  = 345600
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.twitter_post_dlq.arn
+    maxReceiveCount     = var.twitter_post_queue_max_receive_count
+  })
+}
+
+# Dead letter queue for notifications that repeatedly fail to post
+resource "aws_sqs_queue" "twitter_post_dlq" {
+  name                      = "${var.app_name}-twitter-post-dlq-${random_string.random.result}"
+  message_retention_seconds = 1209600
+  sqs_managed_sse_enabled   = true
+}
+
+# Allow the image bucket to publish object created notifications to the queue
+resource "aws_sqs_queue_policy" "twitter_post_queue_policy" {
+  queue_url = aws_sqs_queue.twitter_post_queue.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Principal = {
+          Service = "s3.amazonaws.com"
+        }
+        Action   = "sqs:SendMessage"
+        Resource = aws_sqs_queue.twitter_post_queue.arn
+        Condition = {
+          ArnEquals = {
+            "aws:SourceArn" = aws_s3_bucket.spooky_days_image_bucket.arn
+          }
+        }
+      }
+    ]
+  })
+}
+
+# Deliver queued notifications to the Twitter Lambda in batches
+resource "aws_lambda_event_source_mapping" "twitter_post_queue_mapping" {
+  event_source_arn                   = aws_sqs_queue.twitter_post_queue.arn
+  function_name                      = aws_lambda_function.spooky_days_twitter_lambda_function.arn
+  batch_size                         = var.twitter_post_batch_size
+  maximum_batching_window_in_seconds = var.twitter_post_batching_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+}
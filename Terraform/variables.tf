@@ -150,6 +150,30 @@ variable "s3_image_glacier_transition_days" {
   default     = 30
 }
 
+variable "generation_cache_ttl_days" {
+  description = "Days before cached generated images (cache/ prefix and cache# items) expire"
+  type        = number
+  default     = 400
+}
+
+variable "image_gen_memory_size" {
+  description = "Memory in MB for the Image Generation Lambda; four generations and four encodes peak at about 350 MiB"
+  type        = number
+  default     = 1024
+}
+
+variable "image_gen_max_concurrent_generations" {
+  description = "DALL-E requests the Image Generation Lambda keeps in flight at once"
+  type        = number
+  default     = 4
+}
+
+variable "image_gen_max_concurrent_encodes" {
+  description = "Image encodes the Image Generation Lambda runs at once; each holds a decoded 1024x1024 bitmap"
+  type        = number
+  default     = 4
+}
+
 variable "s3_image_lifecycle_noncurrent_versions_enabled" {
   description = "Enable lifecycle rule for deleting noncurrent versions in image bucket"
   type        = bool
@@ -223,3 +247,93 @@ variable "cloudfront_api_header_name" {
   sensitive   = true
   default     = null
 }
+
+# Twitter post queue variables
+variable "twitter_post_batch_size" {
+  description = "Maximum number of S3 notifications delivered to the Twitter Lambda per invocation"
+  type        = number
+  default     = 10
+}
+
+variable "twitter_post_batching_window_seconds" {
+  description = "Maximum time to wait while gathering a batch of S3 notifications"
+  type        = number
+  default     = 5
+}
+
+variable "twitter_post_queue_visibility_timeout_seconds" {
+  description = "Visibility timeout for the Twitter post queue (at least the Lambda timeout)"
+  type        = number
+  default     = 720
+}
+
+variable "twitter_post_queue_max_receive_count" {
+  description = "Number of delivery attempts before a notification is moved to the dead letter queue"
+  type        = number
+  default     = 5
+}
+
+variable "metrics_namespace" {
+  description = "CloudWatch namespace for the per-stage metrics published by the Python Lambdas"
+  type        = string
+  default     = "SpookyDays"
+}
+
+variable "stage_metrics" {
+  description = "Set to off to stop publishing per-stage metrics from the Python Lambdas"
+  type        = string
+  default     = "on"
+
+  validation {
+    condition     = contains(["on", "off"], var.stage_metrics)
+    error_message = "stage_metrics must be on or off."
+  }
+}
+
+variable "lookahead_days" {
+  description = "Publishing days image_gen renders ahead of time into the staging/ prefix; 0 generates every image at posting time"
+  type        = number
+  default     = 2
+}
+
+variable "lookahead_cron_schedule" {
+  description = "Cron schedule for staging the next publishing days' images"
+  type        = string
+  default     = "cron(0 7 ? * * *)"
+}
+
+variable "publish_weekdays" {
+  description = "Comma-separated weekdays (mon-sun) that cron_schedule posts on; lookahead skips the others"
+  type        = string
+  default     = "mon,tue,wed,thu,fri"
+}
+
+variable "staging_ttl_days" {
+  description = "Days before unpublished staged images (staging/ prefix and ready items) expire"
+  type        = number
+  default     = 14
+}
+
+variable "sweep_cron_schedule" {
+  description = "Schedule for re-driving jobs that were uploaded but never posted"
+  type        = string
+  default     = "rate(1 hour)"
+}
+
+variable "sweep_stuck_after_minutes" {
+  description = "Minutes after upload before an unposted job is re-driven by the sweep"
+  type        = number
+  default     = 30
+}
+
+variable "sweep_max_age_hours" {
+  description = "Hours after upload before the sweep marks an unposted job failed instead of posting it"
+  type        = number
+  default     = 12
+}
+
+variable "max_post_attempts" {
+  description = "Failed tweet attempts before a job is marked failed instead of being retried"
+  type        = number
+  default     = 3
+}
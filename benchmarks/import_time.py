@@ -0,0 +1,326 @@
+"""
+Cold-start import-time benchmark for the Python Lambdas.
+
+Each Lambda's main.py is imported in a fresh interpreter with -X importtime,
+once per startup mode, against a local Secrets Manager stand-in. The report
+shows the init duration (what the Lambda init phase pays), the first-use
+duration (what the first invocation pays in lazy mode) and the slowest
+top-level imports of each phase.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --mode lazy --runs 10 --top 15
+    python benchmarks/import_time.py --baseline benchmarks/baselines/import_time.json
+    python benchmarks/import_time.py --update-baseline \\
+        benchmarks/baselines/import_time.json
+
+With --baseline the script exits non-zero when a median duration regresses
+by more than --tolerance (relative) and --min-regression-ms (absolute).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+LAMBDAS = {
+    'image_gen': {
+        'path': REPO_ROOT / 'Lambdas' / 'image_gen',
+        # Names touched after import to force lazily created clients
+        'first_use': ['client', 'dynamodb_client', 's3_client', 'Image'],
+    },
+    'twitter_post': {
+        'path': REPO_ROOT / 'Lambdas' / 'twitter_post',
+        'first_use': ['twitter', 'api', 'dynamodb', 's3_client', 'sqs_client'],
+    },
+}
+
+OPENAI_SECRET_ARN = 'arn:aws:secretsmanager:us-east-1:000000000000:secret:openai'
+TWITTER_SECRET_ARN = 'arn:aws:secretsmanager:us-east-1:000000000000:secret:twitter'
+SECRETS = {
+    OPENAI_SECRET_ARN: 'sk-benchmark',
+    TWITTER_SECRET_ARN: json.dumps(
+        {
+            'ACCESS_TOKEN': 'token',
+            'ACCESS_TOKEN_SECRET': 'token-secret',
+            'API_KEY': 'key',
+            'API_SECRET': 'key-secret',
+            'BEARER_TOKEN': 'bearer',
+        }
+    ),
+}
+
+INIT_MARKER = '--- benchmark: init ---'
+FIRST_USE_MARKER = '--- benchmark: first use ---'
+
+CHILD_SCRIPT = f"""
+import json
+import sys
+import time
+
+sys.path.insert(0, sys.argv[1])
+sys.stderr.write({INIT_MARKER!r} + '\\n')
+sys.stderr.flush()
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+sys.stderr.write({FIRST_USE_MARKER!r} + '\\n')
+sys.stderr.flush()
+for name in sys.argv[2].split(','):
+    getattr(getattr(main, name), '_benchmark_first_use', None)
+used = time.perf_counter()
+print(json.dumps({{
+    'init_ms': (imported - started) * 1000,
+    'first_use_ms': (used - imported) * 1000,
+}}))
+"""
+
+
+class SecretsManagerStandIn(BaseHTTPRequestHandler):
+    """Answers GetSecretValue for the fake secrets above; nothing else."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        secret_id = body.get('SecretId')
+
+        if secret_id in SECRETS:
+            status = 200
+            payload = {
+                'ARN': secret_id,
+                'Name': secret_id.rsplit(':', 1)[-1],
+                'SecretString': SECRETS[secret_id],
+            }
+        else:
+            status = 400
+            payload = {
+                '__type': 'ResourceNotFoundException',
+                'message': 'Secrets Manager can not find the specified secret.',
+            }
+
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-amz-json-1.1')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_importtime(stderr):
+    """
+    Split -X importtime output into {phase: {module: cumulative us}}.
+
+    Init lists the modules imported directly by main; first use lists the
+    top-level imports triggered by touching the lazily created clients.
+    """
+    phases = {'init': {}, 'first_use': {}}
+    # Depth of the modules reported for each phase
+    depths = {'init': 1, 'first_use': 0}
+    phase = None
+
+    for line in stderr.splitlines():
+        if line == INIT_MARKER:
+            phase = 'init'
+            continue
+        if line == FIRST_USE_MARKER:
+            phase = 'first_use'
+            continue
+        if phase is None or not line.startswith('import time:'):
+            continue
+
+        _, cumulative, name = line.split('|')
+        # Nested imports are indented two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth != depths[phase]:
+            continue
+        if cumulative.strip().isdigit():
+            phases[phase][name.strip()] = int(cumulative)
+
+    return phases
+
+
+def run_once(lambda_name, mode, endpoint):
+    config = LAMBDAS[lambda_name]
+    env = {
+        **os.environ,
+        'AWS_ACCESS_KEY_ID': 'benchmark',
+        'AWS_SECRET_ACCESS_KEY': 'benchmark',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ENDPOINT_URL': endpoint,
+        'IMAGE_BUCKET_NAME': 'benchmark-bucket',
+        'DYNAMODB_TABLE_NAME': 'benchmark-table',
+        'OPENAI_SECRET_ARN': OPENAI_SECRET_ARN,
+        'TWITTER_SECRET_ARN': TWITTER_SECRET_ARN,
+        'STARTUP_MODE': mode,
+        'POWERTOOLS_LOG_LEVEL': 'ERROR',
+    }
+    result = subprocess.run(
+        [
+            sys.executable,
+            '-X',
+            'importtime',
+            '-c',
+            CHILD_SCRIPT,
+            str(config['path']),
+            ','.join(config['first_use']),
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f'{lambda_name} ({mode}) failed to import:\n{result.stderr[-2000:]}'
+        )
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, parse_importtime(result.stderr)
+
+
+def median_modules(runs, phase, top):
+    modules = {}
+    for _, imports in runs:
+        for name, cumulative in imports[phase].items():
+            modules.setdefault(name, []).append(cumulative)
+
+    medians = {
+        name: statistics.median(values) / 1000 for name, values in modules.items()
+    }
+    return dict(sorted(medians.items(), key=lambda item: item[1], reverse=True)[:top])
+
+
+def benchmark(lambda_names, modes, runs, top, endpoint):
+    report = {}
+    for lambda_name in lambda_names:
+        report[lambda_name] = {}
+        for mode in modes:
+            # The first run compiles bytecode and warms the page cache
+            run_once(lambda_name, mode, endpoint)
+            results = [run_once(lambda_name, mode, endpoint) for _ in range(runs)]
+
+            report[lambda_name][mode] = {
+                'init_ms': statistics.median(r[0]['init_ms'] for r in results),
+                'first_use_ms': statistics.median(
+                    r[0]['first_use_ms'] for r in results
+                ),
+                'init_imports_ms': median_modules(results, 'init', top),
+                'first_use_imports_ms': median_modules(results, 'first_use', top),
+            }
+    return report
+
+
+def print_report(report):
+    for lambda_name, modes in report.items():
+        for mode, result in modes.items():
+            print(
+                f'{lambda_name} [{mode}] init {result["init_ms"]:.1f} ms, '
+                f'first use {result["first_use_ms"]:.1f} ms'
+            )
+            for phase in ('init_imports_ms', 'first_use_imports_ms'):
+                for name, duration in result[phase].items():
+                    print(f'    {phase[:-11]:<9} {duration:9.1f} ms  {name}')
+            print()
+
+
+def compare_to_baseline(report, baseline, tolerance, min_regression_ms):
+    regressions = []
+    for lambda_name, modes in report.items():
+        for mode, result in modes.items():
+            expected = baseline.get(lambda_name, {}).get(mode)
+            if not expected:
+                continue
+            for metric in ('init_ms', 'first_use_ms'):
+                limit = max(
+                    expected[metric] * (1 + tolerance),
+                    expected[metric] + min_regression_ms,
+                )
+                if result[metric] > limit:
+                    regressions.append(
+                        f'{lambda_name} [{mode}] {metric}: {result[metric]:.1f} ms '
+                        f'> {limit:.1f} ms (baseline {expected[metric]:.1f} ms)'
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--lambda',
+        dest='lambdas',
+        action='append',
+        choices=sorted(LAMBDAS),
+        help='Lambda to benchmark (repeatable, default: all)',
+    )
+    parser.add_argument(
+        '--mode',
+        dest='modes',
+        action='append',
+        choices=['eager', 'lazy'],
+        help='Startup mode to benchmark (repeatable, default: both)',
+    )
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', type=Path, help='Write the report as JSON')
+    parser.add_argument('--baseline', type=Path, help='Fail on regressions')
+    parser.add_argument('--update-baseline', type=Path)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--min-regression-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SecretsManagerStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f'http://127.0.0.1:{server.server_address[1]}'
+
+    try:
+        report = benchmark(
+            args.lambdas or sorted(LAMBDAS),
+            args.modes or ['eager', 'lazy'],
+            args.runs,
+            args.top,
+            endpoint,
+        )
+    finally:
+        server.shutdown()
+
+    print_report(report)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + '\n')
+
+    if args.update_baseline:
+        baseline = {
+            lambda_name: {
+                mode: {
+                    'init_ms': round(result['init_ms'], 1),
+                    'first_use_ms': round(result['first_use_ms'], 1),
+                }
+                for mode, result in modes.items()
+            }
+            for lambda_name, modes in report.items()
+        }
+        args.update_baseline.write_text(json.dumps(baseline, indent=2) + '\n')
+
+    if args.baseline:
+        regressions = compare_to_baseline(
+            report,
+            json.loads(args.baseline.read_text()),
+            args.tolerance,
+            args.min_regression_ms,
+        )
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
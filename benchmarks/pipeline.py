@@ -0,0 +1,753 @@
+"""
+End-to-end benchmark for the Python Lambdas against local stand-ins.
+
+Each scenario runs one Lambda handler in a fresh interpreter. S3, DynamoDB
+and Secrets Manager are served in-process by moto; the OpenAI images
+endpoint and the Twitter upload and tweet endpoints are local HTTP
+stand-ins with configurable latency and image size. image_gen generates
+every day of the run, twitter_post posts the same number of pre-seeded
+images in SQS-sized batches. The report shows wall time, throughput, peak
+RSS, HTTP connection reuse and per-stage latency for each number of days.
+Peak RSS includes moto's in-memory copy of every object the run uploads,
+so it overstates what the Lambda itself holds by roughly the bytes written
+to S3.
+
+    python benchmarks/pipeline.py
+    python benchmarks/pipeline.py --lambda image_gen --days 1 --days 50 \\
+        --openai-latency-ms 2000
+    python benchmarks/pipeline.py --lambda image_gen --response-format url
+    python benchmarks/pipeline.py --baseline benchmarks/baselines/pipeline.json
+    python benchmarks/pipeline.py --update-baseline \\
+        benchmarks/baselines/pipeline.json
+
+With --baseline the script exits non-zero when a median wall time or peak
+RSS regresses by more than --tolerance (relative) and --min-regression-ms
+or --min-regression-mb (absolute).
+"""
+
+import argparse
+import contextlib
+import datetime
+import functools
+import importlib.util
+import itertools
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+BUCKET = 'benchmark-bucket'
+TABLE = 'benchmark-table'
+
+LAMBDAS = {
+    'image_gen': {
+        'path': REPO_ROOT / 'Lambdas' / 'image_gen' / 'main.py',
+        # Functions timed per call; Class.method entries are patched on the
+        # class so module-level instances pick them up
+        'stages': [
+            'GenerationCache.lookup',
+            'generate_image',
+            'GenerationCache.store',
+            'stream_image_to_s3',
+            'transcode_image',
+            'encode_image',
+            'put_job_record',
+            'upload_thumbnails_to_s3',
+            'upload_image_bytes_to_s3',
+            'update_gallery_manifest',
+        ],
+    },
+    'twitter_post': {
+        'path': REPO_ROOT / 'Lambdas' / 'twitter_post' / 'main.py',
+        'stages': [
+            'process_s3_record',
+            'claim_job',
+            'PostRateLimiter.acquire',
+            'upload_media_chunked',
+            'post_image_to_twitter',
+            'update_dynamodb_record',
+        ],
+    },
+}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real endpoints
+    protocol_version = 'HTTP/1.1'
+    latency_seconds = 0.0
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def send_json(self, status, payload=None, headers=None):
+        data = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OpenAIStandIn(StandInHandler):
+    """
+    Answers image generation requests with the same image, either inline as
+    b64_json or as a URL that this server then serves.
+    """
+
+    image_png = b''
+
+    def do_POST(self):
+        request = json.loads(self.read_body() or b'{}')
+        time.sleep(self.latency_seconds)
+        if not self.path.endswith('/images/generations'):
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        if request.get('response_format') == 'url':
+            image = {'url': f'http://{self.headers["Host"]}/files/image.png'}
+        else:
+            image = {'b64_json': b64encode(self.image_png).decode('utf-8')}
+        self.send_json(
+            200,
+            {
+                'created': int(time.time()),
+                'data': [{**image, 'revised_prompt': ''}],
+            },
+        )
+
+    def do_GET(self):
+        if self.path != '/files/image.png':
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(self.image_png)))
+        self.end_headers()
+        self.wfile.write(self.image_png)
+
+
+class TwitterStandIn(StandInHandler):
+    """Answers v1.1 media uploads (simple and chunked) and v2 tweet creation."""
+
+    ids = itertools.count(1)
+
+    def do_POST(self):
+        body = self.read_body()
+        time.sleep(self.latency_seconds)
+        path = urlsplit(self.path).path
+
+        if path == '/2/tweets':
+            self.send_json(
+                201,
+                {'data': {'id': str(next(self.ids)), 'text': json.loads(body)['text']}},
+                {
+                    'x-rate-limit-remaining': '10000',
+                    'x-rate-limit-reset': str(int(time.time()) + 900),
+                },
+            )
+        elif path == '/1.1/media/upload.json':
+            self.media_upload(body)
+        else:
+            self.send_json(404, {'errors': [{'message': f'Unknown path {path}'}]})
+
+    def media_upload(self, body):
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('application/x-www-form-urlencoded'):
+            form = parse_qs(body.decode('utf-8'))
+            command = form['command'][0]
+            media_id = int(form.get('media_id', [next(self.ids)])[0])
+            if command not in ('INIT', 'FINALIZE'):
+                self.send_json(400, {'errors': [{'message': f'Bad {command}'}]})
+                return
+            self.send_json(
+                200 if command == 'FINALIZE' else 202,
+                {'media_id': media_id, 'media_id_string': str(media_id)},
+            )
+        elif b'name="command"' in body:
+            # APPEND
+            self.send_json(204)
+        else:
+            media_id = next(self.ids)
+            self.send_json(
+                200,
+                {'media_id': media_id, 'media_id_string': str(media_id)},
+            )
+
+
+def stand_in(handler, **attributes):
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0), type(handler.__name__, (handler,), attributes)
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def make_images(size_px, noise, jpeg_quality):
+    """
+    Return the PNG the OpenAI stand-in serves and the JPEG image_gen would
+    post for it. noise blends random pixels into a gradient; real DALL-E
+    output compresses like a noise level of about 0.25.
+    """
+    from PIL import Image
+
+    gradient = Image.linear_gradient('L').resize((size_px, size_px)).convert('RGB')
+    pixels = Image.frombytes(
+        'RGB',
+        (size_px, size_px),
+        random.Random(0).randbytes(size_px * size_px * 3),
+    )
+    image = Image.blend(gradient, pixels, noise)
+
+    png = BytesIO()
+    image.save(png, format='PNG')
+    jpeg = BytesIO()
+    image.save(jpeg, format='JPEG', quality=jpeg_quality, optimize=True)
+    return png.getvalue(), jpeg.getvalue()
+
+
+@contextlib.contextmanager
+def mock_aws_services():
+    try:
+        from moto import mock_aws
+    except ImportError:
+        # moto < 5 mocks each service separately
+        from moto import mock_dynamodb, mock_s3, mock_secretsmanager
+
+        with mock_s3(), mock_dynamodb(), mock_secretsmanager():
+            yield
+        return
+
+    with mock_aws():
+        yield
+
+
+class LambdaContext:
+    function_name = 'benchmark'
+    function_version = '$LATEST'
+    memory_limit_in_mb = 1024
+    invoked_function_arn = 'arn:aws:lambda:us-east-1:000000000000:function:benchmark'
+    aws_request_id = 'benchmark'
+
+    def __init__(self, timeout_ms):
+        self.deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return int((self.deadline - time.monotonic()) * 1000)
+
+
+def create_aws_resources():
+    import boto3
+
+    boto3.client('s3').create_bucket(Bucket=BUCKET)
+    boto3.client('dynamodb').create_table(
+        TableName=TABLE,
+        BillingMode='PAY_PER_REQUEST',
+        KeySchema=[
+            {'AttributeName': 'job_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'job_id', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'N'},
+            {'AttributeName': 'status', 'AttributeType': 'S'},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'status-timestamp-index',
+                'KeySchema': [
+                    {'AttributeName': 'status', 'KeyType': 'HASH'},
+                    {'AttributeName': 'timestamp', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+            }
+        ],
+    )
+
+    secrets = boto3.client('secretsmanager')
+    os.environ['OPENAI_SECRET_ARN'] = secrets.create_secret(
+        Name='openai', SecretString='sk-benchmark'
+    )['ARN']
+    os.environ['TWITTER_SECRET_ARN'] = secrets.create_secret(
+        Name='twitter',
+        SecretString=json.dumps(
+            {
+                'ACCESS_TOKEN': 'token',
+                'ACCESS_TOKEN_SECRET': 'token-secret',
+                'API_KEY': 'key',
+                'API_SECRET': 'key-secret',
+                'BEARER_TOKEN': 'bearer',
+            }
+        ),
+    )['ARN']
+
+
+def day_names(days):
+    return [f'Benchmark{index}' for index in range(days)]
+
+
+def seed_image_gen(days):
+    import boto3
+
+    now = datetime.datetime.now()
+    config = {
+        'Prompt': 'Create a spooky image for ',
+        now.strftime('%B').lower(): {str(now.day): day_names(days)},
+    }
+    s3 = boto3.client('s3')
+    s3.put_object(Bucket=BUCKET, Key='national-days.json', Body=json.dumps(config))
+    # An existing manifest, so the run measures the steady-state append
+    # rather than the one-off seeding from a bucket listing
+    s3.put_object(
+        Bucket=BUCKET,
+        Key='gallery/manifest.json',
+        Body=json.dumps({'version': 1, 'images': []}),
+    )
+
+
+def seed_twitter_post(days, jpeg_path):
+    import boto3
+
+    s3 = boto3.client('s3')
+    dynamodb = boto3.client('dynamodb')
+    image_bytes = Path(jpeg_path).read_bytes()
+    timestamp = str(int(time.time()))
+    keys = []
+
+    for index, name in enumerate(day_names(days)):
+        job_id = f'benchmark_1_{index}_{name}.jpg'
+        s3.put_object(
+            Bucket=BUCKET,
+            Key=f'images/{job_id}',
+            Body=image_bytes,
+            Metadata={'record-timestamp': timestamp},
+        )
+        dynamodb.put_item(
+            TableName=TABLE,
+            Item={
+                'job_id': {'S': job_id},
+                'timestamp': {'N': timestamp},
+                'status': {'S': 'uploaded'},
+            },
+        )
+        keys.append(f'images/{job_id}')
+    return keys
+
+
+def sqs_batches(keys, batch_size):
+    for start in range(0, len(keys), batch_size):
+        yield {
+            'Records': [
+                {
+                    'eventSource': 'aws:sqs',
+                    'eventSourceARN': 'arn:aws:sqs:us-east-1:000000000000:posts',
+                    'messageId': f'message-{start + offset}',
+                    'receiptHandle': f'receipt-{start + offset}',
+                    'body': json.dumps(
+                        {
+                            'Records': [
+                                {
+                                    'eventName': 'ObjectCreated:Put',
+                                    's3': {'object': {'key': key}},
+                                }
+                            ]
+                        }
+                    ),
+                }
+                for offset, key in enumerate(keys[start : start + batch_size])
+            ]
+        }
+
+
+def load_lambda(lambda_name):
+    spec = importlib.util.spec_from_file_location(
+        f'{lambda_name}_main', LAMBDAS[lambda_name]['path']
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def instrument(module, stages):
+    """Wrap each stage function so every call's duration is recorded."""
+    durations = {stage: [] for stage in stages}
+
+    def timed(stage, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                durations[stage].append((time.perf_counter() - started) * 1000)
+
+        return wrapper
+
+    for stage in stages:
+        *parents, name = stage.split('.')
+        owner = module
+        for parent in parents:
+            owner = getattr(owner, parent)
+        setattr(owner, name, timed(stage, getattr(owner, name)))
+
+    return durations
+
+
+def redirect_twitter(module, endpoint):
+    """
+    Send the Twitter clients' requests to the local stand-in through the
+    Lambda's own pooled adapter, so its pool size and reuse are measured.
+    """
+    import requests
+
+    class StandInAdapter(requests.adapters.BaseAdapter):
+        def __init__(self, adapter):
+            super().__init__()
+            self.adapter = adapter
+
+        def send(self, request, **kwargs):
+            parts = urlsplit(request.url)
+            request.url = (
+                endpoint + parts.path + (f'?{parts.query}' if parts.query else '')
+            )
+            return self.adapter.send(request, **kwargs)
+
+        def close(self):
+            self.adapter.close()
+
+    for client in (module.twitter, module.api):
+        adapter = client.session.get_adapter('https://')
+        for host in ('https://api.twitter.com', 'https://upload.twitter.com'):
+            client.session.mount(host, StandInAdapter(adapter))
+
+
+def total_connections(module):
+    """Keep a running total of what the Lambda reports after each invocation."""
+    totals = {'requests': 0, 'new_connections': 0, 'reused': 0}
+    collect = module.connection_stats.collect
+
+    def collect_and_total():
+        hosts = collect()
+        for counts in hosts.values():
+            for name in totals:
+                totals[name] += counts[name]
+        return hosts
+
+    module.connection_stats.collect = collect_and_total
+    return totals
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(config):
+    """Run one scenario inside this interpreter and return its measurements."""
+    lambda_name = config['lambda']
+    days = config['days']
+    context = LambdaContext(timeout_ms=900000)
+
+    with mock_aws_services():
+        create_aws_resources()
+        if lambda_name == 'image_gen':
+            seed_image_gen(days)
+        else:
+            keys = seed_twitter_post(days, config['jpeg_path'])
+
+        rss_before_mb = peak_rss_mb()
+        module = load_lambda(lambda_name)
+        durations = instrument(module, LAMBDAS[lambda_name]['stages'])
+        connections = total_connections(module)
+
+        started = time.perf_counter()
+        if lambda_name == 'image_gen':
+            response = module.handler(
+                {'response_format': config['response_format']}, context
+            )
+            if response['statusCode'] != 200:
+                raise RuntimeError(f'image_gen failed: {response["body"]}')
+        else:
+            redirect_twitter(module, config['twitter_endpoint'])
+            for event in sqs_batches(keys, config['batch_size']):
+                response = module.handler(event, context)
+                if response['batchItemFailures']:
+                    raise RuntimeError(f'twitter_post failed: {response}')
+        wall_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        'wall_ms': wall_ms,
+        'throughput_per_s': days / (wall_ms / 1000),
+        'peak_rss_mb': peak_rss_mb(),
+        'setup_rss_mb': rss_before_mb,
+        'stages': durations,
+        'connections': connections,
+    }
+
+
+def run_once(config, env):
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', json.dumps(config)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f'{config["lambda"]} ({config["days"]} days) failed:\n'
+            f'{result.stderr[-3000:]}'
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize_stages(runs):
+    """Per-stage call count and latency percentiles over every run."""
+    stages = {}
+    for stage in runs[0]['stages']:
+        values = [value for run in runs for value in run['stages'][stage]]
+        if not values:
+            continue
+        stages[stage] = {
+            'calls': len(values) // len(runs),
+            'p50_ms': round(statistics.median(values), 1),
+            'p95_ms': round(percentile(values, 0.95), 1),
+            'total_ms': round(sum(values) / len(runs), 1),
+        }
+    return stages
+
+
+def benchmark(lambda_names, day_counts, runs, settings, env):
+    report = {}
+    for lambda_name in lambda_names:
+        report[lambda_name] = {}
+        for days in day_counts:
+            config = {**settings, 'lambda': lambda_name, 'days': days}
+            results = [run_once(config, env) for _ in range(runs)]
+            report[lambda_name][str(days)] = {
+                'wall_ms': statistics.median(r['wall_ms'] for r in results),
+                'throughput_per_s': statistics.median(
+                    r['throughput_per_s'] for r in results
+                ),
+                'peak_rss_mb': statistics.median(r['peak_rss_mb'] for r in results),
+                'setup_rss_mb': statistics.median(r['setup_rss_mb'] for r in results),
+                'connections': {
+                    name: statistics.median(r['connections'][name] for r in results)
+                    for name in results[0]['connections']
+                },
+                'stages': summarize_stages(results),
+            }
+    return report
+
+
+def print_report(report, settings):
+    print(
+        f'OpenAI latency {settings["openai_latency_ms"]} ms, '
+        f'Twitter latency {settings["twitter_latency_ms"]} ms, '
+        f'PNG {settings["png_bytes"] / 1024:.0f} KiB, '
+        f'JPEG {settings["jpeg_bytes"] / 1024:.0f} KiB'
+    )
+    print()
+    for lambda_name, scenarios in report.items():
+        for days, result in scenarios.items():
+            print(
+                f'{lambda_name} [{days} days] wall {result["wall_ms"]:.0f} ms, '
+                f'{result["throughput_per_s"]:.2f} days/s, '
+                f'peak RSS {result["peak_rss_mb"]:.0f} MiB '
+                f'(setup {result["setup_rss_mb"]:.0f} MiB)'
+            )
+            connections = result['connections']
+            print(
+                f'    HTTP requests {connections["requests"]:.0f}, '
+                f'new connections {connections["new_connections"]:.0f}, '
+                f'reused {connections["reused"]:.0f}'
+            )
+            for stage, timing in result['stages'].items():
+                print(
+                    f'    {stage:<28} {timing["calls"]:4d} calls  '
+                    f'p50 {timing["p50_ms"]:8.1f} ms  p95 {timing["p95_ms"]:8.1f} ms'
+                )
+            print()
+
+
+def compare_to_baseline(report, baseline, tolerance, min_regression):
+    regressions = []
+    for lambda_name, scenarios in report.items():
+        for days, result in scenarios.items():
+            expected = baseline.get(lambda_name, {}).get(days)
+            if not expected:
+                continue
+            for metric, minimum in min_regression.items():
+                limit = max(
+                    expected[metric] * (1 + tolerance), expected[metric] + minimum
+                )
+                if result[metric] > limit:
+                    regressions.append(
+                        f'{lambda_name} [{days} days] {metric}: '
+                        f'{result[metric]:.1f} > {limit:.1f} '
+                        f'(baseline {expected[metric]:.1f})'
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--lambda',
+        dest='lambdas',
+        action='append',
+        choices=sorted(LAMBDAS),
+        help='Lambda to benchmark (repeatable, default: all)',
+    )
+    parser.add_argument(
+        '--days',
+        dest='day_counts',
+        action='append',
+        type=int,
+        help='National days per run (repeatable, default: 1, 10 and 50)',
+    )
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--openai-latency-ms', type=int, default=500)
+    parser.add_argument('--twitter-latency-ms', type=int, default=100)
+    parser.add_argument('--image-px', type=int, default=1024)
+    parser.add_argument('--image-noise', type=float, default=0.25)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument(
+        '--response-format', choices=['b64_json', 'url'], default='b64_json'
+    )
+    parser.add_argument('--output', type=Path, help='Write the report as JSON')
+    parser.add_argument('--baseline', type=Path, help='Fail on regressions')
+    parser.add_argument('--update-baseline', type=Path)
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--min-regression-ms', type=float, default=500.0)
+    parser.add_argument('--min-regression-mb', type=float, default=50.0)
+    args = parser.parse_args()
+
+    png_bytes, jpeg_bytes = make_images(args.image_px, args.image_noise, 85)
+    openai_server, openai_endpoint = stand_in(
+        OpenAIStandIn,
+        latency_seconds=args.openai_latency_ms / 1000,
+        image_png=png_bytes,
+    )
+    twitter_server, twitter_endpoint = stand_in(
+        TwitterStandIn, latency_seconds=args.twitter_latency_ms / 1000
+    )
+
+    env = {
+        **os.environ,
+        'AWS_ACCESS_KEY_ID': 'benchmark',
+        'AWS_SECRET_ACCESS_KEY': 'benchmark',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'IMAGE_BUCKET_NAME': BUCKET,
+        'DYNAMODB_TABLE_NAME': TABLE,
+        'OPENAI_BASE_URL': f'{openai_endpoint}/v1',
+        'POWERTOOLS_LOG_LEVEL': 'ERROR',
+    }
+    # moto serves AWS in-process, so nothing may point boto3 elsewhere
+    env.pop('AWS_ENDPOINT_URL', None)
+    env.pop('AWS_PROFILE', None)
+
+    settings = {
+        'openai_latency_ms': args.openai_latency_ms,
+        'twitter_latency_ms': args.twitter_latency_ms,
+        'image_px': args.image_px,
+        'image_noise': args.image_noise,
+        'batch_size': args.batch_size,
+        'response_format': args.response_format,
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        jpeg_path = Path(workdir) / 'image.jpg'
+        jpeg_path.write_bytes(jpeg_bytes)
+        try:
+            report = benchmark(
+                args.lambdas or sorted(LAMBDAS),
+                args.day_counts or [1, 10, 50],
+                args.runs,
+                {
+                    **settings,
+                    'twitter_endpoint': twitter_endpoint,
+                    'jpeg_path': str(jpeg_path),
+                },
+                env,
+            )
+        finally:
+            openai_server.shutdown()
+            twitter_server.shutdown()
+
+    print_report(
+        report,
+        {**settings, 'png_bytes': len(png_bytes), 'jpeg_bytes': len(jpeg_bytes)},
+    )
+
+    if args.output:
+        args.output.write_text(
+            json.dumps({'settings': settings, 'report': report}, indent=2) + '\n'
+        )
+
+    if args.update_baseline:
+        baseline = {
+            'settings': settings,
+            **{
+                lambda_name: {
+                    days: {
+                        'wall_ms': round(result['wall_ms'], 1),
+                        'throughput_per_s': round(result['throughput_per_s'], 2),
+                        'peak_rss_mb': round(result['peak_rss_mb'], 1),
+                    }
+                    for days, result in scenarios.items()
+                }
+                for lambda_name, scenarios in report.items()
+            },
+        }
+        args.update_baseline.write_text(json.dumps(baseline, indent=2) + '\n')
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get('settings') != settings:
+            sys.exit(
+                f'Baseline was recorded with {baseline.get("settings")}, not {settings}'
+            )
+        regressions = compare_to_baseline(
+            report,
+            baseline,
+            args.tolerance,
+            {
+                'wall_ms': args.min_regression_ms,
+                'peak_rss_mb': args.min_regression_mb,
+            },
+        )
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        print(json.dumps(run_child(json.loads(sys.argv[2]))))
+    else:
+        main()
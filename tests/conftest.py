@@ -23,7 +23,7 @@ def reset_imports():
     Reset module imports between tests to avoid state pollution.
 
     This ensures each test gets a fresh import of the Lambda modules,
-    preventing issues with global variables like b64_image_list.
+    preventing issues with module-level state such as the run date.
     """
     modules_to_reset = ['main']
     for module in modules_to_reset:
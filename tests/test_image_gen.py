@@ -1,9 +1,28 @@
 import json
+import random
+import threading
 from base64 import b64encode
-from datetime import datetime
-from unittest.mock import Mock, mock_open, patch
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from unittest.mock import MagicMock, Mock, mock_open, patch
 
+import openai
 import pytest
+from botocore.exceptions import ClientError
+from PIL import Image
+
+
+def make_png(color, size=(64, 64)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+GENERATED_PNG = make_png('orange')
+CACHED_PNG = make_png('purple')
+GENERATED_B64 = b64encode(GENERATED_PNG).decode('utf-8')
+JPEG_MAGIC = b'\xff\xd8\xff'
 
 
 @pytest.fixture
@@ -30,7 +49,7 @@ def mock_config():
 def mock_openai_response():
     mock_response = Mock()
     mock_response.data = [Mock()]
-    mock_response.data[0].b64_json = b64encode(b'fake_image').decode('utf-8')
+    mock_response.data[0].b64_json = GENERATED_B64
     return mock_response
 
 
@@ -38,6 +57,7 @@ def mock_openai_response():
 def lambda_context():
     context = Mock()
     context.aws_request_id = 'test-id'
+    context.get_remaining_time_in_millis.return_value = 300000
     return context
 
 
@@ -46,10 +66,27 @@ def test_handler_success(
 ):
     with patch('boto3.client') as mock_boto:
         mock_s3 = Mock()
+        # Nothing has been published today yet
+        mock_s3.get_paginator.return_value.paginate.return_value = [{'Contents': []}]
         mock_s3.get_object.return_value = {
             'Body': Mock(read=lambda: json.dumps(mock_config).encode())
         }
         mock_dynamodb = Mock()
+        mock_dynamodb.get_item.return_value = {}
+        written_job_ids = []
+        uploaded_before_record = []
+
+        def put_item(TableName, Item, **kwargs):
+            if Item.get('status') == {'S': 'uploaded'}:
+                written_job_ids.append(Item['job_id']['S'])
+
+        def put_object(**kwargs):
+            job_id = kwargs['Key'].replace('images/', '')
+            if kwargs['Key'].startswith('images/') and job_id not in written_job_ids:
+                uploaded_before_record.append(job_id)
+
+        mock_dynamodb.put_item.side_effect = put_item
+        mock_s3.put_object.side_effect = put_object
         mock_secrets = Mock()
         mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
 
@@ -67,14 +104,19 @@ def test_handler_success(
             mock_client.images.generate.return_value = mock_openai_response
             mock_openai.return_value = mock_client
 
-            with patch('builtins.open', mock_open()):
+            with patch('builtins.open', mock_open()) as mock_file:
                 from main import handler
 
                 response = handler({}, lambda_context)
 
                 assert response['statusCode'] == 200
-                assert mock_s3.upload_file.called
-                assert mock_dynamodb.put_item.called
+                assert mock_s3.put_object.called
+                assert not mock_s3.upload_file.called
+                assert not mock_file.called
+                # The upload triggers twitter_post, so each record must
+                # already exist when its image lands in images/
+                assert len(written_job_ids) == 2
+                assert uploaded_before_record == []
 
 
 def test_handler_failure(mock_env_vars, mock_config, lambda_context):
@@ -103,6 +145,210 @@ def test_handler_failure(mock_env_vars, mock_config, lambda_context):
             assert response['statusCode'] == 500
 
 
+def published_metrics(output):
+    """Collect the EMF metric values written to stdout by log_metrics."""
+    values = {}
+    for line in output.splitlines():
+        if '"_aws"' not in line:
+            continue
+        document = json.loads(line)
+        for directive in document['_aws']['CloudWatchMetrics']:
+            for metric in directive['Metrics']:
+                value = document[metric['Name']]
+                values.setdefault(metric['Name'], []).extend(
+                    value if isinstance(value, list) else [value]
+                )
+    return values
+
+
+@pytest.mark.parametrize('stage_metrics', ['on', 'off'])
+def test_handler_publishes_stage_metrics(
+    mock_env_vars,
+    mock_config,
+    mock_openai_response,
+    lambda_context,
+    monkeypatch,
+    capsys,
+    stage_metrics,
+):
+    monkeypatch.setenv('STAGE_METRICS', stage_metrics)
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        # Nothing has been published today yet
+        mock_s3.get_paginator.return_value.paginate.return_value = [{'Contents': []}]
+        mock_s3.get_object.return_value = {
+            'Body': Mock(read=lambda: json.dumps(mock_config).encode())
+        }
+        mock_dynamodb = Mock()
+        mock_dynamodb.get_item.return_value = {}
+        mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            if service == 's3':
+                return mock_s3
+            if service == 'secretsmanager':
+                return mock_secrets
+            return mock_dynamodb
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI') as mock_openai:
+            mock_openai.return_value.images.generate.return_value = mock_openai_response
+            import main
+
+            main.metrics.clear_metrics()
+            capsys.readouterr()
+            response = main.handler({}, lambda_context)
+
+    assert response['statusCode'] == 200
+    metrics = published_metrics(capsys.readouterr().out)
+
+    if stage_metrics == 'off':
+        assert metrics == {}
+        return
+
+    for stage in ('CacheLookup', 'GenerateImage', 'Transcode', 'S3Upload'):
+        assert len(metrics[f'{stage}Duration']) == 2
+    assert metrics['GenerateImageBytes'] == [len(GENERATED_B64)] * 2
+    assert metrics['Base64DecodeBytes'] == [len(GENERATED_PNG)] * 2
+    assert metrics['CacheMisses'] == [1, 1]
+    assert metrics['ImagesGenerated'] == [1, 1]
+    assert len(metrics['ManifestUpdateDuration']) == 1
+    assert 'ImagesFailed' not in metrics
+
+
+def url_mode_clients(mock_boto, mock_config):
+    mock_s3 = Mock()
+    # Nothing has been published today yet
+    mock_s3.get_paginator.return_value.paginate.return_value = [{'Contents': []}]
+    mock_s3.get_object.return_value = {
+        'Body': Mock(read=lambda: json.dumps(mock_config).encode())
+    }
+    mock_s3.create_multipart_upload.return_value = {'UploadId': 'upload-id'}
+    mock_s3.upload_part.side_effect = lambda **kwargs: {
+        'ETag': f'etag-{kwargs["PartNumber"]}'
+    }
+    mock_dynamodb = Mock()
+    mock_dynamodb.get_item.return_value = {}
+    mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+    mock_secrets = Mock()
+    mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+    mock_boto.side_effect = lambda service: {
+        's3': mock_s3,
+        'secretsmanager': mock_secrets,
+    }.get(service, mock_dynamodb)
+    return mock_s3, mock_dynamodb
+
+
+def image_download(chunks):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = chunks
+    return response
+
+
+def test_handler_url_mode_streams_into_multipart_upload(
+    mock_env_vars, mock_config, lambda_context, monkeypatch
+):
+    monkeypatch.setenv('STREAM_PART_SIZE_BYTES', '5000')
+    # Random pixels barely compress, so the PNG spans several parts
+    noise = BytesIO()
+    pixels = random.Random(0).randbytes(64 * 64 * 3)
+    Image.frombytes('RGB', (64, 64), pixels).save(noise, format='PNG')
+    original = noise.getvalue()
+    chunks = [original[i : i + 4096] for i in range(0, len(original), 4096)]
+    with patch('boto3.client') as mock_boto:
+        mock_s3, mock_dynamodb = url_mode_clients(mock_boto, mock_config)
+
+        with (
+            patch('openai.OpenAI') as mock_openai,
+            patch('requests.Session') as mock_session,
+        ):
+            generate = mock_openai.return_value.images.generate
+            generate.return_value = Mock(data=[Mock(url='https://dalle/image.png')])
+            mock_session.return_value.get.side_effect = lambda *a, **kw: image_download(
+                chunks
+            )
+            from main import handler
+
+            response = handler({'response_format': 'url'}, lambda_context)
+
+    assert response['statusCode'] == 200
+    assert {c.kwargs['response_format'] for c in generate.call_args_list} == {'url'}
+
+    # Every part but the last is exactly the part size, and together they
+    # are the original image
+    for key in {c.kwargs['Key'] for c in mock_s3.upload_part.call_args_list}:
+        parts = [
+            c.kwargs
+            for c in mock_s3.upload_part.call_args_list
+            if c.kwargs['Key'] == key
+        ]
+        assert key.startswith('cache/')
+        assert b''.join(part['Body'] for part in parts) == original
+        assert len(parts) == 3
+        assert {len(part['Body']) for part in parts[:-1]} == {5000}
+    assert mock_s3.complete_multipart_upload.call_count == 2
+    completed = mock_s3.complete_multipart_upload.call_args.kwargs
+    assert completed['MultipartUpload']['Parts'][0] == {
+        'ETag': 'etag-1',
+        'PartNumber': 1,
+    }
+
+    images = [
+        c.kwargs['Body']
+        for c in mock_s3.put_object.call_args_list
+        if c.kwargs['Key'].startswith('images/')
+    ]
+    assert len(images) == 2
+    assert all(body.startswith(JPEG_MAGIC) for body in images)
+    # The streamed originals are indexed for the generation cache
+    cache_items = [
+        c.kwargs['Item']
+        for c in mock_dynamodb.put_item.call_args_list
+        if c.kwargs['Item']['job_id']['S'].startswith('cache#')
+    ]
+    assert len(cache_items) == 2
+
+
+def test_url_mode_aborts_upload_when_download_fails(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        mock_s3, _ = url_mode_clients(mock_boto, mock_config)
+
+        with patch('openai.OpenAI'), patch('requests.Session') as mock_session:
+            download = image_download([GENERATED_PNG[:100]])
+            download.raise_for_status.side_effect = RuntimeError('403 Forbidden')
+            mock_session.return_value.get.return_value = download
+            import main
+
+            with pytest.raises(RuntimeError, match='403'):
+                main.stream_image_to_s3(
+                    'https://dalle/image.png', 'bucket', 'cache/x.png'
+                )
+
+    mock_s3.abort_multipart_upload.assert_called_once_with(
+        Bucket='bucket', Key='cache/x.png', UploadId='upload-id'
+    )
+    assert not mock_s3.complete_multipart_upload.called
+
+
+def test_handler_rejects_unknown_response_format(
+    mock_env_vars, mock_config, lambda_context
+):
+    with patch('boto3.client') as mock_boto:
+        url_mode_clients(mock_boto, mock_config)
+
+        with patch('openai.OpenAI') as mock_openai:
+            from main import handler
+
+            response = handler({'response_format': 'png'}, lambda_context)
+            assert not mock_openai.return_value.images.generate.called
+
+    assert response['statusCode'] == 400
+
+
 def test_upload_removes_tmp_prefix(mock_env_vars, mock_config):
     with patch('boto3.client') as mock_boto:
         mock_s3 = Mock()
@@ -129,11 +375,42 @@ def test_upload_removes_tmp_prefix(mock_env_vars, mock_config):
                 'bucket',
                 'images/test.jpg',
                 ExtraArgs={
-                    'CacheControl': 'no-store, no-cache, must-revalidate, max-age=0'
+                    'CacheControl': 'no-store, no-cache, must-revalidate, max-age=0',
+                    'ContentType': 'image/jpeg',
                 },
             )
 
 
+def test_upload_image_bytes(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = {
+            'Body': Mock(read=lambda: json.dumps(mock_config).encode())
+        }
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            if service == 'secretsmanager':
+                return mock_secrets
+            return mock_s3
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI'):
+            from main import upload_image_bytes_to_s3
+
+            upload_image_bytes_to_s3(b'image', 'test.jpg', 'bucket')
+
+            mock_s3.put_object.assert_called_once_with(
+                Bucket='bucket',
+                Key='images/test.jpg',
+                Body=b'image',
+                ContentType='image/jpeg',
+                CacheControl='no-store, no-cache, must-revalidate, max-age=0',
+            )
+
+
 def test_dynamodb_insert(mock_env_vars, mock_config):
     with patch('boto3.client') as mock_boto:
         mock_s3 = Mock()
@@ -141,6 +418,7 @@ def test_dynamodb_insert(mock_env_vars, mock_config):
             'Body': Mock(read=lambda: json.dumps(mock_config).encode())
         }
         mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
         mock_secrets = Mock()
         mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
 
@@ -162,3 +440,1408 @@ def test_dynamodb_insert(mock_env_vars, mock_config):
             args = mock_dynamodb.put_item.call_args[1]
             assert args['Item']['job_id']['S'] == 'test_job'
             assert args['Item']['status']['S'] == 'uploaded'
+
+
+def test_process_national_days_streams_each_image(
+    mock_env_vars, mock_config, monkeypatch
+):
+    monkeypatch.setenv('GENERATION_CACHE_MODE', 'off')
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+
+        def get_object(Bucket, Key, **kwargs):
+            if Key == 'gallery/manifest.json':
+                raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+            return {'Body': Mock(read=lambda: json.dumps(mock_config).encode())}
+
+        mock_s3.get_object.side_effect = get_object
+        # The first manifest write lists the bucket, which has nothing older
+        mock_s3.get_paginator.return_value.paginate.return_value = [{}]
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            if service == 'secretsmanager':
+                return mock_secrets
+            if service == 's3':
+                return mock_s3
+            return mock_dynamodb
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI') as mock_openai:
+            mock_client = Mock()
+
+            def generate(**kwargs):
+                if 'Hat' in kwargs['prompt']:
+                    raise Exception('API Error')
+                response = Mock()
+                response.data = [Mock(b64_json=GENERATED_B64)]
+                return response
+
+            mock_client.images.generate.side_effect = generate
+            mock_openai.return_value = mock_client
+
+            import main
+
+            run = main.RunContext.for_date(datetime.now())
+
+            with pytest.raises(RuntimeError, match='Hat'):
+                main.process_national_days(
+                    run, main.national_days_config, 'b64_json', 'hd'
+                )
+
+            assert run.failed_days == ['Hat']
+            assert len(run.job_ids) == 1
+            assert run.job_ids[0].endswith('_1_Bagel.jpg')
+
+            assert mock_client.images.generate.call_count == 2
+            uploads = {
+                call[1]['Key']: call[1] for call in mock_s3.put_object.call_args_list
+            }
+            image_keys = [key for key in uploads if key.startswith('images/')]
+            assert len(image_keys) == 1
+            put_args = uploads[image_keys[0]]
+            assert put_args['ContentType'] == 'image/jpeg'
+            stem = image_keys[0][len('images/') : -len('.jpg')]
+            for width in (320, 640):
+                thumbnail = uploads[f'thumbnails/{stem}_{width}.webp']
+                assert thumbnail['ContentType'] == 'image/webp'
+                with Image.open(BytesIO(thumbnail['Body'])) as image:
+                    assert image.format == 'WEBP'
+                    assert image.width <= width
+            assert put_args['Key'].endswith('_1_Bagel.jpg')
+            assert put_args['Body'].startswith(JPEG_MAGIC)
+            records = [
+                call[1]['Item']
+                for call in mock_dynamodb.put_item.call_args_list
+                if 'status' in call[1]['Item']
+            ]
+            assert len(records) == 1
+            record = records[0]
+            assert record['job_id']['S'].endswith('_1_Bagel.jpg')
+            assert record['status']['S'] == 'uploaded'
+            assert put_args['Metadata'] == {
+                'record-timestamp': record['timestamp']['N']
+            }
+
+            manifest_put = uploads['gallery/manifest.json']
+            assert manifest_put['IfNoneMatch'] == '*'
+            manifest = json.loads(manifest_put['Body'])
+            assert len(manifest['images']) == 1
+            entry = manifest['images'][0]
+            assert entry['key'] == image_keys[0]
+            assert entry['day'] == 'Bagel'
+            assert entry['size'] == len(put_args['Body'])
+            assert (entry['width'], entry['height']) == (64, 64)
+            assert entry['thumbnails'] == {
+                '320': f'thumbnails/{stem}_320.webp',
+                '640': f'thumbnails/{stem}_640.webp',
+            }
+
+
+def test_run_context_for_date(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = {
+            'Body': Mock(read=lambda: json.dumps(mock_config).encode())
+        }
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            return mock_secrets if service == 'secretsmanager' else mock_s3
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI'):
+            from main import RunContext
+
+            run = RunContext.for_date(datetime(2026, 1, 14, 13, 0))
+
+            assert run.month_of_year == 'january'
+            assert run.day_of_month == '14'
+            assert run.file_prefix == 'january_14'
+            assert run.job_ids == []
+
+
+def test_handler_warm_start_does_not_reupload(
+    mock_env_vars, mock_config, mock_openai_response, lambda_context, monkeypatch
+):
+    monkeypatch.setenv('GENERATION_CACHE_MODE', 'off')
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        # Nothing has been published today yet
+        mock_s3.get_paginator.return_value.paginate.return_value = [{'Contents': []}]
+        mock_s3.get_object.return_value = {
+            'Body': Mock(read=lambda: json.dumps(mock_config).encode())
+        }
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            if service == 's3':
+                return mock_s3
+            if service == 'secretsmanager':
+                return mock_secrets
+            return mock_dynamodb
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI') as mock_openai:
+            mock_client = Mock()
+            mock_client.images.generate.return_value = mock_openai_response
+            mock_openai.return_value = mock_client
+
+            from main import handler
+
+            assert handler({}, lambda_context)['statusCode'] == 200
+            assert handler({}, lambda_context)['statusCode'] == 200
+
+            image_uploads = [
+                call
+                for call in mock_s3.put_object.call_args_list
+                if call[1]['Key'].startswith('images/')
+            ]
+            assert len(image_uploads) == 4
+            written = [
+                call
+                for call in mock_dynamodb.put_item.call_args_list
+                if call[1]['Item']['status'] == {'S': 'uploaded'}
+            ]
+            assert len(written) == 4
+
+
+def test_config_refresh_uses_etag(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            return mock_secrets if service == 'secretsmanager' else mock_s3
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI'):
+            import main
+
+            mock_s3.get_object.reset_mock()
+            mock_s3.get_object.side_effect = [
+                {
+                    'Body': Mock(read=lambda: json.dumps(mock_config).encode()),
+                    'ETag': '"abc"',
+                },
+                ClientError({'Error': {'Code': '304'}}, 'GetObject'),
+            ]
+            config = main.NationalDaysConfig('bucket', 'national-days.json', 0, '')
+            month, day = next(
+                (month, day)
+                for month, days in mock_config.items()
+                if month != 'Prompt'
+                for day in days
+            )
+
+            assert config.get_days(month, day) == ['Hat', 'Bagel']
+            assert config.get_days(month, day) == ['Hat', 'Bagel']
+            assert config.prompt == 'Create a spooky image for '
+            assert config.get_days('february', '30') == []
+
+            second_call = mock_s3.get_object.call_args_list[1][1]
+            assert second_call['IfNoneMatch'] == '"abc"'
+
+
+def test_config_falls_back_to_bundled_copy(
+    mock_env_vars, mock_config, tmp_path, monkeypatch
+):
+    bundled = tmp_path / 'national-days.json'
+    bundled.write_text(json.dumps(mock_config))
+    monkeypatch.setenv('NATIONAL_DAYS_LOCAL_PATH', str(bundled))
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.side_effect = ClientError(
+            {'Error': {'Code': 'AccessDenied'}}, 'GetObject'
+        )
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+        mock_boto.side_effect = lambda service: (
+            mock_secrets if service == 'secretsmanager' else mock_s3
+        )
+
+        with patch('openai.OpenAI'):
+            import main
+
+            run = main.RunContext.for_date(datetime.now())
+            days = main.national_days_config.get_days(
+                run.month_of_year, run.day_of_month
+            )
+
+            assert days == ['Hat', 'Bagel']
+            assert main.national_days_config.prompt == mock_config['Prompt']
+
+
+def test_config_falls_back_to_local_file(mock_env_vars, mock_config, tmp_path):
+    local_path = tmp_path / 'national-days.json'
+    local_path.write_text(json.dumps(mock_config))
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchKey'}}, 'GetObject'
+        )
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            return mock_secrets if service == 'secretsmanager' else mock_s3
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI'):
+            import main
+
+            mock_s3.get_object.reset_mock()
+            config = main.NationalDaysConfig(
+                'bucket', 'national-days.json', 3600, str(local_path)
+            )
+            config.ensure_fresh()
+            config.ensure_fresh()
+
+            assert config.prompt == 'Create a spooky image for '
+            assert mock_s3.get_object.call_count == 1
+
+
+def test_batch_writer_flushes_in_groups_and_retries(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_dynamodb = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            if service == 'secretsmanager':
+                return mock_secrets
+            if service == 's3':
+                return mock_s3
+            return mock_dynamodb
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI'), patch('time.sleep') as mock_sleep:
+            import main
+
+            unprocessed = {
+                'test-table': [
+                    {'PutRequest': {'Item': main.build_job_record('retry.jpg')}}
+                ]
+            }
+            mock_dynamodb.batch_write_item.side_effect = [
+                {'UnprocessedItems': unprocessed},
+                {'UnprocessedItems': {}},
+                {'UnprocessedItems': {}},
+            ]
+
+            writer = main.DynamoDBBatchWriter('test-table')
+            for indx in range(30):
+                writer.add(main.build_job_record(f'job_{indx}.jpg', 'uploaded'))
+
+            # The first 25 records are written as soon as the batch fills
+            assert mock_dynamodb.batch_write_item.call_count == 2
+            assert mock_sleep.call_count == 1
+            retried = mock_dynamodb.batch_write_item.call_args_list[1][1]
+            assert retried['RequestItems'] == unprocessed
+
+            writer.flush()
+
+            assert mock_dynamodb.batch_write_item.call_count == 3
+            last = mock_dynamodb.batch_write_item.call_args[1]['RequestItems']
+            assert len(last['test-table']) == 5
+            assert len(writer.flush_latencies_ms) == 2
+
+
+def test_retry_engine_retries_transient_errors(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            return mock_secrets if service == 'secretsmanager' else mock_s3
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI'), patch('time.sleep') as mock_sleep:
+            import main
+
+            engine = main.OpenAIRetryEngine(lambda: 120000, estimate_ms=1000)
+            calls = []
+
+            def flaky(timeout):
+                calls.append(timeout)
+                if len(calls) < 3:
+                    raise openai.APIConnectionError(request=Mock())
+                return 'image'
+
+            assert engine.call(flaky) == 'image'
+            assert len(calls) == 3
+            assert calls[0] == pytest.approx(115)
+            assert mock_sleep.call_count == 2
+            assert engine.retries_used == 2
+            assert engine.consecutive_failures == 0
+
+
+def test_retry_engine_respects_deadline_and_breaker(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            return mock_secrets if service == 'secretsmanager' else mock_s3
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI'), patch('time.sleep'):
+            import main
+
+            fn = Mock(return_value='image')
+            engine = main.OpenAIRetryEngine(lambda: 20000, estimate_ms=45000)
+            with pytest.raises(main.DeadlineExceededError):
+                engine.call(fn)
+            assert not fn.called
+
+            engine = main.OpenAIRetryEngine(breaker_threshold=2, max_attempts=1)
+            # Rejected prompts do not open the circuit
+            fn.side_effect = ValueError('content policy')
+            for _ in range(3):
+                with pytest.raises(ValueError):
+                    engine.call(fn)
+            assert fn.call_count == 3
+            assert not engine.is_open
+
+            fn.side_effect = openai.APIConnectionError(request=Mock())
+            for _ in range(2):
+                with pytest.raises(openai.APIConnectionError):
+                    engine.call(fn)
+            assert fn.call_count == 5
+
+            with pytest.raises(main.CircuitOpenError):
+                engine.call(fn)
+            assert fn.call_count == 5
+
+
+BACKFILL_CONFIG = {
+    'Prompt': 'Create a spooky image for ',
+    'october': {'30': ['Candy Corn'], '31': ['Hat', 'Bagel']},
+    'november': {'1': ['Cookie']},
+}
+
+
+def backfill_clients(mock_boto, checkpoint_item, s3_listing=None, config=None):
+    mock_s3 = Mock()
+    mock_s3.get_object.return_value = {
+        'Body': Mock(read=lambda: json.dumps(config or BACKFILL_CONFIG).encode())
+    }
+    mock_s3.get_paginator.return_value.paginate.side_effect = lambda **kwargs: [
+        {'Contents': (s3_listing or {}).get(kwargs['Prefix'], [])}
+    ]
+    mock_dynamodb = Mock()
+    mock_dynamodb.get_item.side_effect = lambda **kwargs: (
+        {'Item': checkpoint_item}
+        if kwargs['Key']['job_id']['S'].startswith('backfill#')
+        else {}
+    )
+    mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+    mock_secrets = Mock()
+    mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+    mock_boto.side_effect = lambda service: {
+        's3': mock_s3,
+        'secretsmanager': mock_secrets,
+    }.get(service, mock_dynamodb)
+    return mock_s3, mock_dynamodb
+
+
+def test_backfill_resumes_from_checkpoint(
+    mock_env_vars, mock_openai_response, lambda_context, monkeypatch
+):
+    monkeypatch.setenv('BACKFILL_IMAGES_PER_MINUTE', '600000')
+    # october 30 finished and october 31 was cut short after the first image
+    checkpoint_item = {
+        'completed_days': {'SS': ['2025-10-30']},
+        'completed_jobs': {
+            'SS': ['october_30_0_CandyCorn.jpg', 'october_31_0_Hat.jpg']
+        },
+    }
+    with patch('boto3.client') as mock_boto:
+        mock_s3, mock_dynamodb = backfill_clients(mock_boto, checkpoint_item)
+
+        with patch('openai.OpenAI') as mock_openai:
+            generate = mock_openai.return_value.images.generate
+            generate.return_value = mock_openai_response
+            from main import handler
+
+            response = handler(
+                {
+                    'action': 'backfill',
+                    'start_date': '2025-10-30',
+                    'end_date': '2025-11-01',
+                },
+                lambda_context,
+            )
+
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert body['completed'] == ['2025-10-30', '2025-10-31', '2025-11-01']
+    assert body['failed'] == [] and body['remaining'] == []
+
+    prompts = [c.kwargs['prompt'] for c in generate.call_args_list]
+    assert sorted(prompts) == [
+        'Create a spooky image for Bagel Day.',
+        'Create a spooky image for Cookie Day.',
+    ]
+    uploaded = [c.kwargs['Key'] for c in mock_s3.put_object.call_args_list]
+    assert 'images/october_31_1_Bagel.jpg' in uploaded
+    assert 'images/october_31_0_Hat.jpg' not in uploaded
+
+    checkpoints = [
+        c.kwargs
+        for c in mock_dynamodb.update_item.call_args_list
+        if c.kwargs['Key']['job_id']['S'] == f'backfill#{body["backfill_id"]}'
+    ]
+    recorded = [
+        (
+            c['ExpressionAttributeNames']['#attribute'],
+            c['ExpressionAttributeValues'][':value']['SS'],
+        )
+        for c in checkpoints
+    ]
+    assert ('completed_jobs', ['october_31_1_Bagel.jpg']) in recorded
+    assert ('completed_days', ['2025-10-31']) in recorded
+    assert ('completed_days', ['2025-11-01']) in recorded
+    assert all(c['Key']['timestamp'] == {'N': '0'} for c in checkpoints)
+
+
+def test_backfill_leaves_days_that_do_not_fit_for_the_next_run(
+    mock_env_vars, lambda_context
+):
+    lambda_context.get_remaining_time_in_millis.return_value = 30000
+    with patch('boto3.client') as mock_boto:
+        backfill_clients(mock_boto, {})
+
+        with patch('openai.OpenAI') as mock_openai:
+            from main import handler
+
+            response = handler(
+                {
+                    'action': 'backfill',
+                    'start_date': '2025-10-31',
+                    'end_date': '2025-11-01',
+                },
+                lambda_context,
+            )
+            assert not mock_openai.return_value.images.generate.called
+
+    assert response['statusCode'] == 500
+    body = json.loads(response['body'])
+    assert body['remaining'] == ['2025-10-31', '2025-11-01']
+    assert body['completed'] == []
+
+
+def test_backfill_skips_published_jobs_and_stages_future_days(
+    mock_env_vars, mock_openai_response, lambda_context, monkeypatch
+):
+    monkeypatch.setenv('BACKFILL_IMAGES_PER_MINUTE', '600000')
+    past, future = date.today() - timedelta(days=3), date.today() + timedelta(days=3)
+    config = {'Prompt': 'Create a spooky image for '}
+    for run_date in (past, future):
+        config.setdefault(run_date.strftime('%B').lower(), {})[str(run_date.day)] = [
+            'Hat',
+            'Bagel',
+        ]
+    past_prefix, future_prefix = file_prefix(past), file_prefix(future)
+    posted = datetime.combine(past, datetime.min.time(), timezone.utc)
+    listing = {
+        # Hat went out on the day; Bagel is last year's image
+        f'images/{past_prefix}_': [
+            {'Key': f'images/{past_prefix}_0_Hat.jpg', 'LastModified': posted},
+            {
+                'Key': f'images/{past_prefix}_1_Bagel.jpg',
+                'LastModified': posted - timedelta(days=365),
+            },
+        ],
+    }
+    with patch('boto3.client') as mock_boto:
+        mock_s3, mock_dynamodb = backfill_clients(mock_boto, {}, listing, config)
+
+        with patch('openai.OpenAI') as mock_openai:
+            generate = mock_openai.return_value.images.generate
+            generate.return_value = mock_openai_response
+            from main import handler
+
+            response = handler(
+                {
+                    'action': 'backfill',
+                    'start_date': past.isoformat(),
+                    'end_date': future.isoformat(),
+                },
+                lambda_context,
+            )
+
+    assert response['statusCode'] == 200
+    assert generate.call_count == 3
+    uploaded = sorted(
+        c.kwargs['Key']
+        for c in mock_s3.put_object.call_args_list
+        if c.kwargs['Key'].startswith(('images/', 'staging/'))
+    )
+    # Nothing for the future day is posted before publish promotes it
+    assert uploaded == [
+        f'images/{past_prefix}_1_Bagel.jpg',
+        f'staging/{future_prefix}_0_Hat.jpg',
+        f'staging/{future_prefix}_1_Bagel.jpg',
+    ]
+    records = [
+        request['PutRequest']['Item']
+        for c in mock_dynamodb.batch_write_item.call_args_list
+        for requests in c.kwargs['RequestItems'].values()
+        for request in requests
+    ] + [c.kwargs['Item'] for c in mock_dynamodb.put_item.call_args_list]
+    statuses = {
+        record['job_id']['S']: record['status']['S']
+        for record in records
+        if record['job_id']['S'].endswith('.jpg')
+    }
+    assert statuses == {
+        f'{past_prefix}_1_Bagel.jpg': 'uploaded',
+        f'{future_prefix}_0_Hat.jpg': 'ready',
+        f'{future_prefix}_1_Bagel.jpg': 'ready',
+    }
+    # Staged records share one batch; the published one is written on its own
+    # before its upload
+    staged_batches = [
+        c.kwargs['RequestItems']['test-table']
+        for c in mock_dynamodb.batch_write_item.call_args_list
+    ]
+    assert [len(batch) for batch in staged_batches] == [2]
+
+
+@pytest.mark.parametrize(
+    'event',
+    [
+        {'action': 'backfill'},
+        {'action': 'backfill', 'start_date': '2025-10-31', 'end_date': '2025-10-01'},
+        {'action': 'backfill', 'days': [['smarch', '1']]},
+        {'action': 'backfill', 'days': []},
+        {'action': 'backfill', 'start_date': '2999-10-31'},
+    ],
+)
+def test_backfill_rejects_invalid_requests(mock_env_vars, lambda_context, event):
+    with patch('boto3.client') as mock_boto:
+        backfill_clients(mock_boto, {})
+
+        with patch('openai.OpenAI'):
+            from main import handler
+
+            response = handler(event, lambda_context)
+
+    assert response['statusCode'] == 400
+
+
+def staging_clients(mock_boto, config, s3_listing, ready_items=()):
+    mock_s3 = Mock()
+    mock_s3.get_object.return_value = {
+        'Body': Mock(read=lambda: json.dumps(config).encode())
+    }
+    mock_s3.get_paginator.return_value.paginate.side_effect = lambda **kwargs: [
+        {'Contents': s3_listing.get(kwargs['Prefix'], [])}
+    ]
+    mock_dynamodb = Mock()
+    mock_dynamodb.get_item.return_value = {}
+    mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+    mock_dynamodb.get_paginator.return_value.paginate.return_value = [
+        {'Items': list(ready_items)}
+    ]
+    mock_secrets = Mock()
+    mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+    mock_boto.side_effect = lambda service: {
+        's3': mock_s3,
+        'secretsmanager': mock_secrets,
+    }.get(service, mock_dynamodb)
+    return mock_s3, mock_dynamodb
+
+
+def file_prefix(run_date):
+    return f'{run_date.strftime("%B").lower()}_{run_date.day}'
+
+
+def test_lookahead_stages_ready_images_for_the_next_days(
+    mock_env_vars, mock_openai_response, lambda_context, monkeypatch
+):
+    monkeypatch.setenv('PUBLISH_WEEKDAYS', 'mon,tue,wed,thu,fri,sat,sun')
+    first, second = (date.today() + timedelta(days=offset) for offset in (1, 2))
+    config = {'Prompt': 'Create a spooky image for '}
+    config.setdefault(first.strftime('%B').lower(), {})[str(first.day)] = [
+        'Hat',
+        'Bagel',
+    ]
+    config.setdefault(second.strftime('%B').lower(), {})[str(second.day)] = ['Cookie']
+    # An earlier lookahead already staged the first image of the first day
+    listing = {
+        f'staging/{file_prefix(first)}_': [
+            {'Key': f'staging/{file_prefix(first)}_0_Hat.jpg'}
+        ]
+    }
+    with patch('boto3.client') as mock_boto:
+        mock_s3, mock_dynamodb = staging_clients(mock_boto, config, listing)
+
+        with patch('openai.OpenAI') as mock_openai:
+            generate = mock_openai.return_value.images.generate
+            generate.return_value = mock_openai_response
+            from main import handler
+
+            response = handler({'action': 'lookahead'}, lambda_context)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['staged'] == [
+        first.isoformat(),
+        second.isoformat(),
+    ]
+    assert generate.call_count == 2
+
+    images = [
+        c.kwargs['Key']
+        for c in mock_s3.put_object.call_args_list
+        if c.kwargs['Key'].endswith('.jpg')
+    ]
+    assert sorted(images) == [
+        f'staging/{file_prefix(first)}_1_Bagel.jpg',
+        f'staging/{file_prefix(second)}_0_Cookie.jpg',
+    ]
+
+    records = [
+        request['PutRequest']['Item']
+        for c in mock_dynamodb.batch_write_item.call_args_list
+        for request in c.kwargs['RequestItems']['test-table']
+    ]
+    assert {record['status']['S'] for record in records} == {'ready'}
+    assert all('ttl' in record for record in records)
+    entry = json.loads(records[0]['manifest_entry']['S'])
+    assert entry['key'] == f'images/{records[0]["job_id"]["S"]}'
+
+
+def test_lookahead_dates_skip_days_that_are_not_published(mock_env_vars):
+    with patch('boto3.client'), patch('openai.OpenAI'):
+        import main
+
+        friday = date(2025, 10, 31)
+        assert main.lookahead_dates(friday, 2) == [
+            date(2025, 11, 3),
+            date(2025, 11, 4),
+        ]
+        assert main.lookahead_dates(friday, 1, 'sat') == [date(2025, 11, 1)]
+        assert main.lookahead_dates(friday, 3, '') == []
+
+
+def test_publish_promotes_staged_images_and_generates_the_rest(
+    mock_env_vars, mock_config, mock_openai_response, lambda_context
+):
+    prefix = file_prefix(date.today())
+    ready = {
+        'job_id': {'S': f'{prefix}_0_Hat.jpg'},
+        'timestamp': {'N': '1700000000'},
+        'status': {'S': 'ready'},
+        'manifest_entry': {
+            'S': json.dumps({'key': f'images/{prefix}_0_Hat.jpg', 'day': 'Hat'})
+        },
+    }
+    with patch('boto3.client') as mock_boto:
+        mock_s3, mock_dynamodb = staging_clients(mock_boto, mock_config, {}, [ready])
+
+        with patch('openai.OpenAI') as mock_openai:
+            generate = mock_openai.return_value.images.generate
+            generate.return_value = mock_openai_response
+            from main import handler
+
+            response = handler({'action': 'publish'}, lambda_context)
+
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    assert body['promoted'] == [f'{prefix}_0_Hat.jpg']
+    assert body['generated'] == [f'{prefix}_1_Bagel.jpg']
+
+    # Only the image lookahead missed is generated at publish time
+    assert [c.kwargs['prompt'] for c in generate.call_args_list] == [
+        'Create a spooky image for Bagel Day.'
+    ]
+    copy = mock_s3.copy_object.call_args.kwargs
+    assert copy['Key'] == f'images/{prefix}_0_Hat.jpg'
+    assert copy['CopySource']['Key'] == f'staging/{prefix}_0_Hat.jpg'
+    assert copy['MetadataDirective'] == 'COPY'
+    mock_s3.delete_object.assert_called_once_with(
+        Bucket='test-bucket', Key=f'staging/{prefix}_0_Hat.jpg'
+    )
+
+    update = mock_dynamodb.update_item.call_args.kwargs
+    assert update['Key'] == {
+        'job_id': ready['job_id'],
+        'timestamp': ready['timestamp'],
+    }
+    assert update['ConditionExpression'] == '#status = :ready'
+    # The stuck-job sweep ages published records from uploaded_at
+    assert 'uploaded_at = :now' in update['UpdateExpression']
+    query = mock_dynamodb.get_paginator.return_value.paginate.call_args.kwargs
+    assert query['IndexName'] == 'status-timestamp-index'
+    assert query['ExpressionAttributeValues'][':prefix'] == {'S': f'{prefix}_'}
+
+
+def test_publish_does_not_repost_images_already_published_today(
+    mock_env_vars, mock_config, mock_openai_response, lambda_context
+):
+    prefix = file_prefix(date.today())
+    now = datetime.now(timezone.utc)
+    last_year = now - timedelta(days=365)
+    listing = {
+        f'images/{prefix}_': [
+            {'Key': f'images/{prefix}_0_Hat.jpg', 'LastModified': now},
+            {'Key': f'images/{prefix}_1_Bagel.jpg', 'LastModified': last_year},
+        ]
+    }
+    with patch('boto3.client') as mock_boto:
+        mock_s3, _ = staging_clients(mock_boto, mock_config, listing)
+
+        with patch('openai.OpenAI') as mock_openai:
+            generate = mock_openai.return_value.images.generate
+            generate.return_value = mock_openai_response
+            from main import handler
+
+            response = handler({'action': 'publish'}, lambda_context)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['generated'] == [f'{prefix}_1_Bagel.jpg']
+    assert generate.call_count == 1
+    assert not mock_s3.copy_object.called
+
+
+def test_publish_does_not_regenerate_images_whose_promotion_failed(
+    mock_env_vars, mock_config, mock_openai_response, lambda_context
+):
+    prefix = file_prefix(date.today())
+    ready = {
+        'job_id': {'S': f'{prefix}_0_Hat.jpg'},
+        'timestamp': {'N': '1700000000'},
+        'status': {'S': 'ready'},
+        'manifest_entry': {
+            'S': json.dumps({'key': f'images/{prefix}_0_Hat.jpg', 'day': 'Hat'})
+        },
+    }
+    with patch('boto3.client') as mock_boto:
+        mock_s3, mock_dynamodb = staging_clients(mock_boto, mock_config, {}, [ready])
+        # The image is already in images/ when the record update fails
+        mock_dynamodb.update_item.side_effect = Exception('DynamoDB Error')
+
+        with patch('openai.OpenAI') as mock_openai:
+            generate = mock_openai.return_value.images.generate
+            generate.return_value = mock_openai_response
+            from main import handler
+
+            response = handler({'action': 'publish'}, lambda_context)
+
+    assert response['statusCode'] == 500
+    body = json.loads(response['body'])
+    assert body['promoted'] == []
+    assert body['unpublished'] == [f'{prefix}_0_Hat.jpg']
+    assert body['generated'] == [f'{prefix}_1_Bagel.jpg']
+    mock_s3.copy_object.assert_called_once()
+    assert [c.kwargs['prompt'] for c in generate.call_args_list] == [
+        'Create a spooky image for Bagel Day.'
+    ]
+    uploaded = [
+        c.kwargs['Key']
+        for c in mock_s3.put_object.call_args_list
+        if c.kwargs['Key'].startswith('images/')
+    ]
+    assert uploaded == [f'images/{prefix}_1_Bagel.jpg']
+
+
+def test_handler_follow_up_run_skips_images_published_today(
+    mock_env_vars, mock_config, mock_openai_response, lambda_context
+):
+    prefix = file_prefix(date.today())
+    # An earlier run today uploaded Hat before failing on Bagel
+    listing = {
+        f'images/{prefix}_': [
+            {'Key': f'images/{prefix}_0_Hat.jpg', 'LastModified': datetime.now()}
+        ]
+    }
+    with patch('boto3.client') as mock_boto:
+        mock_s3, _ = staging_clients(mock_boto, mock_config, listing)
+
+        with patch('openai.OpenAI') as mock_openai:
+            generate = mock_openai.return_value.images.generate
+            generate.return_value = mock_openai_response
+            from main import handler
+
+            response = handler({}, lambda_context)
+
+    assert response['statusCode'] == 200
+    assert [c.kwargs['prompt'] for c in generate.call_args_list] == [
+        'Create a spooky image for Bagel Day.'
+    ]
+    uploaded = [
+        c.kwargs['Key']
+        for c in mock_s3.put_object.call_args_list
+        if c.kwargs['Key'].startswith('images/')
+    ]
+    assert uploaded == [f'images/{prefix}_1_Bagel.jpg']
+
+
+def test_request_throttle_spaces_requests(mock_env_vars, monkeypatch):
+    with patch('boto3.client'), patch('openai.OpenAI'):
+        import main
+
+    now = [100.0]
+    monkeypatch.setattr(main.time, 'monotonic', lambda: now[0])
+    throttle = main.RequestThrottle(per_minute=6)
+
+    assert [throttle.reserve() for _ in range(3)] == [0, 10, 20]
+    now[0] += 45
+    assert throttle.reserve() == 0
+
+
+def test_handler_reports_incomplete_days(
+    mock_env_vars, mock_config, lambda_context, monkeypatch
+):
+    # Keep the breaker closed so the failing day cannot trip it before the
+    # other day's generation starts
+    monkeypatch.setenv('OPENAI_CIRCUIT_BREAKER_THRESHOLD', '10')
+    monkeypatch.setenv('GENERATION_CACHE_MODE', 'off')
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        # Nothing has been published today yet
+        mock_s3.get_paginator.return_value.paginate.return_value = [{'Contents': []}]
+        mock_s3.get_object.return_value = {
+            'Body': Mock(read=lambda: json.dumps(mock_config).encode())
+        }
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            if service == 's3':
+                return mock_s3
+            if service == 'secretsmanager':
+                return mock_secrets
+            return mock_dynamodb
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI') as mock_openai, patch('time.sleep'):
+            mock_client = Mock()
+
+            def generate(**kwargs):
+                if 'Hat' in kwargs['prompt']:
+                    raise openai.APIConnectionError(request=Mock())
+                response = Mock()
+                response.data = [Mock(b64_json=GENERATED_B64)]
+                return response
+
+            mock_client.images.generate.side_effect = generate
+            mock_openai.return_value = mock_client
+
+            from main import handler
+
+            response = handler({}, lambda_context)
+
+            assert response['statusCode'] == 500
+            body = json.loads(response['body'])
+            assert body['incomplete_days'] == ['Hat']
+            assert len(body['completed']) == 1
+            assert body['completed'][0].endswith('_1_Bagel.jpg')
+            image_keys = [
+                call[1]['Key']
+                for call in mock_s3.put_object.call_args_list
+                if call[1]['Key'].startswith('images/')
+            ]
+            assert len(image_keys) == 1
+
+
+def test_generation_cache_hit_skips_generation(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        config_body = json.dumps(mock_config).encode()
+        mock_s3 = Mock()
+
+        def get_object(Bucket, Key, **kwargs):
+            body = CACHED_PNG if Key.startswith('cache/') else config_body
+            return {'Body': Mock(read=lambda: body)}
+
+        mock_s3.get_object.side_effect = get_object
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            if service == 'secretsmanager':
+                return mock_secrets
+            if service == 's3':
+                return mock_s3
+            return mock_dynamodb
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI') as mock_openai:
+            mock_client = Mock()
+            mock_client.images.generate.return_value = Mock(
+                data=[Mock(b64_json=GENERATED_B64)]
+            )
+            mock_openai.return_value = mock_client
+
+            import main
+
+            run = main.RunContext.for_date(datetime.now())
+            run_date = run.run_time.date().isoformat()
+            hat_key = main.GenerationCache.key_for(
+                main.build_prompt(mock_config['Prompt'], 'Hat'), 'hd'
+            )
+
+            def get_item(TableName, Key, **kwargs):
+                if Key['job_id']['S'] != f'cache#{hat_key}':
+                    return {}
+                return {
+                    'Item': {
+                        's3_key': {'S': f'cache/{hat_key}.png'},
+                        'run_date': {'S': run_date},
+                    }
+                }
+
+            mock_dynamodb.get_item.side_effect = get_item
+
+            main.process_national_days(run, main.national_days_config, 'b64_json', 'hd')
+
+            # Only Bagel is generated and cached, Hat is served from the cache
+            assert mock_client.images.generate.call_count == 1
+            assert 'Bagel' in mock_client.images.generate.call_args[1]['prompt']
+            cache_items = [
+                call[1]['Item']
+                for call in mock_dynamodb.put_item.call_args_list
+                if call[1]['Item']['job_id']['S'].startswith('cache#')
+            ]
+            assert len(cache_items) == 1
+            cache_item = cache_items[0]
+            assert cache_item['run_date']['S'] == run_date
+            assert cache_item['timestamp']['N'] == '0'
+
+            uploads = {
+                call[1]['Key']: call[1]['Body']
+                for call in mock_s3.put_object.call_args_list
+            }
+            hat_upload = [k for k in uploads if k.endswith('_0_Hat.jpg')]
+            assert uploads[hat_upload[0]].startswith(JPEG_MAGIC)
+            assert uploads[cache_item['s3_key']['S']] == GENERATED_PNG
+
+
+def test_generation_cache_modes(mock_env_vars, mock_config):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = {'Body': Mock(read=lambda: b'cached')}
+        mock_dynamodb = Mock()
+        mock_dynamodb.get_item.return_value = {
+            'Item': {
+                's3_key': {'S': 'cache/abc.png'},
+                'run_date': {'S': '2025-10-31'},
+            }
+        }
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+
+        def client_factory(service):
+            if service == 'secretsmanager':
+                return mock_secrets
+            if service == 's3':
+                return mock_s3
+            return mock_dynamodb
+
+        mock_boto.side_effect = client_factory
+
+        with patch('openai.OpenAI'):
+            from main import GenerationCache
+
+            key = GenerationCache.key_for('A Hat Day.', 'hd')
+            assert key == GenerationCache.key_for('A Hat Day.', 'hd')
+            assert key != GenerationCache.key_for('A Hat Day.', 'standard')
+
+            run_cache = GenerationCache('test-bucket', 'test-table', 'run')
+            assert run_cache.lookup(key, '2026-10-31') is None
+            assert run_cache.lookup(key, '2025-10-31') == b'cached'
+
+            reuse_cache = GenerationCache('test-bucket', 'test-table', 'reuse')
+            assert reuse_cache.lookup(key, '2026-10-31') == b'cached'
+
+            # Stored entries expire, and an expired entry DynamoDB has not
+            # deleted yet is a miss
+            reuse_cache.store(key, b'image', '2026-10-31')
+            item = mock_dynamodb.put_item.call_args[1]['Item']
+            ttl_seconds = int(item['ttl']['N']) - int(item['created_at']['N'])
+            assert ttl_seconds == 400 * 86400
+            expired = {**mock_dynamodb.get_item.return_value['Item']}
+            expired['ttl'] = {'N': '1'}
+            mock_dynamodb.get_item.return_value = {'Item': expired}
+            assert reuse_cache.lookup(key, '2026-10-31') is None
+            mock_dynamodb.get_item.return_value = {
+                'Item': {**expired, 'ttl': {'N': '99999999999'}}
+            }
+            mock_dynamodb.put_item.reset_mock()
+
+            off_cache = GenerationCache('test-bucket', 'test-table', 'off')
+            get_item_calls = mock_dynamodb.get_item.call_count
+            assert off_cache.lookup(key, '2025-10-31') is None
+            off_cache.store(key, b'image', '2025-10-31')
+            assert mock_dynamodb.get_item.call_count == get_item_calls
+            assert not mock_dynamodb.put_item.called
+
+            # A broken entry fails the day in 'run' mode instead of paying
+            # for a second generation, 'reuse' falls back to generating
+            mock_s3.get_object.side_effect = ClientError(
+                {'Error': {'Code': 'NoSuchKey'}}, 'GetObject'
+            )
+            with pytest.raises(ClientError):
+                run_cache.lookup(key, '2025-10-31')
+            assert reuse_cache.lookup(key, '2025-10-31') is None
+
+
+def test_transcode_image_produces_jpeg_and_thumbnails(mock_env_vars, monkeypatch):
+    monkeypatch.setenv('THUMBNAIL_WIDTHS', '128,256')
+    with patch('boto3.client') as mock_boto:
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+        mock_boto.side_effect = lambda service: (
+            mock_secrets if service == 'secretsmanager' else Mock()
+        )
+
+        with patch('openai.OpenAI'):
+            from main import thumbnail_key, transcode_image
+
+            jpeg_bytes, thumbnails, dimensions = transcode_image(
+                make_png('red', (1024, 1024))
+            )
+
+            with Image.open(BytesIO(jpeg_bytes)) as image:
+                assert image.format == 'JPEG'
+                assert image.size == (1024, 1024)
+            assert dimensions == (1024, 1024)
+            assert sorted(thumbnails) == [128, 256]
+            for width, data in thumbnails.items():
+                with Image.open(BytesIO(data)) as image:
+                    assert image.format == 'WEBP'
+                    assert image.size == (width, width)
+
+            assert (
+                thumbnail_key('october_31_0_Hat.jpg', 128)
+                == 'thumbnails/october_31_0_Hat_128.webp'
+            )
+
+
+def test_gallery_manifest_append_retries_on_conflict(mock_env_vars):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        versions = iter(
+            [
+                {'images': [{'key': 'images/b.jpg'}, {'key': 'images/c.jpg'}]},
+                {
+                    'images': [
+                        {'key': 'images/b.jpg'},
+                        {'key': 'images/c.jpg'},
+                        {'key': 'images/d.jpg'},
+                    ]
+                },
+            ]
+        )
+        etags = iter(['"1"', '"2"'])
+
+        def get_object(Bucket, Key, **kwargs):
+            body = json.dumps(next(versions)).encode()
+            return {'Body': Mock(read=lambda: body), 'ETag': next(etags)}
+
+        mock_s3.put_object.side_effect = [
+            ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'PutObject'),
+            {},
+        ]
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+        mock_boto.side_effect = lambda service: (
+            mock_secrets if service == 'secretsmanager' else mock_s3
+        )
+
+        with patch('openai.OpenAI'), patch('time.sleep'):
+            from main import GalleryManifest
+
+            mock_s3.get_object.side_effect = get_object
+
+            manifest = GalleryManifest('test-bucket', 'gallery/manifest.json')
+            manifest.append([{'key': 'images/a.jpg'}, {'key': 'images/c.jpg', 'x': 1}])
+
+            first, second = mock_s3.put_object.call_args_list
+            assert first[1]['IfMatch'] == '"1"'
+            assert second[1]['IfMatch'] == '"2"'
+            written = json.loads(second[1]['Body'])
+            assert written['images'] == [
+                {'key': 'images/a.jpg'},
+                {'key': 'images/b.jpg'},
+                {'key': 'images/c.jpg', 'x': 1},
+                {'key': 'images/d.jpg'},
+            ]
+
+
+def test_gallery_manifest_first_append_seeds_from_bucket(mock_env_vars):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        pages = {
+            'images/': [
+                {
+                    'Contents': [
+                        {
+                            'Key': 'images/october_31_0_BlackCat.jpg',
+                            'Size': 2048,
+                            'LastModified': datetime(2025, 10, 31, 13, 0),
+                        },
+                        {
+                            'Key': 'images/november_1_0_Bagel.jpg',
+                            'Size': 4096,
+                            'LastModified': datetime(2025, 11, 1, 13, 0),
+                        },
+                    ]
+                }
+            ],
+            'thumbnails/': [{'Contents': []}],
+        }
+        paginator = Mock()
+        paginator.paginate.side_effect = lambda Bucket, Prefix: pages[Prefix]
+        mock_s3.get_paginator.return_value = paginator
+
+        def get_object(Bucket, Key, **kwargs):
+            if Key == 'gallery/manifest.json':
+                raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+            return {'Body': Mock(read=lambda: b'')}
+
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+        mock_boto.side_effect = lambda service: (
+            mock_secrets if service == 'secretsmanager' else mock_s3
+        )
+
+        with patch('openai.OpenAI'):
+            from main import GalleryManifest
+
+            mock_s3.get_object.side_effect = get_object
+
+            # Another writer creates the manifest first
+            mock_s3.put_object.side_effect = [
+                ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'PutObject'),
+                {},
+            ]
+
+            manifest = GalleryManifest(
+                'test-bucket', 'gallery/manifest.json', base_delay_seconds=0
+            )
+            manifest.append([{'key': 'images/november_1_0_Bagel.jpg', 'day': 'Bagel'}])
+
+            # The retry reuses the first listing
+            assert [c.kwargs['Prefix'] for c in paginator.paginate.call_args_list] == [
+                'thumbnails/',
+                'images/',
+            ]
+            put_args = mock_s3.put_object.call_args[1]
+            assert put_args['IfNoneMatch'] == '*'
+            images = json.loads(put_args['Body'])['images']
+            assert [image['key'] for image in images] == [
+                'images/november_1_0_Bagel.jpg',
+                'images/october_31_0_BlackCat.jpg',
+            ]
+            # The run's own entry wins over the one built from the listing
+            assert images[0] == {'key': 'images/november_1_0_Bagel.jpg', 'day': 'Bagel'}
+
+
+def test_handler_rebuilds_gallery_manifest(mock_env_vars, lambda_context):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        last_modified = datetime(2025, 10, 31, 13, 0)
+        pages = {
+            'images/': [
+                {
+                    'Contents': [
+                        {
+                            'Key': 'images/october_31_0_BlackCat.jpg',
+                            'Size': 2048,
+                            'LastModified': last_modified,
+                        }
+                    ]
+                }
+            ],
+            'thumbnails/': [
+                {
+                    'Contents': [
+                        {'Key': 'thumbnails/october_31_0_BlackCat_320.webp'},
+                        {'Key': 'thumbnails/october_31_0_BlackCat_640.webp'},
+                    ]
+                }
+            ],
+        }
+        paginator = Mock()
+        paginator.paginate.side_effect = lambda Bucket, Prefix: pages[Prefix]
+        mock_s3.get_paginator.return_value = paginator
+
+        def get_object(Bucket, Key, **kwargs):
+            # The listing is enough; images are never read back
+            assert Key == 'gallery/manifest.json'
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+
+        mock_s3.get_object.side_effect = get_object
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+        mock_boto.side_effect = lambda service: (
+            mock_secrets if service == 'secretsmanager' else mock_s3
+        )
+
+        with patch('openai.OpenAI') as mock_openai:
+            from main import handler
+
+            response = handler({'action': 'rebuild_manifest'}, lambda_context)
+
+            assert response['statusCode'] == 200
+            assert json.loads(response['body']) == {'images': 1}
+            assert not mock_openai.return_value.images.generate.called
+            put_args = mock_s3.put_object.call_args[1]
+            assert put_args['Key'] == 'gallery/manifest.json'
+            assert put_args['IfNoneMatch'] == '*'
+            manifest = json.loads(put_args['Body'])
+            assert manifest['images'] == [
+                {
+                    'key': 'images/october_31_0_BlackCat.jpg',
+                    'day': 'Black Cat',
+                    'date': '2025-10-31',
+                    'size': 2048,
+                    'width': 1024,
+                    'height': 1024,
+                    'thumbnails': {
+                        '320': 'thumbnails/october_31_0_BlackCat_320.webp',
+                        '640': 'thumbnails/october_31_0_BlackCat_640.webp',
+                    },
+                    'lastModified': last_modified.isoformat(),
+                }
+            ]
+
+
+def test_lazy_startup_defers_clients_until_first_use(mock_env_vars, monkeypatch):
+    monkeypatch.setenv('STARTUP_MODE', 'lazy')
+    with patch('boto3.client') as mock_boto:
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {'SecretString': 'test-api-key'}
+        mock_s3 = Mock()
+        mock_boto.side_effect = lambda service: (
+            mock_secrets if service == 'secretsmanager' else mock_s3
+        )
+
+        with patch('openai.OpenAI') as mock_openai:
+            import main
+
+            assert not mock_boto.called
+            assert not mock_openai.called
+
+            main.s3_client.put_object(Bucket='bucket', Key='key', Body=b'')
+            mock_boto.assert_called_once_with('s3')
+            mock_s3.put_object.assert_called_once()
+
+            assert main.client.images is mock_openai.return_value.images
+            mock_openai.assert_called_once_with(
+                api_key='test-api-key',
+                max_retries=0,
+                http_client=main.openai_http_client.resolve(),
+            )
+            assert main.client.images is mock_openai.return_value.images
+            assert mock_openai.call_count == 1
+
+
+def test_secret_cache_refreshes_in_background(mock_env_vars, monkeypatch):
+    monkeypatch.setenv('STARTUP_MODE', 'lazy')
+    with patch('boto3.client'), patch('openai.OpenAI'):
+        import main
+
+        loader = Mock(side_effect=['key-1', Exception('throttled'), 'key-2'])
+        on_change = Mock()
+        cache = main.SecretCache(loader, ttl_seconds=60, on_change=on_change)
+
+        with patch('time.monotonic', return_value=1000):
+            assert cache.get() == 'key-1'
+            assert cache.get() == 'key-1'
+        assert loader.call_count == 1
+
+        with (
+            patch('time.monotonic', return_value=1100),
+            patch('threading.Thread') as mock_thread,
+        ):
+            # A stale value is served while a single refresh runs
+            assert cache.get() == 'key-1'
+            assert cache.get() == 'key-1'
+            mock_thread.assert_called_once()
+
+            # A failed refresh keeps the cached value and retries later
+            mock_thread.call_args[1]['target']()
+            assert cache.get() == 'key-1'
+            assert mock_thread.call_count == 2
+            assert not on_change.called
+
+            mock_thread.call_args[1]['target']()
+            assert cache.get() == 'key-2'
+            on_change.assert_called_once()
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_pooled_transports_reuse_connections(mock_env_vars, monkeypatch):
+    monkeypatch.setenv('HTTP_POOL_SIZE', '24')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/'
+
+    try:
+        with patch('boto3.client'), patch('openai.OpenAI'):
+            import main
+
+            main.connection_stats.collect()
+            # boto3 clients pick up the pool size from the default session
+            session = main.aws_transport.resolve()
+            config = session.get_default_client_config()
+            assert config.max_pool_connections == 24
+            assert config.tcp_keepalive is True
+
+            http_client = main.openai_http_client.resolve()
+            http_session = main.build_http_session()
+            assert http_session.get_adapter('https://')._pool_maxsize == 24
+            for _ in range(3):
+                http_client.get(url)
+                http_session.get(url)
+
+            stats = main.connection_stats.collect()
+            # Both transports opened one connection each and reused it
+            assert stats == {
+                '127.0.0.1': {'requests': 6, 'new_connections': 2, 'reused': 4}
+            }
+            assert main.connection_stats.collect() == {}
+    finally:
+        server.shutdown()
@@ -1,9 +1,12 @@
 import json
 import sys
+import threading
+import time
 from pathlib import Path
 from unittest.mock import Mock, patch
 
 import pytest
+from botocore.exceptions import ClientError
 
 
 @pytest.fixture(autouse=True)
@@ -49,6 +52,14 @@ def s3_event():
     }
 
 
+@pytest.fixture
+def s3_object():
+    return {
+        'Body': Mock(read=lambda: b'fake_image'),
+        'Metadata': {'record-timestamp': '123'},
+    }
+
+
 @pytest.fixture
 def lambda_context():
     context = Mock()
@@ -56,6 +67,69 @@ def lambda_context():
     return context
 
 
+class JobTable:
+    """
+    In-memory job records that apply the conditions of the claim, release,
+    completion and expiry updates. Updates to other keys, such as the rate
+    limit bucket, always succeed.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.lock = threading.Lock()
+
+    def status(self, job_id):
+        return self.items[job_id]['status']['S']
+
+    def update_item(self, Key, ExpressionAttributeValues, **kwargs):
+        values = ExpressionAttributeValues
+        with self.lock:
+            item = self.items.get(Key['job_id']['S'])
+            if item is None:
+                return {}
+            status = item['status']['S']
+            lease_expires = int(item.get('lease_expires', {'N': '0'})['N'])
+            lease_lapsed = status == 'posting' and lease_expires < int(
+                values.get(':now', {'N': '0'})['N']
+            )
+            if ':expires' in values:
+                allowed = status in ('uploaded', 'ready') or lease_lapsed
+            elif ':owner' in values:
+                allowed = (
+                    status == 'posting'
+                    and item.get('lease_owner') == (values[':owner'])
+                )
+            else:
+                allowed = status == 'uploaded' or lease_lapsed
+            if not allowed:
+                raise ClientError(
+                    {
+                        'Error': {'Code': 'ConditionalCheckFailedException'},
+                        'Item': dict(item),
+                    },
+                    'UpdateItem',
+                )
+
+            if ':expires' in values:
+                if 'REMOVE #ttl' in kwargs['UpdateExpression']:
+                    item.pop('ttl', None)
+                item['status'] = values[':posting']
+                item['lease_owner'] = values[':owner']
+                item['lease_expires'] = values[':expires']
+            else:
+                item['status'] = values.get(':status', values.get(':failed'))
+                item.pop('lease_owner', None)
+                item.pop('lease_expires', None)
+                if ':attempts' in values:
+                    item['post_attempts'] = values[':attempts']
+                    item['last_error'] = values[':error']
+            return {'Attributes': dict(item)}
+
+
+def job_item(status, **extra):
+    return {'status': {'S': status}, **extra}
+
+
 def test_insert_space_before_capital(mock_env_vars, mock_twitter_creds):
     with patch('boto3.client') as mock_boto:
         mock_secrets = Mock()
@@ -75,13 +149,22 @@ def test_insert_space_before_capital(mock_env_vars, mock_twitter_creds):
             assert insert_space_before_capital('BagelDay') == 'Bagel Day'
 
 
-def test_handler_success(mock_env_vars, mock_twitter_creds, s3_event, lambda_context):
+@pytest.mark.parametrize(
+    'event_name',
+    [
+        'ObjectCreated:Put',
+        'ObjectCreated:CompleteMultipartUpload',
+        'ObjectCreated:Copy',
+    ],
+)
+def test_handler_success(
+    mock_env_vars, mock_twitter_creds, s3_event, s3_object, lambda_context, event_name
+):
+    s3_event['Records'][0]['eventName'] = event_name
     with patch('boto3.client') as mock_boto:
         mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
         mock_dynamodb = Mock()
-        mock_dynamodb.query.return_value = {
-            'Items': [{'job_id': {'S': 'test'}, 'timestamp': {'N': '123'}}]
-        }
         mock_secrets = Mock()
         mock_secrets.get_secret_value.return_value = {
             'SecretString': json.dumps(mock_twitter_creds)
@@ -100,7 +183,6 @@ def test_handler_success(mock_env_vars, mock_twitter_creds, s3_event, lambda_con
             patch('tweepy.Client') as mock_client,
             patch('tweepy.OAuth1UserHandler'),
             patch('tweepy.API') as mock_api_class,
-            patch('os.chdir'),
         ):
             mock_api = Mock()
             mock_media = Mock()
@@ -116,9 +198,131 @@ def test_handler_success(mock_env_vars, mock_twitter_creds, s3_event, lambda_con
             response = handler(s3_event, lambda_context)
 
             assert response['statusCode'] == 200
-            assert mock_s3.download_file.called
+            assert mock_s3.get_object.called
+            upload_args = mock_api.media_upload.call_args[1]
+            assert upload_args['filename'] == 'january_15_0_NationalHatDay.jpg'
+            assert upload_args['file'].read() == b'fake_image'
+            assert not mock_api.chunked_upload_init.called
             assert mock_twitter.create_tweet.called
-            assert mock_dynamodb.update_item.called
+            # The timestamp comes from the object metadata, so no query is needed
+            assert not mock_dynamodb.query.called
+            update_args = mock_dynamodb.update_item.call_args[1]
+            assert update_args['Key']['timestamp']['N'] == '123'
+
+
+def test_handler_publishes_stage_metrics(
+    mock_env_vars, mock_twitter_creds, s3_event, s3_object, lambda_context, capsys
+):
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.side_effect = lambda service: {
+            's3': mock_s3,
+            'secretsmanager': mock_secrets,
+        }.get(service, Mock())
+
+        with (
+            patch('tweepy.Client'),
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api_class.return_value.media_upload.return_value = Mock(
+                media_id='media-id'
+            )
+            import main
+
+            main.metrics.clear_metrics()
+            capsys.readouterr()
+            response = main.handler(s3_event, lambda_context)
+
+    assert response['statusCode'] == 200
+    documents = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if '"_aws"' in line
+    ]
+    assert len(documents) == 1
+    document = documents[0]
+    names = {
+        metric['Name']
+        for directive in document['_aws']['CloudWatchMetrics']
+        for metric in directive['Metrics']
+    }
+    assert {
+        'S3DownloadDuration',
+        'ClaimDuration',
+        'MediaUploadDuration',
+        'CreateTweetDuration',
+        'RecordUpdateDuration',
+        'TweetsPosted',
+    } <= names
+    for name in ('S3DownloadBytes', 'MediaUploadBytes'):
+        # A single value is written as a scalar by older Powertools releases
+        assert document[name] in (len(b'fake_image'), [len(b'fake_image')])
+    assert document['service'] == 'twitter_post_lambda'
+
+
+def test_handler_uses_chunked_upload_for_large_images(
+    mock_env_vars, mock_twitter_creds, s3_event, lambda_context
+):
+    # Larger than the default 1 MiB threshold, split into three segments
+    image_bytes = b'x' * (2 * 1024 * 1024 + 512)
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = {
+            'Body': Mock(read=lambda: image_bytes),
+            'Metadata': {'record-timestamp': '123'},
+        }
+        mock_dynamodb = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+
+        def client_factory(service):
+            if service == 's3':
+                return mock_s3
+            if service == 'dynamodb':
+                return mock_dynamodb
+            return mock_secrets
+
+        mock_boto.side_effect = client_factory
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api = Mock()
+            mock_api.chunked_upload_init.return_value = Mock(media_id='media-id')
+            mock_api.chunked_upload_finalize.return_value = Mock(
+                media_id='media-id', processing_info=None
+            )
+            mock_api_class.return_value = mock_api
+            mock_twitter = Mock()
+            mock_client.return_value = mock_twitter
+
+            from main import handler
+
+            response = handler(s3_event, lambda_context)
+
+            assert response['statusCode'] == 200
+            mock_api.chunked_upload_init.assert_called_once_with(
+                len(image_bytes), 'image/jpeg', media_category='tweet_image'
+            )
+            segments = sorted(
+                (call[0][2], len(call[0][1][1]))
+                for call in mock_api.chunked_upload_append.call_args_list
+            )
+            assert segments == [(0, 1024 * 1024), (1, 1024 * 1024), (2, 512)]
+            assert not mock_api.media_upload.called
+            mock_twitter.create_tweet.assert_called_once_with(
+                text='National National Hat Day Day!', media_ids=['media-id']
+            )
 
 
 def test_handler_s3_failure(
@@ -126,7 +330,7 @@ def test_handler_s3_failure(
 ):
     with patch('boto3.client') as mock_boto:
         mock_s3 = Mock()
-        mock_s3.download_file.side_effect = Exception('S3 Error')
+        mock_s3.get_object.side_effect = Exception('S3 Error')
         mock_secrets = Mock()
         mock_secrets.get_secret_value.return_value = {
             'SecretString': json.dumps(mock_twitter_creds)
@@ -138,7 +342,6 @@ def test_handler_s3_failure(
             patch('tweepy.Client'),
             patch('tweepy.OAuth1UserHandler'),
             patch('tweepy.API'),
-            patch('os.chdir'),
         ):
             from main import handler
 
@@ -165,7 +368,6 @@ def test_handler_wrong_event(mock_env_vars, mock_twitter_creds, lambda_context):
             patch('tweepy.Client'),
             patch('tweepy.OAuth1UserHandler'),
             patch('tweepy.API'),
-            patch('os.chdir'),
         ):
             from main import handler
 
@@ -185,8 +387,8 @@ def test_update_dynamodb_record(mock_env_vars, mock_twitter_creds):
             'SecretString': json.dumps(mock_twitter_creds)
         }
 
-        mock_boto.side_effect = (
-            lambda s: mock_dynamodb if s == 'dynamodb' else mock_secrets
+        mock_boto.side_effect = lambda s: (
+            mock_dynamodb if s == 'dynamodb' else mock_secrets
         )
 
         with (
@@ -233,18 +435,23 @@ def test_update_dynamodb_no_record_found(mock_env_vars, mock_twitter_creds):
             patch('tweepy.Client'),
             patch('tweepy.OAuth1UserHandler'),
             patch('tweepy.API'),
+            patch('time.sleep') as mock_sleep,
         ):
             from main import update_dynamodb_record
 
             with pytest.raises(ValueError, match='No record found for job_id'):
                 update_dynamodb_record('table', 'nonexistent.jpg', 'caption', 'posted')
 
+            assert mock_dynamodb.query.call_count == 5
+            assert mock_sleep.call_count == 4
+
 
 def test_handler_twitter_post_failure(
-    mock_env_vars, mock_twitter_creds, s3_event, lambda_context
+    mock_env_vars, mock_twitter_creds, s3_event, s3_object, lambda_context
 ):
     with patch('boto3.client') as mock_boto:
         mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
         mock_dynamodb = Mock()
         mock_secrets = Mock()
         mock_secrets.get_secret_value.return_value = {
@@ -264,7 +471,6 @@ def test_handler_twitter_post_failure(
             patch('tweepy.Client'),
             patch('tweepy.OAuth1UserHandler'),
             patch('tweepy.API') as mock_api_class,
-            patch('os.chdir'),
         ):
             mock_api = Mock()
             mock_api.media_upload.side_effect = Exception('Twitter API Error')
@@ -279,15 +485,20 @@ def test_handler_twitter_post_failure(
 
 
 def test_handler_dynamodb_update_failure(
-    mock_env_vars, mock_twitter_creds, s3_event, lambda_context
+    mock_env_vars, mock_twitter_creds, s3_event, s3_object, lambda_context
 ):
     with patch('boto3.client') as mock_boto:
         mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
+        table = JobTable({'january_15_0_NationalHatDay.jpg': job_item('uploaded')})
+
+        def update_item(**kwargs):
+            if kwargs['ExpressionAttributeValues'].get(':status') == {'S': 'posted'}:
+                raise Exception('DynamoDB Error')
+            return table.update_item(**kwargs)
+
         mock_dynamodb = Mock()
-        mock_dynamodb.query.return_value = {
-            'Items': [{'job_id': {'S': 'test'}, 'timestamp': {'N': '123'}}]
-        }
-        mock_dynamodb.update_item.side_effect = Exception('DynamoDB Error')
+        mock_dynamodb.update_item.side_effect = update_item
         mock_secrets = Mock()
         mock_secrets.get_secret_value.return_value = {
             'SecretString': json.dumps(mock_twitter_creds)
@@ -306,7 +517,6 @@ def test_handler_dynamodb_update_failure(
             patch('tweepy.Client') as mock_client,
             patch('tweepy.OAuth1UserHandler'),
             patch('tweepy.API') as mock_api_class,
-            patch('os.chdir'),
         ):
             mock_api = Mock()
             mock_media = Mock()
@@ -322,4 +532,1001 @@ def test_handler_dynamodb_update_failure(
             response = handler(s3_event, lambda_context)
 
             assert response['statusCode'] == 500
-            assert 'Error updating DynamoDB record' in response['body']
+            assert 'DynamoDB record update failed' in response['body']
+            assert response['tweetPosted'] is True
+            # Left claimed, so no other delivery posts it until the lease expires
+            assert table.status('january_15_0_NationalHatDay.jpg') == 'posting'
+
+
+def test_update_dynamodb_record_waits_for_batched_record(
+    mock_env_vars, mock_twitter_creds
+):
+    with patch('boto3.client') as mock_boto:
+        mock_dynamodb = Mock()
+        mock_dynamodb.query.side_effect = [
+            {'Items': []},
+            {'Items': [{'job_id': {'S': 'test.jpg'}, 'timestamp': {'N': '123'}}]},
+        ]
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+
+        def client_factory(service):
+            if service == 'dynamodb':
+                return mock_dynamodb
+            return mock_secrets
+
+        mock_boto.side_effect = client_factory
+
+        with (
+            patch('tweepy.Client'),
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API'),
+            patch('time.sleep'),
+        ):
+            from main import update_dynamodb_record
+
+            update_dynamodb_record('table', 'test.jpg', 'caption', 'posted')
+
+            assert mock_dynamodb.query.call_count == 2
+            key = mock_dynamodb.update_item.call_args[1]['Key']
+            assert key['timestamp']['N'] == '123'
+
+
+def test_update_dynamodb_record_already_posted(mock_env_vars, mock_twitter_creds):
+    with patch('boto3.client') as mock_boto:
+        mock_dynamodb = Mock()
+        mock_dynamodb.update_item.side_effect = ClientError(
+            {
+                'Error': {'Code': 'ConditionalCheckFailedException'},
+                'Item': {'status': {'S': 'posted'}},
+            },
+            'UpdateItem',
+        )
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+
+        def client_factory(service):
+            if service == 'dynamodb':
+                return mock_dynamodb
+            return mock_secrets
+
+        mock_boto.side_effect = client_factory
+
+        with (
+            patch('tweepy.Client'),
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API'),
+            patch('time.sleep') as mock_sleep,
+        ):
+            from main import update_dynamodb_record
+
+            with pytest.raises(ClientError):
+                update_dynamodb_record('table', 'test.jpg', 'caption', 'posted', '123')
+
+            assert not mock_dynamodb.query.called
+            assert mock_dynamodb.update_item.call_count == 1
+            assert not mock_sleep.called
+            update_args = mock_dynamodb.update_item.call_args[1]
+            assert 'attribute_exists(job_id)' in update_args['ConditionExpression']
+
+
+def test_handler_sqs_batch_reports_partial_failures(
+    mock_env_vars, mock_twitter_creds, lambda_context
+):
+    def sqs_message(message_id, key):
+        return {
+            'eventSource': 'aws:sqs',
+            'messageId': message_id,
+            'body': json.dumps(
+                {
+                    'Records': [
+                        {
+                            'eventName': 'ObjectCreated:Put',
+                            's3': {'object': {'key': key}},
+                        }
+                    ]
+                }
+            ),
+        }
+
+    event = {
+        'Records': [
+            sqs_message('msg-1', 'images/january_15_0_Hat.jpg'),
+            sqs_message('msg-2', 'images/january_15_1_Bagel.jpg'),
+            {'eventSource': 'aws:sqs', 'messageId': 'msg-3', 'body': '{}'},
+        ]
+    }
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.side_effect = lambda Bucket, Key: {
+            'Body': Mock(read=lambda: b'fake_image'),
+            'Metadata': {'record-timestamp': '123'},
+        }
+        mock_dynamodb = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+
+        def client_factory(service):
+            if service == 's3':
+                return mock_s3
+            if service == 'dynamodb':
+                return mock_dynamodb
+            return mock_secrets
+
+        mock_boto.side_effect = client_factory
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api = Mock()
+            mock_api.media_upload.return_value = Mock(media_id='media-id')
+            mock_api_class.return_value = mock_api
+
+            mock_twitter = Mock()
+
+            def create_tweet(text, media_ids):
+                if 'Bagel' in text:
+                    raise Exception('Twitter API Error')
+
+            mock_twitter.create_tweet.side_effect = create_tweet
+            mock_client.return_value = mock_twitter
+
+            from main import handler
+
+            response = handler(event, lambda_context)
+
+            assert response == {'batchItemFailures': [{'itemIdentifier': 'msg-2'}]}
+            assert mock_twitter.create_tweet.call_count == 2
+            completions = [
+                call
+                for call in mock_dynamodb.update_item.call_args_list
+                if call[1]['Key']['job_id']['S'].endswith('.jpg')
+                and call[1]['ExpressionAttributeValues'].get(':status')
+                == {'S': 'posted'}
+            ]
+            assert len(completions) == 1
+
+
+def test_handler_sqs_batch_never_reposts_a_tweet(
+    mock_env_vars, mock_twitter_creds, lambda_context
+):
+    def sqs_message(message_id, key):
+        return {
+            'eventSource': 'aws:sqs',
+            'messageId': message_id,
+            'body': json.dumps(
+                {
+                    'Records': [
+                        {
+                            'eventName': 'ObjectCreated:Put',
+                            's3': {'object': {'key': key}},
+                        }
+                    ]
+                }
+            ),
+        }
+
+    event = {
+        'Records': [
+            sqs_message('msg-1', 'images/january_15_0_Hat.jpg'),
+            sqs_message('msg-2', 'images/january_15_1_Bagel.jpg'),
+        ]
+    }
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.side_effect = lambda Bucket, Key: {
+            'Body': Mock(read=lambda: b'fake_image'),
+            'Metadata': {'record-timestamp': '123'},
+        }
+        mock_dynamodb = Mock()
+
+        # Hat was posted by an earlier delivery; Bagel's record update fails
+        # after its tweet went out
+        table = JobTable(
+            {
+                'january_15_0_Hat.jpg': job_item('posted'),
+                'january_15_1_Bagel.jpg': job_item('uploaded'),
+            }
+        )
+
+        def update_item(**kwargs):
+            if kwargs['ExpressionAttributeValues'].get(':status') == {'S': 'posted'}:
+                raise Exception('DynamoDB Error')
+            return table.update_item(**kwargs)
+
+        mock_dynamodb.update_item.side_effect = update_item
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+
+        def client_factory(service):
+            if service == 's3':
+                return mock_s3
+            if service == 'dynamodb':
+                return mock_dynamodb
+            return mock_secrets
+
+        mock_boto.side_effect = client_factory
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api = Mock()
+            mock_api.media_upload.return_value = Mock(media_id='media-id')
+            mock_api_class.return_value = mock_api
+
+            mock_twitter = Mock()
+            mock_client.return_value = mock_twitter
+
+            from main import handler
+
+            response = handler(event, lambda_context)
+
+            assert response == {'batchItemFailures': []}
+            mock_twitter.create_tweet.assert_called_once()
+            assert 'Bagel' in mock_twitter.create_tweet.call_args[1]['text']
+
+
+def test_concurrent_deliveries_post_a_tweet_once(
+    mock_env_vars, mock_twitter_creds, s3_event, s3_object, lambda_context
+):
+    # The same notification delivered twice, processed side by side
+    s3_event['Records'].append(dict(s3_event['Records'][0]))
+    table = JobTable({'january_15_0_NationalHatDay.jpg': job_item('uploaded')})
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
+        mock_dynamodb = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.side_effect = lambda service: {
+            's3': mock_s3,
+            'dynamodb': mock_dynamodb,
+        }.get(service, mock_secrets)
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api_class.return_value.media_upload.return_value = Mock(
+                media_id='media-id'
+            )
+            # The winner tweets only once the other delivery has lost its claim
+            claim_lost = threading.Event()
+            mock_client.return_value.create_tweet.side_effect = lambda **kwargs: (
+                claim_lost.wait(5)
+            )
+
+            def update_item(**kwargs):
+                try:
+                    return table.update_item(**kwargs)
+                except ClientError:
+                    claim_lost.set()
+                    raise
+
+            mock_dynamodb.update_item.side_effect = update_item
+
+            from main import handler
+
+            response = handler(s3_event, lambda_context)
+
+    assert claim_lost.is_set()
+    mock_client.return_value.create_tweet.assert_called_once()
+    assert table.status('january_15_0_NationalHatDay.jpg') == 'posted'
+    # The delivery that lost the claim is reported instead of posting
+    assert response == {
+        'statusCode': 500,
+        'body': json.dumps({'failed': ['images/january_15_0_NationalHatDay.jpg']}),
+    }
+
+
+def test_handler_keeps_staged_record_claimed_before_publish_marks_it(
+    mock_env_vars, mock_twitter_creds, s3_event, s3_object, lambda_context
+):
+    # The copy event can arrive before publish moves the record to uploaded
+    s3_event['Records'][0]['eventName'] = 'ObjectCreated:Copy'
+    table = JobTable(
+        {'january_15_0_NationalHatDay.jpg': job_item('ready', ttl={'N': '1700000000'})}
+    )
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
+        mock_dynamodb = Mock()
+        mock_dynamodb.update_item.side_effect = table.update_item
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.side_effect = lambda service: {
+            's3': mock_s3,
+            'dynamodb': mock_dynamodb,
+        }.get(service, mock_secrets)
+
+        with (
+            patch('tweepy.Client'),
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api_class.return_value.media_upload.return_value = Mock(
+                media_id='media-id'
+            )
+            from main import handler
+
+            response = handler(s3_event, lambda_context)
+
+    assert response['statusCode'] == 200
+    # Without the staging ttl DynamoDB keeps the posted record
+    assert table.items['january_15_0_NationalHatDay.jpg'] == job_item('posted')
+
+
+def test_handler_defers_message_while_another_invocation_holds_the_job(
+    mock_env_vars, mock_twitter_creds, s3_object, lambda_context
+):
+    event = {
+        'Records': [
+            {
+                'eventSource': 'aws:sqs',
+                'eventSourceARN': 'arn:aws:sqs:us-east-1:123:twitter-post-queue',
+                'messageId': 'msg-1',
+                'receiptHandle': 'receipt-1',
+                'body': json.dumps(
+                    {
+                        'Records': [
+                            {
+                                'eventName': 'ObjectCreated:Put',
+                                's3': {
+                                    'object': {'key': 'images/january_15_0_Hat.jpg'}
+                                },
+                            }
+                        ]
+                    }
+                ),
+            }
+        ]
+    }
+    lease_expires = int(time.time()) + 120
+    claimed = job_item(
+        'posting',
+        lease_owner={'S': 'other'},
+        lease_expires={'N': str(lease_expires)},
+    )
+    table = JobTable({'january_15_0_Hat.jpg': dict(claimed)})
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
+        mock_sqs = Mock()
+        mock_dynamodb = Mock()
+        mock_dynamodb.update_item.side_effect = table.update_item
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.side_effect = lambda service: {
+            's3': mock_s3,
+            'dynamodb': mock_dynamodb,
+            'sqs': mock_sqs,
+        }.get(service, mock_secrets)
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API'),
+        ):
+            from main import handler
+
+            response = handler(event, lambda_context)
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': 'msg-1'}]}
+    assert not mock_client.return_value.create_tweet.called
+    assert table.items['january_15_0_Hat.jpg'] == claimed
+    # Redelivered once the other invocation's lease has run out
+    visibility = mock_sqs.change_message_visibility.call_args.kwargs
+    assert 0 < visibility['VisibilityTimeout'] <= 120
+    assert visibility['VisibilityTimeout'] >= lease_expires - int(time.time()) - 1
+
+
+@pytest.mark.parametrize(
+    ('previous_attempts', 'status'), [(None, 'uploaded'), ('2', 'failed')]
+)
+def test_handler_releases_job_after_failed_post(
+    mock_env_vars,
+    mock_twitter_creds,
+    s3_event,
+    s3_object,
+    lambda_context,
+    previous_attempts,
+    status,
+):
+    item = job_item('uploaded')
+    if previous_attempts:
+        item['post_attempts'] = {'N': previous_attempts}
+    table = JobTable({'january_15_0_NationalHatDay.jpg': item})
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
+        mock_dynamodb = Mock()
+        mock_dynamodb.update_item.side_effect = table.update_item
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.side_effect = lambda service: {
+            's3': mock_s3,
+            'dynamodb': mock_dynamodb,
+        }.get(service, mock_secrets)
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api_class.return_value.media_upload.return_value = Mock(
+                media_id='media-id'
+            )
+            mock_client.return_value.create_tweet.side_effect = Exception(
+                'Twitter API Error'
+            )
+            from main import handler
+
+            response = handler(s3_event, lambda_context)
+
+    assert response == {'statusCode': 500, 'body': 'Error posting tweet'}
+    # Failed for good once MAX_POST_ATTEMPTS posts have failed
+    record = table.items['january_15_0_NationalHatDay.jpg']
+    assert record['status'] == {'S': status}
+    assert record['post_attempts'] == {'N': str(int(previous_attempts or 0) + 1)}
+    assert record['last_error'] == {'S': 'Twitter API Error'}
+    assert 'lease_owner' not in record
+
+
+def test_chunked_media_upload_retries_single_chunk(
+    mock_env_vars, mock_twitter_creds, monkeypatch
+):
+    monkeypatch.setenv('CHUNKED_UPLOAD_THRESHOLD_BYTES', '4')
+    monkeypatch.setenv('MEDIA_CHUNK_SIZE_BYTES', '4')
+
+    with patch('boto3.client') as mock_boto:
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.return_value = mock_secrets
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+            patch('time.sleep'),
+        ):
+            import tweepy
+
+            mock_api = Mock()
+            mock_api.chunked_upload_init.return_value = Mock(media_id='media-id')
+            attempts = {}
+
+            def append(media_id, media, segment_index):
+                attempts[segment_index] = attempts.get(segment_index, 0) + 1
+                if segment_index == 1 and attempts[segment_index] == 1:
+                    raise tweepy.TweepyException('Connection reset')
+
+            mock_api.chunked_upload_append.side_effect = append
+            mock_api.chunked_upload_finalize.return_value = Mock(
+                media_id='media-id', processing_info=None
+            )
+            mock_api_class.return_value = mock_api
+            mock_twitter = Mock()
+            mock_client.return_value = mock_twitter
+
+            from main import post_image_to_twitter
+
+            post_image_to_twitter('caption', 'january_15_0_Hat.jpg', b'0123456789')
+
+            mock_api.chunked_upload_init.assert_called_once_with(
+                10, 'image/jpeg', media_category='tweet_image'
+            )
+            assert attempts == {0: 1, 1: 2, 2: 1}
+            chunks = sorted(
+                (call[0][2], call[0][1][1])
+                for call in mock_api.chunked_upload_append.call_args_list
+            )
+            assert chunks == [(0, b'0123'), (1, b'4567'), (1, b'4567'), (2, b'89')]
+            assert not mock_api.media_upload.called
+            mock_twitter.create_tweet.assert_called_once_with(
+                text='caption', media_ids=['media-id']
+            )
+
+
+def test_handler_defers_post_when_rate_limited(
+    mock_env_vars, mock_twitter_creds, s3_object, lambda_context
+):
+    event = {
+        'Records': [
+            {
+                'eventSource': 'aws:sqs',
+                'eventSourceARN': 'arn:aws:sqs:us-east-1:123:twitter-post-queue',
+                'messageId': 'msg-1',
+                'receiptHandle': 'receipt-1',
+                'body': json.dumps(
+                    {
+                        'Records': [
+                            {
+                                'eventName': 'ObjectCreated:Put',
+                                's3': {
+                                    'object': {'key': 'images/january_15_0_Hat.jpg'}
+                                },
+                            }
+                        ]
+                    }
+                ),
+            }
+        ]
+    }
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
+        mock_sqs = Mock()
+        table = JobTable({'january_15_0_Hat.jpg': job_item('uploaded')})
+
+        def update_item(**kwargs):
+            if kwargs['Key']['job_id']['S'] in table.items:
+                return table.update_item(**kwargs)
+            # The rate limit bucket is exhausted until 2100
+            raise ClientError(
+                {
+                    'Error': {'Code': 'ConditionalCheckFailedException'},
+                    'Item': {'remaining': {'N': '0'}, 'reset_at': {'N': '4102444800'}},
+                },
+                'UpdateItem',
+            )
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.update_item.side_effect = update_item
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+
+        def client_factory(service):
+            if service == 's3':
+                return mock_s3
+            if service == 'dynamodb':
+                return mock_dynamodb
+            if service == 'sqs':
+                return mock_sqs
+            return mock_secrets
+
+        mock_boto.side_effect = client_factory
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api = Mock()
+            mock_api_class.return_value = mock_api
+            mock_twitter = Mock()
+            mock_client.return_value = mock_twitter
+
+            from main import handler
+
+            response = handler(event, lambda_context)
+
+            assert response == {'batchItemFailures': [{'itemIdentifier': 'msg-1'}]}
+            assert not mock_api.media_upload.called
+            assert not mock_twitter.create_tweet.called
+            visibility_args = mock_sqs.change_message_visibility.call_args[1]
+            assert visibility_args['QueueUrl'] == (
+                'https://sqs.us-east-1.amazonaws.com/123/twitter-post-queue'
+            )
+            assert visibility_args['ReceiptHandle'] == 'receipt-1'
+            assert visibility_args['VisibilityTimeout'] == 43200
+            # The claim is handed back for the redelivery
+            assert table.items['january_15_0_Hat.jpg'] == job_item('uploaded')
+
+
+def test_rate_limiter_records_response_headers(mock_env_vars, mock_twitter_creds):
+    with patch('boto3.client') as mock_boto:
+        mock_dynamodb = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+
+        def client_factory(service):
+            if service == 'dynamodb':
+                return mock_dynamodb
+            return mock_secrets
+
+        mock_boto.side_effect = client_factory
+
+        with (
+            patch('tweepy.Client'),
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API'),
+        ):
+            from main import rate_limiter
+
+            rate_limiter.record(
+                {'x-rate-limit-remaining': '16', 'x-rate-limit-reset': '1700000000'}
+            )
+            rate_limiter.record({})
+
+            assert mock_dynamodb.update_item.call_count == 1
+            values = mock_dynamodb.update_item.call_args[1]['ExpressionAttributeValues']
+            assert values[':remaining'] == {'N': '16'}
+            assert values[':reset_at'] == {'N': '1700000000'}
+
+
+def test_rate_limiter_without_reset_time_lets_posts_through(
+    mock_env_vars, mock_twitter_creds
+):
+    with patch('boto3.client') as mock_boto:
+        mock_dynamodb = Mock()
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+
+        def client_factory(service):
+            if service == 'dynamodb':
+                return mock_dynamodb
+            return mock_secrets
+
+        mock_boto.side_effect = client_factory
+
+        with (
+            patch('tweepy.Client'),
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api = Mock()
+            mock_api.media_upload.side_effect = Exception('Connection reset')
+            mock_api_class.return_value = mock_api
+
+            import main
+
+            # The bucket item has no reset_at until a response is recorded,
+            # so it must not block posting
+            assert main.rate_limiter.acquire() == 0
+            condition = mock_dynamodb.update_item.call_args[1]['ConditionExpression']
+            assert 'attribute_not_exists(reset_at)' in condition
+
+            # A post that never reached the X API gives its token back
+            with pytest.raises(Exception, match='Connection reset'):
+                main.post_image_to_twitter('caption', 'test.jpg', b'fake_image')
+
+            refund = mock_dynamodb.update_item.call_args[1]
+            assert refund['UpdateExpression'] == 'SET remaining = remaining + :one'
+
+
+def test_media_upload_rate_limit_does_not_touch_tweet_bucket(
+    mock_env_vars, mock_twitter_creds
+):
+    with patch('boto3.client') as mock_boto:
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.side_effect = lambda service: (
+            mock_secrets if service == 'secretsmanager' else Mock()
+        )
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            import main
+            import tweepy
+
+            reset_at = int(time.time()) + 60
+            media_response = Mock(
+                status_code=429,
+                reason='Too Many Requests',
+                headers={
+                    'x-rate-limit-remaining': '0',
+                    'x-rate-limit-reset': str(reset_at),
+                },
+            )
+            media_response.json.return_value = {}
+            mock_api_class.return_value.media_upload.side_effect = (
+                tweepy.TooManyRequests(media_response)
+            )
+
+            with (
+                patch.object(main.rate_limiter, 'acquire', return_value=0),
+                patch.object(main.rate_limiter, 'record') as record,
+                patch.object(main.rate_limiter, 'refund') as refund,
+            ):
+                with pytest.raises(main.PostDeferredError) as deferred:
+                    main.post_image_to_twitter('caption', 'test.jpg', b'fake_image')
+
+    # The media limit defers the post but says nothing about create_tweet
+    assert 0 < deferred.value.retry_after <= 60
+    assert not record.called
+    refund.assert_called_once()
+    assert not mock_client.return_value.create_tweet.called
+
+
+def test_lazy_startup_defers_clients_until_first_use(
+    mock_env_vars, mock_twitter_creds, monkeypatch
+):
+    monkeypatch.setenv('STARTUP_MODE', 'lazy')
+    with patch('boto3.client') as mock_boto:
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.return_value = mock_secrets
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler') as mock_auth,
+            patch('tweepy.API') as mock_api,
+        ):
+            import main
+
+            assert not mock_boto.called
+            assert not mock_client.called
+            assert not mock_api.called
+
+            assert main.twitter.create_tweet is mock_client.return_value.create_tweet
+            assert main.api.media_upload is mock_api.return_value.media_upload
+            mock_client.assert_called_once()
+            mock_auth.assert_called_once_with('key', 'secret', 'token', 'secret')
+            mock_api.assert_called_once_with(mock_auth.return_value)
+            # Both clients share a single secret read
+            mock_secrets.get_secret_value.assert_called_once()
+
+
+def test_rotated_credentials_rebuild_twitter_clients(mock_env_vars, mock_twitter_creds):
+    with patch('boto3.client') as mock_boto:
+        rotated_creds = {**mock_twitter_creds, 'ACCESS_TOKEN': 'rotated-token'}
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.side_effect = [
+            {'SecretString': json.dumps(mock_twitter_creds)},
+            {'SecretString': json.dumps(rotated_creds)},
+        ]
+        mock_boto.return_value = mock_secrets
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler') as mock_auth,
+            patch('tweepy.API') as mock_api,
+        ):
+            import main
+
+            assert mock_client.call_count == 1
+            assert mock_secrets.get_secret_value.call_count == 1
+
+            # Run the background refresh inline
+            main.twitter_credentials._refresh()
+
+            assert main.twitter.create_tweet is mock_client.return_value.create_tweet
+            assert main.api.media_upload is mock_api.return_value.media_upload
+            assert mock_secrets.get_secret_value.call_count == 2
+            assert mock_client.call_count == 2
+            assert mock_client.call_args[0][3] == 'rotated-token'
+            assert mock_auth.call_args[0][2] == 'rotated-token'
+
+
+def test_sweep_redrives_only_stuck_jobs(
+    mock_env_vars, mock_twitter_creds, s3_object, lambda_context
+):
+    lambda_context.get_remaining_time_in_millis.return_value = 100000
+    now = int(time.time())
+
+    def job(job_id, age_seconds, status='uploaded', **extra):
+        return {
+            'job_id': {'S': job_id},
+            'timestamp': {'N': str(now - age_seconds)},
+            'status': {'S': status},
+            **extra,
+        }
+
+    stuck = job('october_30_0_Hat.jpg', 3600)
+    # Posted by a delivery that finished after the index was read
+    already_posted = job('october_30_1_Bagel.jpg', 3600)
+    # Staged days ago but only just published
+    in_flight = job(
+        'october_31_0_Candy.jpg', 3 * 86400, uploaded_at={'N': str(now - 60)}
+    )
+    stale = job('october_29_0_Cookie.jpg', 2 * 86400)
+    # Claimed by an invocation that is still posting it
+    claimed = job(
+        'october_30_2_Pie.jpg',
+        3600,
+        'posting',
+        lease_owner={'S': 'other'},
+        lease_expires={'N': str(now + 120)},
+    )
+    # Claimed by an invocation that timed out
+    abandoned = job(
+        'october_30_3_Tea.jpg',
+        3600,
+        'posting',
+        lease_owner={'S': 'other'},
+        lease_expires={'N': str(now - 10)},
+    )
+    partitions = {
+        'uploaded': [{'Items': [stuck, already_posted]}, {'Items': [in_flight, stale]}],
+        'posting': [{'Items': [claimed, abandoned]}],
+    }
+    table = JobTable(
+        {
+            item['job_id']['S']: dict(item)
+            for item in (stuck, in_flight, stale, claimed, abandoned)
+        }
+    )
+    table.items['october_30_1_Bagel.jpg'] = job_item('posted')
+
+    with patch('boto3.client') as mock_boto:
+        mock_s3 = Mock()
+        mock_s3.get_object.return_value = s3_object
+        mock_dynamodb = Mock()
+        mock_dynamodb.get_paginator.return_value.paginate.side_effect = (
+            lambda **kwargs: partitions[
+                kwargs['ExpressionAttributeValues'][':status']['S']
+            ]
+        )
+        mock_dynamodb.update_item.side_effect = table.update_item
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.side_effect = lambda service: {
+            's3': mock_s3,
+            'dynamodb': mock_dynamodb,
+        }.get(service, mock_secrets)
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API') as mock_api_class,
+        ):
+            mock_api_class.return_value.media_upload.return_value = Mock(
+                media_id='media-id'
+            )
+            from main import handler
+
+            response = handler({'action': 'sweep'}, lambda_context)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body']) == {
+        'posted': [
+            'october_30_0_Hat.jpg',
+            'october_30_1_Bagel.jpg',
+            'october_30_3_Tea.jpg',
+        ],
+        'in_flight': ['october_30_2_Pie.jpg', 'october_31_0_Candy.jpg'],
+        'expired': ['october_29_0_Cookie.jpg'],
+    }
+    # Only the uploaded and posting partitions older than the threshold are read
+    queries = [
+        c.kwargs
+        for c in mock_dynamodb.get_paginator.return_value.paginate.call_args_list
+    ]
+    assert [q['ExpressionAttributeValues'][':status']['S'] for q in queries] == [
+        'uploaded',
+        'posting',
+    ]
+    for query in queries:
+        assert query['IndexName'] == 'status-timestamp-index'
+        assert query['KeyConditionExpression'] == (
+            '#status = :status AND #timestamp <= :cutoff'
+        )
+        assert int(query['ExpressionAttributeValues'][':cutoff']['N']) <= now - 1800
+
+    assert mock_client.return_value.create_tweet.call_count == 2
+    assert {job_id: table.status(job_id) for job_id in table.items} == {
+        'october_30_0_Hat.jpg': 'posted',
+        'october_30_1_Bagel.jpg': 'posted',
+        'october_31_0_Candy.jpg': 'uploaded',
+        'october_29_0_Cookie.jpg': 'failed',
+        'october_30_2_Pie.jpg': 'posting',
+        'october_30_3_Tea.jpg': 'posted',
+    }
+
+
+def test_sweep_leaves_jobs_for_the_next_run_near_the_timeout(
+    mock_env_vars, mock_twitter_creds, lambda_context
+):
+    lambda_context.get_remaining_time_in_millis.return_value = 5000
+    with patch('boto3.client') as mock_boto:
+        mock_dynamodb = Mock()
+        mock_dynamodb.get_paginator.return_value.paginate.side_effect = (
+            lambda **kwargs: (
+                [
+                    {
+                        'Items': [
+                            {
+                                'job_id': {'S': 'october_30_0_Hat.jpg'},
+                                'timestamp': {'N': str(int(time.time()) - 3600)},
+                                'status': {'S': 'uploaded'},
+                            }
+                        ]
+                    }
+                ]
+                if kwargs['ExpressionAttributeValues'][':status']['S'] == 'uploaded'
+                else []
+            )
+        )
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.side_effect = lambda service: {
+            'dynamodb': mock_dynamodb,
+        }.get(service, mock_secrets)
+
+        with (
+            patch('tweepy.Client') as mock_client,
+            patch('tweepy.OAuth1UserHandler'),
+            patch('tweepy.API'),
+        ):
+            from main import handler
+
+            response = handler({'action': 'sweep'}, lambda_context)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body']) == {'remaining': ['october_30_0_Hat.jpg']}
+    assert not mock_client.return_value.create_tweet.called
+
+
+def test_twitter_and_aws_clients_share_pooled_transport(
+    mock_env_vars, mock_twitter_creds, monkeypatch
+):
+    monkeypatch.setenv('MAX_CONCURRENT_POSTS', '4')
+    with patch('boto3.client') as mock_boto:
+        mock_secrets = Mock()
+        mock_secrets.get_secret_value.return_value = {
+            'SecretString': json.dumps(mock_twitter_creds)
+        }
+        mock_boto.return_value = mock_secrets
+
+        import main
+
+        # Four posts with three chunk uploads each
+        assert main.http_pool_size == 12
+        for session in (main.twitter.session, main.api.session):
+            adapter = session.get_adapter('https://upload.twitter.com/1.1/media')
+            assert adapter._pool_maxsize == 12
+
+        # tweepy.API closes its session after every request
+        adapter = main.api.session.get_adapter('https://upload.twitter.com')
+        pool = adapter.poolmanager.connection_from_url('https://upload.twitter.com')
+        main.api.session.close()
+        assert (
+            adapter.poolmanager.connection_from_url('https://upload.twitter.com')
+            is pool
+        )
+
+        config = main.aws_transport.resolve().get_default_client_config()
+        assert config.max_pool_connections == 12
+        assert config.tcp_keepalive is True
+
+        main.connection_stats.record('api.twitter.com', requests=3, connections=1)
+        assert main.connection_stats.collect() == {
+            'api.twitter.com': {'requests': 3, 'new_connections': 1, 'reused': 2}
+        }